@@ -0,0 +1,98 @@
+#!/bin/python
+"""
+Messages per second handled by a Table of the Playing Area, each one verified, logged, forwarded to the Caller and logged
+again: with the logging module writing every record on the thread handling the messages, chained with the built-in hash
+of the previous event as it was before, against the SHA-256 chained security.audit.AuditLog and its writer thread.
+"""
+import os
+import sys
+import time
+import socket
+import logging
+import tempfile
+import threading
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+sys.path.append(str(path_root / "playing_area"))
+
+# The Playing Area writes its audit log to the working directory when imported
+os.chdir(tempfile.mkdtemp())
+
+import messages.protocol as proto
+import security.security as secure
+import security.audit as audit
+import parea
+
+LEGACY = {"seq": 1, "previous": ""}
+LEGACY_LOCK = threading.Lock()
+
+
+def legacy_log_event(table, event, signature):
+    """ The log_event of the Playing Area as it was before. """
+    event = f"Table {table.ID}: {event}"
+    with LEGACY_LOCK:
+        logging.info('%s - %s ', event, signature, extra={'seq': LEGACY["seq"], 'hash': hash(LEGACY["previous"])})
+        LEGACY["previous"] = event
+        LEGACY["seq"] += 1
+
+
+def drain(connection):
+    """ Reads what the Playing Area forwards to the Caller. """
+    while connection.recv(1 << 16):
+        pass
+
+
+async def handle(table, connection, messages):
+    for msg, signature in messages:
+        await parea.handle_message(table, connection, msg, signature, None)
+
+
+def run(messages, log_event):
+    """ :return: the seconds the Table took to handle the messages, and until the last record was written """
+    table = parea.Table(1)
+    pa_side, caller_side = socket.socketpair()
+    threading.Thread(target=drain, args=(caller_side,), daemon=True).start()
+    table.caller[0] = {"socket": pa_side}
+    player_side = socket.socketpair()[0]
+    table.connected_players[1] = {"socket": player_side, "public_key": PUBLIC_KEY}
+
+    parea.log_event = log_event
+    start = time.perf_counter()
+    table.loop.run_until_complete(handle(table, player_side, messages))
+    handled = time.perf_counter() - start
+    parea.AUDIT_LOG.flush()
+    written = time.perf_counter() - start
+
+    pa_side.shutdown(socket.SHUT_RDWR)
+    table.loop.close()
+    return handled, written
+
+
+@click.command()
+@click.option('--messages', '-m', default=5000, type=int, help='Messages handled with each logger')
+@click.option('--suite', default=secure.DEFAULT_SUITE, type=click.Choice(list(secure.SUITES)), help='Signature suite of the Player sending the messages')
+@click.option('--sync/--no-sync', default=True, help='Whether the writer of the audit log fsyncs every batch')
+def main(messages, suite, sync):
+    global PUBLIC_KEY
+    private_key, PUBLIC_KEY = secure.gen_assymetric_key(suite)
+    msg = proto.Winner(1, [1])
+    signed = [(msg, secure.sign_message(msg, private_key))] * messages
+
+    logging.basicConfig(filename='legacy.log', filemode='w', level=logging.INFO,
+                        format='%(seq)s - %(asctime)s - %(hash)s - %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
+    log_event = parea.log_event
+    parea.AUDIT_LOG.close()
+    parea.AUDIT_LOG = audit.AuditLog('security.log', sync=sync)
+
+    print(f"{'logger':>12}{'handled (msg/s)':>17}{'written (msg/s)':>17}")
+    for name, logger in (("logging", legacy_log_event), ("audit log", log_event)):
+        handled, written = run(signed, logger)
+        print(f"{name:>12}{messages / handled:>17.0f}{messages / written:>17.0f}")
+    parea.AUDIT_LOG.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/bin/python
+"""
+Cost of authenticating a message over one hop (the sender authenticates it, the receiver checks it), signing it with each
+signature suite against the HMAC of the session key agreed at registration, for small and large messages of the game.
+"""
+import os
+import sys
+import time
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+
+
+def messages(N):
+    deck = proto.encode_deck([os.urandom(96) for _ in range(N)])
+    return [
+        ("Verify_Card_OK", proto.Verify_Card_OK(1)),
+        ("Call_Numbers", proto.Call_Numbers(0, list(range(5)))),
+        ("Commit_Card", proto.Commit_Card(1, deck, list(range(1, N // 4 + 1)))),
+        ("Post_Final_Decks", proto.Post_Final_Decks(0, {str(user): {"deck": deck, "sym_key": "c3ltX2tleQ=="} for user in range(5)}, deck)),
+    ]
+
+
+def per_message(function, repeat):
+    """ :return: the microseconds function takes per call """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def signature_hop(suite, message, repeat):
+    private_key, public_key = secure.gen_assymetric_key(suite)
+    signature = secure.sign_message(message, private_key)
+    assert secure.verify_signature(message, signature, public_key)
+    return per_message(lambda: secure.sign_message(message, private_key), repeat), \
+        per_message(lambda: secure.verify_signature(message, signature, public_key), repeat)
+
+
+def mac_hop(message, repeat):
+    client_key, client_public_key = secure.gen_session_key()
+    server_key, server_public_key = secure.gen_session_key()
+    client = secure.agree_session(client_key, server_public_key)
+    server = secure.agree_session(server_key, client_public_key)
+    mac = client.mac(repr(message).encode('utf-8'))
+    assert server.verify(message, mac)
+    # The HMAC is computed over the same representation of the message as a signature
+    return per_message(lambda: client.mac(repr(message).encode('utf-8')), repeat), \
+        per_message(lambda: server.verify(message, mac), repeat)
+
+
+@click.command()
+@click.option('--cards', '-N', default=60, type=int, help='Size of the deck')
+@click.option('--repeat', '-r', default=200, type=int, help='Messages authenticated for each measure')
+def main(cards, repeat):
+    # The same signatures are verified over and over: each of them is checked in full, not found in the cache of verify_signature
+    secure.VERIFICATIONS.maxsize = 0
+    modes = list(secure.SUITES) + ["hmac"]
+    print(f"{'Message':>17}{'mode':>9}{'send (us)':>11}{'receive (us)':>14}{'hop (us)':>10}{'vs rsa-pss':>12}")
+    for name, message in messages(cards):
+        costs = {}
+        for mode in modes:
+            costs[mode] = mac_hop(message, repeat) if mode == "hmac" else signature_hop(mode, message, repeat)
+        baseline = sum(costs[secure.RSA_PSS.NAME])
+        for mode in modes:
+            send, receive = costs[mode]
+            print(f"{name:>17}{mode:>9}{send:>11.1f}{receive:>14.1f}{send + receive:>10.1f}{baseline / (send + receive):>11.1f}x")
+
+    client_key, client_public_key = secure.gen_session_key()
+    server_key, server_public_key = secure.gen_session_key()
+    agreement = per_message(lambda: secure.agree_session(server_key, client_public_key), repeat)
+    print(f"\nSession key agreement at registration (X25519 + HKDF): {agreement:.1f} us, once per connection")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/bin/python
+"""
+Signing and verification cost per message of a burst of Disqualify messages (the Cheat_Verify loop of the Caller), signing
+each message on its own against a single signature over the Merkle root of the batch (security.sign_batch), as the batch grows.
+"""
+import sys
+import json
+import time
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+
+
+def per_message(function, messages, repeat):
+    """ :return: the microseconds function takes per message of the batch """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat / len(messages) * 1e6
+
+
+@click.command()
+@click.option('--sizes', default="1,2,4,8,16,32,64", help='Comma separated numbers of messages signed together')
+@click.option('--suite', default=secure.DEFAULT_SUITE, type=click.Choice(list(secure.SUITES)), help='Signature suite of the key')
+@click.option('--repeat', '-r', default=20, type=int, help='Batches signed and verified for each measure')
+def main(sizes, suite, repeat):
+    # The same signatures are verified over and over: each of them is checked in full, not found in the cache of verify_signature
+    secure.VERIFICATIONS.maxsize = 0
+    private_key, public_key = secure.gen_assymetric_key(suite)
+    print(f"{'Batch':>6}{'sign each (us)':>16}{'sign batch (us)':>17}{'verify each (us)':>18}{'verify batch (us)':>19}"
+          f"{'signature (B)':>15}{'batch sig. (B)':>16}{'signing speed-up':>18}")
+
+    for size in [int(count) for count in sizes.split(",")]:
+        messages = [proto.Disqualify(player, 0) for player in range(1, size + 1)]
+        signatures = [secure.sign_message(message, private_key) for message in messages]
+        batch = secure.sign_batch(messages, private_key)
+
+        sign_each = per_message(lambda: [secure.sign_message(message, private_key) for message in messages], messages, repeat)
+        sign_batch = per_message(lambda: secure.sign_batch(messages, private_key), messages, repeat)
+        verify_each = per_message(lambda: [secure.verify_signature(message, signature, public_key) for message, signature in zip(messages, signatures)], messages, repeat)
+
+        def verify_batch():
+            # A verifier that has not seen the root yet: one signature verification, and a path for every message
+            secure.verify_batch_root.cache_clear()
+            assert all(secure.verify_signature(message, signature, public_key) for message, signature in zip(messages, batch))
+        verify_batch_cost = per_message(verify_batch, messages, repeat)
+
+        signature_bytes = sum(len(json.dumps(signature)) for signature in signatures) / size
+        batch_bytes = sum(len(json.dumps(signature)) for signature in batch) / size
+        print(f"{size:>6}{sign_each:>16.1f}{sign_batch:>17.1f}{verify_each:>18.1f}{verify_batch_cost:>19.1f}"
+              f"{signature_bytes:>15.0f}{batch_bytes:>16.0f}{sign_each / sign_batch:>17.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/bin/python
+"""
+Time taken by the Playing Area to broadcast a signed message to every Player: sending the SignedMessage to each socket,
+which serializes it once per Player, against sending a Frame serialized once.
+"""
+import os
+import sys
+import time
+import socket
+import threading
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+
+
+def drain(connection):
+    """ Reads and discards everything sent to a Player socket. """
+    while connection.recv(1 << 20):
+        pass
+
+
+def players_sockets(players):
+    """ Connected socket pairs, with a thread emptying the Player side of each. """
+    sockets = []
+    for _ in range(players):
+        pa_side, player_side = socket.socketpair()
+        threading.Thread(target=drain, args=(player_side,), daemon=True).start()
+        sockets.append((pa_side, player_side))
+    return sockets
+
+
+def final_decks(N, players):
+    """ Signed Post_Final_Decks of a game with N numbers, the largest message broadcast by the Playing Area. """
+    decks = {layer: {"deck": [os.urandom(64 + 16 * (layer + 1)) for _ in range(N)], "sym_key": "A" * 44} for layer in range(players + 1)}
+    return proto.SignedMessage(proto.Post_Final_Decks(0, decks, decks[players]["deck"]), "ab" * 256)
+
+
+def broadcast(sockets, message, once):
+    start = time.perf_counter()
+    if once:
+        message = proto.Frame(message)
+    for pa_side, _ in sockets:
+        proto.Protocol.send_msg(pa_side, message)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--sizes', '-N', default="60,1000,10000", help='Comma separated deck sizes of the broadcast message')
+@click.option('--players', default="4,16,64", help='Comma separated numbers of Players')
+@click.option('--repeat', '-r', default=3, type=int, help='Broadcasts timed per measurement (the best is kept)')
+def main(sizes, players, repeat):
+    print(f"{'N':>7}{'Players':>9}{'payload (bytes)':>17}{'per Player (ms)':>17}{'serialize once (ms)':>21}{'speed-up':>10}")
+    for N in [int(size) for size in sizes.split(",")]:
+        for P in [int(count) for count in players.split(",")]:
+            sockets = players_sockets(P)
+            message = final_decks(N, 4)
+            size = len(proto.Protocol.encode(message))
+
+            per_player = min(broadcast(sockets, message, False) for _ in range(repeat))
+            once = min(broadcast(sockets, message, True) for _ in range(repeat))
+            print(f"{N:>7}{P:>9}{size:>17,}{per_player * 1000:>17.2f}{once * 1000:>21.2f}{per_player / once:>9.1f}x")
+
+            for pa_side, player_side in sockets:
+                pa_side.close()
+
+
+if __name__ == '__main__':
+    main()
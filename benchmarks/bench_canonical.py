@@ -0,0 +1,75 @@
+#!/bin/python
+"""
+CPU time the Playing Area spends on each signed frame it relays (decoding it, verifying its signature and framing it
+again for the next User), serializing the message again to verify and to frame it as it was done before, against the
+canonical bytes a Message keeps from the frame it was received in.
+The cache of verify_signature is turned off, so every signature is checked in full both ways.
+"""
+import os
+import sys
+import json
+import time
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+
+
+def messages(N, players):
+    deck = proto.encode_deck([os.urandom(32) for _ in range(N)])
+    return [
+        ("Verify_Card_OK", proto.Verify_Card_OK(1)),
+        ("Call_Numbers", proto.Call_Numbers(0, list(range(5)))),
+        ("Commit_Card", proto.Commit_Card(1, deck, list(range(1, N // 4 + 1)))),
+        ("Post_Final_Decks", proto.Post_Final_Decks(0, {str(user): {"deck": deck, "sym_key": "c3ltX2tleQ=="} for user in range(players + 1)}, deck)),
+    ]
+
+
+def relay_before(data, public_key):
+    """ The relay as it was: the frame parsed whole, and the message serialized again to verify it and to frame it. """
+    dicionario = json.loads(data.decode('UTF-8'))
+    msg = proto.DECODERS[dicionario["message"]["command"]](dicionario["message"])
+    signature = dicionario.get("signature")
+    # A Message built from the parsed dictionary has no bytes to reuse: verify_signature serializes it
+    assert secure.verify_signature(msg, signature, public_key)
+    return json.dumps({"message": msg.to_json(), "signature": signature}).encode('UTF-8')
+
+
+def relay_after(data, public_key):
+    msg, signature, certificate = proto.Protocol.decode(data)
+    assert secure.verify_signature(msg, signature, public_key)
+    return proto.Frame(proto.SignedMessage(msg, signature)).encoded()[4:]
+
+
+def per_frame(relay, data, public_key, repeat):
+    """ :return: the CPU microseconds relay takes per frame """
+    start = time.thread_time()
+    for _ in range(repeat):
+        relay(data, public_key)
+    return (time.thread_time() - start) / repeat * 1e6
+
+
+@click.command()
+@click.option('--cards', '-N', default="60,10000", help='Comma separated sizes of the deck')
+@click.option('--players', default=4, type=int, help='Players whose decks Post_Final_Decks carries')
+@click.option('--suite', default=secure.DEFAULT_SUITE, type=click.Choice(list(secure.SUITES)), help='Signature suite of the key of the sender')
+@click.option('--repeat', '-r', default=200, type=int, help='Frames relayed for each measure')
+def main(cards, players, suite, repeat):
+    secure.VERIFICATIONS.maxsize = 0
+    private_key, public_key = secure.gen_assymetric_key(suite)
+    print(f"{'N':>7}{'Message':>18}{'frame (B)':>11}{'before (us)':>13}{'after (us)':>12}{'saved (us)':>12}{'speed-up':>10}")
+    for N in [int(count) for count in cards.split(",")]:
+        for name, message in messages(N, players):
+            data = proto.Protocol.encode(proto.SignedMessage(message, secure.sign_message(message, private_key)))
+            assert relay_before(data, public_key) == relay_after(data, public_key) == data
+            before = per_frame(relay_before, data, public_key, repeat)
+            after = per_frame(relay_after, data, public_key, repeat)
+            print(f"{N:>7}{name:>18}{len(data):>11}{before:>13.1f}{after:>12.1f}{before - after:>12.1f}{before / after:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/bin/python
+"""
+Time a Player spends checking the Playing Cards (Step 2) and finding the winners (Step 4) of a game with 1k and 100k
+Players: the loops Player.verify_cards and Player.find_winner ran before, against game.engine.CardEngine, over a numpy
+matrix when numpy is installed and over lists otherwise.
+"""
+import sys
+import time
+import random
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import game.engine as card_engine
+from game.engine import CardEngine
+
+
+def loop_invalid(cards, N):
+    """ The previous Player.verify_cards, without the messages. """
+    return [player for player in cards.keys() if len(set(cards[player])) != int(N/4)]
+
+
+def loop_winners(cards, deck):
+    """ The previous Player.find_winner, on copies of the cards. """
+    cards = {player: list(card) for player, card in cards.items()}
+    winners = []
+    for number in deck:
+        for player in cards.keys():
+            if number in cards[player]:
+                cards[player].remove(number)
+            if len(cards[player]) == 0:
+                winners.append(player)
+        if len(winners) != 0:
+            break
+    return winners
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def engine_times(cards, deck, N):
+    """ :return: the invalid cards and the winners, and the time CardEngine took to build the matrix, check the cards and find the winners """
+    engine, build = timed(CardEngine, cards)
+    invalid, check = timed(engine.invalid, N)
+    winners, search = timed(engine.winners, deck)
+    return invalid, winners[0], build, check, search
+
+
+@click.command()
+@click.option('--players', default="1000,100000", help='Comma separated numbers of Players')
+@click.option('--cards', '-N', default=100, type=int, help='Size of the deck')
+def main(players, cards):
+    N = cards
+    engines = ["numpy", "lists"] if card_engine.numpy is not None else ["lists"]
+    print(f"{'Players':>8}{'engine':>8}{'loop check (s)':>16}{'loop winners (s)':>18}{'build (s)':>11}{'check (s)':>11}"
+          f"{'winners (s)':>13}{'speed-up':>10}")
+
+    for P in [int(count) for count in players.split(",")]:
+        deck = random.sample(range(N), N)
+        playing_cards = {player: random.sample(range(1, N + 1), int(N/4)) for player in range(1, P + 1)}
+        # A few cheaters, with a smaller card
+        for player in random.sample(range(1, P + 1), max(1, P // 100)):
+            playing_cards[player] = random.sample(range(256), int(N/8))
+
+        invalid, loop_check = timed(loop_invalid, playing_cards, N)
+        winners, loop_search = timed(loop_winners, playing_cards, deck)
+
+        numpy = card_engine.numpy
+        for name in engines:
+            if name == "lists":
+                card_engine.numpy = None
+            try:
+                engine_invalid, engine_winners, build, check, search = engine_times(playing_cards, deck, N)
+            finally:
+                card_engine.numpy = numpy
+            assert engine_invalid == invalid and engine_winners == winners
+
+            print(f"{P:>8}{name:>8}{loop_check:>16.3f}{loop_search:>18.3f}{build:>11.3f}{check:>11.3f}{search:>13.3f}"
+                  f"{(loop_check + loop_search) / (build + check + search):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/bin/python
+"""
+Registrations per second checked by the Playing Area: the signature of the RegisterMessage validated against the
+certificate of the client, and its name and citizen number read from it, as each CertMessage is. Certificates parsed
+on every call, as before, against the CertificateCache of vsc_security, for citizens that come back game after game
+and for certificates never seen before.
+"""
+import sys
+import time
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.vsc_security as vsc
+
+
+def register(registrations):
+    """ The certificate checks of the registration of each client, as the Playing Area does them. """
+    for message, signature, certificate in registrations:
+        assert vsc.validate_signature(signature, message, certificate)
+        vsc.get_name_and_number(certificate)
+
+
+def signed_registrations(tokens, count):
+    """ :return: count RegisterMessages, signed in turn by each token (signature, message, certificate) """
+    registrations = []
+    for number in range(count):
+        token = tokens[number % len(tokens)]
+        message = proto.RegisterMessage("Player", "pk", nick=f"player{number}")
+        vsc.use_token(token)
+        registrations.append((message, vsc.sign_message(message), token.get_cert_data()))
+    vsc.use_token(None)
+    return registrations
+
+
+@click.command()
+@click.option('--registrations', '-n', default=2000, type=int, help='Registrations checked in each case')
+@click.option('--citizens', '-c', default=50, type=int, help='Citizens registering again and again')
+@click.option('--new', default=200, type=int, help='Certificates never seen before')
+def main(registrations, citizens, new):
+    repeated = signed_registrations([vsc.SoftwareToken(f"PLAYER {number}", f"BI{number}") for number in range(citizens)], registrations)
+    fresh = signed_registrations([vsc.SoftwareToken(f"NEW {number}", f"BI{number}") for number in range(new)], new)
+
+    print(f"{'certificates':>14}{'cache':>8}{'registrations/s':>18}{'hits':>8}{'misses':>8}")
+    for name, cases in (("repeated", repeated), ("new", fresh)):
+        for cache_size in (0, vsc.CERTIFICATES_CACHE_SIZE):
+            # A cache of size 0 parses the certificate on every call, as before
+            vsc.CERTIFICATES = vsc.CertificateCache(cache_size)
+            start = time.perf_counter()
+            register(cases)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>14}{'off' if cache_size == 0 else 'on':>8}{len(cases) / elapsed:>18.0f}"
+                  f"{vsc.CERTIFICATES.hits:>8}{vsc.CERTIFICATES.misses:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/bin/python
+"""
+Signed frames verified per second by the Playing Area as the crypto pool (security.offload.CryptoPool, --crypto-workers)
+grows, against verifying them in the handler of each table (0 workers). Every connection awaits the verification of its
+frames in order, as the handler of a table does, while the frames of the other connections are verified meanwhile.
+Run it on a machine with several cores: with a single one the workers only add the cost of reaching them.
+"""
+import sys
+import time
+import click
+import asyncio
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+import security.offload as offload
+
+
+def signed_frames(connections, frames, suite):
+    """ :return: for each connection, the public key of its client and the frames it sends (message, signature) """
+    clients = []
+    for connection in range(connections):
+        private_key, public_key = secure.gen_assymetric_key(suite)
+        messages = [proto.Call_Numbers(connection, list(range(frame, frame + 5))) for frame in range(frames)]
+        clients.append((public_key, [(message, secure.sign_message(message, private_key)) for message in messages]))
+    return clients
+
+
+async def verify_connection(pool, connection, public_key, frames):
+    for message, signature in frames:
+        if pool is None:
+            valid = secure.verify_signature(message, signature, public_key)
+        else:
+            valid = await asyncio.wrap_future(pool.submit(secure.verify_signature, message, signature, public_key, key=connection))
+        assert valid
+
+
+async def verify_all(pool, clients):
+    await asyncio.gather(*(verify_connection(pool, connection, public_key, frames) for connection, (public_key, frames) in enumerate(clients)))
+
+
+@click.command()
+@click.option('--workers', default="0,1,2,4,8", help='Comma separated sizes of the crypto pool, 0 to verify in the handler')
+@click.option('--connections', '-c', default=32, type=int, help='Connections sending frames at once')
+@click.option('--frames', '-f', default=50, type=int, help='Frames sent by each connection')
+@click.option('--batch', default=offload.CRYPTO_BATCH, type=int, help='Jobs sent to a worker together, at most')
+@click.option('--threads', is_flag=True, help='Use a pool of threads instead of processes')
+@click.option('--suite', default=secure.DEFAULT_SUITE, type=click.Choice(list(secure.SUITES)), help='Signature suite of the keys of the clients')
+def main(workers, connections, frames, batch, threads, suite):
+    clients = signed_frames(connections, frames, suite)
+    total = connections * frames
+    print(f"{connections} connections x {frames} frames ({suite}), {'threads' if threads else 'processes'}")
+    print(f"{'Workers':>8}{'frames/s':>11}{'speed-up':>10}{'batches':>9}{'avg batch':>11}")
+
+    baseline = None
+    for count in [int(count) for count in workers.split(",")]:
+        pool = offload.CryptoPool(count, batch, processes=not threads) if count > 0 else None
+        try:
+            start = time.perf_counter()
+            asyncio.run(verify_all(pool, clients))
+            rate = total / (time.perf_counter() - start)
+        finally:
+            if pool is not None:
+                pool.close()
+        baseline = baseline or rate
+        batches = pool.batches if pool is not None else 0
+        average = f"{pool.completed / batches:.1f}" if batches > 0 else "-"
+        print(f"{count:>8}{rate:>11.0f}{rate / baseline:>9.2f}x{batches:>9}{average:>11}")
+
+
+if __name__ == '__main__':
+    main()
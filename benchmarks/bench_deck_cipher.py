@@ -0,0 +1,54 @@
+#!/bin/python
+"""
+Time to encrypt and decrypt a whole deck: a call of encrypt_number/decrypt_number for each card, as the Caller and the Players
+did before, against the deck-level encrypt_deck/decrypt_deck of security.security.
+"""
+import sys
+import time
+import random
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import security.security as secure
+
+
+def per_card_encrypt(deck, key):
+    return [secure.encrypt_number(number, key) for number in deck]
+
+
+def per_card_decrypt(deck, key, flag=0):
+    return [secure.decrypt_number(number, key, flag) for number in deck]
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+@click.command()
+@click.option('--cards', '-N', default="60,10000,1000000", help='Comma separated sizes of the deck')
+@click.option('--layers', '-l', default=2, type=int, help='Encryption layers (the Caller and the Players before the last one)')
+def main(cards, layers):
+    keys = [secure.gen_symmetric_key() for _ in range(layers + 1)]
+    print(f"{'N':>8}{'layer':>6}{'encrypt per card (s)':>22}{'encrypt_deck (s)':>18}{'decrypt per card (s)':>22}{'decrypt_deck (s)':>18}{'speed-up':>10}")
+    for N in [int(count) for count in cards.split(",")]:
+        deck = random.sample(range(N), N)
+        for layer, key in enumerate(keys):
+            per_card, encrypted = measure(per_card_encrypt, deck, key)
+            batched, batched_encrypted = measure(secure.encrypt_deck, deck, key)
+            flag = 1 if layer == 0 else 0
+            per_card_back, decrypted = measure(per_card_decrypt, batched_encrypted, key, flag)
+            batched_back, batched_decrypted = measure(secure.decrypt_deck, encrypted, key, flag)
+            assert decrypted == batched_decrypted == deck
+
+            speed_up = (per_card + per_card_back) / (batched + batched_back)
+            print(f"{N:>8}{layer:>6}{per_card:>22.4f}{batched:>18.4f}{per_card_back:>22.4f}{batched_back:>18.4f}{speed_up:>9.1f}x")
+            deck = batched_encrypted
+
+
+if __name__ == '__main__':
+    main()
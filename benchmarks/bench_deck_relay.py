@@ -0,0 +1,136 @@
+#!/bin/python
+"""
+End-to-end latency of Step 1 (the deck shuffling relay of the Playing Area) as a function of the number of Players,
+with simulated Players and a Caller behind a slower link: the serial relay used before, against the pipelined parea.deck_generation.
+"""
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+sys.path.append(str(path_root / "playing_area"))
+
+# The Playing Area writes its audit log to the working directory when imported
+os.chdir(tempfile.mkdtemp())
+
+import messages.protocol as proto
+import security.security as secure
+import parea
+
+
+def simulated_player(ID, connection, delay):
+    """ Answers each Message_Deck with a Commit_Card, after spending delay seconds shuffling. """
+    while True:
+        message = proto.Protocol.recv_msg(connection)
+        if message[0] is None:
+            return
+        time.sleep(delay)
+        reply = proto.Commit_Card(ID, list(reversed(message[0].deck)), list(range(1, 16)))
+        proto.Protocol.send_msg(connection, proto.SignedMessage(reply, "ab"))
+
+
+def simulated_caller(connection, bandwidth):
+    """
+    Reads the forwarded messages over a link limited to bandwidth bytes per second, so a large forward keeps the
+    Playing Area busy for as long as the transfer takes. Acknowledges the final Message_Deck.
+    """
+    while True:
+        header = connection.recv(4, socket.MSG_WAITALL)
+        if len(header) < 4:
+            return
+        remaining = int.from_bytes(header, "big")
+        data = bytearray()
+        while remaining > 0:
+            chunk = connection.recv(min(remaining, 1 << 16))
+            if not chunk:
+                return
+            data += chunk
+            remaining -= len(chunk)
+            time.sleep(len(chunk) / bandwidth)
+        if isinstance(proto.Protocol.decode(bytes(data))[0], proto.Message_Deck):
+            connection.sendall(b"\x01")
+
+
+def route(table, connection):
+    """ Hands the replies of a Player to its Table, as the dispatch loop of the Playing Area does. """
+    while True:
+        message = proto.Protocol.recv_msg(connection)
+        if message[0] is None:
+            return
+        table.post(connection, *message)
+
+
+async def serial_deck_generation(table, initial_deck):
+    """ The relay as it was done before: the forward to the Caller happens before the next Player is contacted. """
+    current_deck = initial_deck
+    for player in table.connected_players.keys():
+        msg = proto.Message_Deck(None, current_deck)
+        signature = secure.sign_message(msg, parea.PRIVATE_KEY)
+        proto.Protocol.send_msg(table.connected_players[player]["socket"], proto.SignedMessage(msg, signature))
+
+        while True:
+            reply, signature = (await table.next_message())[1:3]
+            if isinstance(reply, proto.Commit_Card):
+                break
+
+        proto.Protocol.send_msg(table.caller[0]["socket"], proto.SignedMessage(reply, signature))
+        current_deck = reply.deck
+
+    msg = proto.Message_Deck(None, current_deck)
+    signature = secure.sign_message(msg, parea.PRIVATE_KEY)
+    proto.Protocol.send_msg(table.caller[0]["socket"], proto.SignedMessage(msg, signature))
+
+
+def run(relay, players, N, shuffle_delay, bandwidth):
+    # A Table whose event loop is run by the benchmark, instead of a thread of its own
+    table = parea.Table(1)
+    threads = []
+    for ID in range(1, players + 1):
+        pa_side, player_side = socket.socketpair()
+        threads.append(threading.Thread(target=simulated_player, args=(ID, player_side, shuffle_delay), daemon=True))
+        threads.append(threading.Thread(target=route, args=(table, pa_side), daemon=True))
+        table.connected_players[ID] = {"socket": pa_side}
+
+    pa_side, caller_side = socket.socketpair()
+    threads.append(threading.Thread(target=simulated_caller, args=(caller_side, bandwidth), daemon=True))
+    table.caller[0] = {"socket": pa_side}
+
+    for thread in threads:
+        thread.start()
+
+    deck = [os.urandom(96) for _ in range(N)]
+    start = time.perf_counter()
+    table.loop.run_until_complete(relay(table, deck))
+    table.caller[0]["socket"].recv(1)
+    elapsed = time.perf_counter() - start
+
+    for player in table.connected_players.values():
+        player["socket"].shutdown(socket.SHUT_RDWR)
+    table.caller[0]["socket"].shutdown(socket.SHUT_RDWR)
+    for thread in threads:
+        thread.join()
+    return elapsed
+
+
+@click.command()
+@click.option('--players', default="2,4,8,16", help='Comma separated numbers of simulated Players')
+@click.option('--cards', '-N', default=10000, type=int, help='Size of the deck')
+@click.option('--shuffle', default=0.1, type=float, help='Seconds a Player takes to shuffle the deck')
+@click.option('--bandwidth', default=20.0, type=float, help='Speed of the link to the Caller, in MB/s')
+def main(players, cards, shuffle, bandwidth):
+    parea.PRIVATE_KEY, parea.PUBLIC_KEY = secure.gen_assymetric_key()
+    print(f"{'Players':>8}{'serial relay (s)':>18}{'pipelined relay (s)':>21}{'speed-up':>10}")
+    for P in [int(count) for count in players.split(",")]:
+        serial = run(serial_deck_generation, P, cards, shuffle, bandwidth * 1e6)
+        pipelined = run(parea.deck_generation, P, cards, shuffle, bandwidth * 1e6)
+        print(f"{P:>8}{serial:>18.3f}{pipelined:>21.3f}{serial / pipelined:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/bin/python
+"""
+Step 3 (the deck verification) with the bulk verification, where the Caller sends every layer to every Player and each of
+them decrypts them all, against the incremental one, where the decks are hashed as they arrive in Step 1 and each Player only
+checks the shuffle of the Player before it. Reports the bytes of the Post_Final_Decks frames, the time a Player and the
+Caller take, and the time the Caller spent hashing decks in Step 1.
+"""
+import os
+import sys
+import time
+import base64
+import random
+import contextlib
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+# The client modules, rather than the packages of the same name
+sys.path.insert(0, str(path_root / "caller"))
+sys.path.insert(0, str(path_root / "player"))
+
+import messages.protocol as proto
+import security.security as secure
+from caller import Caller
+from player import Player
+
+SIGNATURE = "00" * 256                              # Every frame is signed, with an RSA-2048 signature of the same size
+
+
+def shuffled_game(caller, players, N):
+    """
+    Plays Step 1 and the key sharing of Step 2 on the Caller, as the Commit_Card and Post_Sym_Keys messages do.
+    :return: the deck each Player received, and the time the Caller spent hashing the decks
+    """
+    caller.generate_deck()
+    hashing = 0
+    if caller.verification == proto.INCREMENTAL_VERIFICATION:
+        # Timed again, as generate_deck hashes the deck right after encrypting it
+        start = time.perf_counter()
+        secure.deck_digest(caller.initial_deck)
+        hashing = time.perf_counter() - start
+    received = {}
+    deck = caller.initial_deck
+    for player in range(1, players + 1):
+        received[player] = deck
+        key = secure.gen_symmetric_key()
+        deck = random.sample(secure.encrypt_deck(deck, key, caller.cipher), N)
+        caller.PLAYERS[player] = {"nick": f"player{player}", "card": list(range(N // 4)), "cheated": False}
+        caller.PLAYERS_SHUFFLE[player] = {"deck": None, "sym_key": base64.b64encode(key).decode()}
+        commit = proto.Commit_Card(player, deck, caller.PLAYERS[player]["card"])
+        caller.PLAYERS_SHUFFLE[player]["deck"] = commit.deck
+        if caller.verification == proto.INCREMENTAL_VERIFICATION:
+            start = time.perf_counter()
+            caller.PLAYERS_SHUFFLE[player]["digest"] = secure.deck_digest(commit.deck)
+            hashing += time.perf_counter() - start
+    caller.signed_final_deck = deck
+    return received, hashing
+
+
+def step3(players, N, cipher, verification, wire):
+    caller = Caller("caller", 0, N, players, cipher=cipher, verification=verification)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        received, step1 = shuffled_game(caller, players, N)
+
+    # The Post_Final_Decks the Caller builds, as Caller.read_data does on the Cheat_Verify of the Cards stage
+    caller.socket.close()
+    caller.socket = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        info = {}
+        info[0] = {"deck": caller.initial_deck, "sym_key": caller.sym_key}
+        for player in caller.PLAYERS_SHUFFLE:
+            info[player] = {"deck": caller.PLAYERS_SHUFFLE[player]["deck"], "sym_key": caller.PLAYERS_SHUFFLE[player]["sym_key"]}
+        if verification == proto.INCREMENTAL_VERIFICATION:
+            info[0]["digest"] = caller.initial_digest
+            for player in caller.PLAYERS_SHUFFLE:
+                info[player]["digest"] = caller.PLAYERS_SHUFFLE[player]["digest"]
+            digests = {user_id: {"digest": layer["digest"], "sym_key": layer["sym_key"]} for user_id, layer in info.items()}
+            digests[0]["deck"] = caller.initial_deck
+            msg = proto.Post_Final_Decks(caller.ID, digests, [])
+        else:
+            msg = proto.Post_Final_Decks(caller.ID, info, caller.signed_final_deck)
+        caller.decrypt(info)
+    caller_time = time.perf_counter() - start
+    frame = proto.Protocol.encode(proto.SignedMessage(msg, SIGNATURE), wire)
+
+    # Every Player does the same work, at the same time: the last one is timed, from the frame it receives
+    player = Player(f"player{players}", 0)
+    player.socket.close()
+    player.ID, player.cipher, player.verification = players, cipher, verification
+    player.received_deck = received[players]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        received_msg = proto.Protocol.decode(frame)[0]
+        if verification == proto.INCREMENTAL_VERIFICATION:
+            reply = player.verify_previous_shuffle(received_msg.decks)
+        else:
+            reply = player.decrypt(received_msg.decks)
+    player_time = time.perf_counter() - start
+    assert isinstance(reply, proto.Verify_Deck_OK)
+
+    # From the Caller to the Playing Area, and on to every Player
+    return len(frame) * (players + 1), caller_time, player_time, step1
+
+
+@click.command()
+@click.option('--players', default="4,16,64", help='Comma separated numbers of Players')
+@click.option('--cards', '-N', default=10000, type=int, help='Size of the deck')
+@click.option('--cipher', default=secure.CBC_CIPHER, type=click.Choice(secure.DECK_CIPHERS), help='Layered encryption of the deck')
+@click.option('--wire', default=proto.JSON_WIRE, type=click.Choice(proto.WIRE_FORMATS), help='Wire format of the frames')
+def main(players, cards, cipher, wire):
+    print(f"{'Players':>8}{'verification':>14}{'Step 3 bytes (kB)':>19}{'Caller (s)':>12}{'Player (s)':>12}{'Step 1 hashing (s)':>20}")
+    for P in [int(count) for count in players.split(",")]:
+        for verification in proto.VERIFICATION_MODES:
+            size, caller_time, player_time, step1 = step3(P, cards, cipher, verification, wire)
+            print(f"{P:>8}{verification:>14}{size / 1000:>19.1f}{caller_time:>12.3f}{player_time:>12.3f}{step1:>20.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+#!/bin/python
+"""
+Micro-benchmark of the decoding of received frames: the DECODERS registry used by Protocol.decode,
+against the chain of if blocks that recv_msg used before it.
+"""
+import sys
+import json
+import timeit
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+from messages.protocol import *
+import messages.protocol as proto
+
+
+def legacy_decode(data):
+    """ The decoding done by recv_msg before the DECODERS registry, kept as the reference. """
+    isSigned = True
+    isCertified = True
+    signature = None
+
+    # Check if message is SIgned or not
+    msg = None
+    certificate = None
+    try:
+        dicionario = json.loads(data.decode('UTF-8'))
+    except:
+        raise BadFormatError(data)
+    
+    try:
+        ## Message is signed
+        msg = dicionario["message"]
+        signature = dicionario["signature"]
+        try:
+            ## Message comes with certificate
+            certificate = dicionario["certificate"]
+        except:
+            ## Message does not come with certificate
+            isCertified = False
+
+        dicionario = msg                                            # So the code below can be reused without an if
+    except:
+        ## Message is not signed
+        isSigned = False
+    
+    try:
+        value = dicionario["command"]
+    except:
+        raise BadFormatError(data)
+
+
+    # Check the type of the Message
+    if value == "Register":
+        try:
+            if dicionario["type"] == "Caller":
+                msg = RegisterMessage(dicionario["type"], dicionario["pk"], dicionario["ass_cc"], dicionario["nick"], dicionario["num_players"])
+            elif dicionario["type"] == "Player":
+                msg = RegisterMessage(dicionario["type"], dicionario["pk"], dicionario["ass_cc"], dicionario["nick"])
+        except:
+            raise BadFormatError(data)
+    
+    if value == "Register_ACK":
+        try:
+            msg = Register_ACK(dicionario["ID"], dicionario["pk"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Register_NACK":
+        try:
+            msg = Register_NACK()
+        except:
+            raise BadFormatError(data)
+
+    if value == "Cheat":
+        try:
+            msg = Cheat(dicionario["ID"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Begin_Game":
+        try:
+            msg = Begin_Game(dicionario["ID"], dicionario["pks"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Message_Deck":
+        try:
+            msg = Message_Deck(dicionario["ID"], dicionario["deck"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Commit_Card":
+        try:
+            msg = Commit_Card(dicionario["ID"], dicionario["deck"], dicionario["card"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Sign_Final_Deck_ACK":
+        try:
+            msg = Sign_Final_Deck_ACK(dicionario["ID"], dicionario["playing_cards"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Verify_Cards":
+        try:
+            msg = Verify_Cards(dicionario["ID"], dicionario["playing_cards"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Verify_Card_OK":
+        try:
+            msg = Verify_Card_OK(dicionario["ID"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Verify_Card_NOK":
+        try:
+            msg = Verify_Card_NOK(dicionario["ID"], dicionario["users"])
+        except:
+            raise BadFormatError(data)
+    
+    if value == "Cheat_Verify":
+        try:
+            msg = Cheat_Verify(dicionario["cheaters"], dicionario["stage"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Disqualify":
+        try:
+            msg = Disqualify(dicionario["disqualified_ID"], dicionario["ID"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Cards_Validated":
+        try:
+            msg = Cards_Validated(dicionario["ID"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Ask_Sym_Keys":
+        try:
+            msg = Ask_Sym_Keys()
+        except:
+            raise BadFormatError(data)
+
+    if value == "Post_Sym_Keys":
+        try:
+            msg = Post_Sym_Keys(dicionario["ID"], dicionario["sym_key"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Post_Final_Decks":
+        try:
+            msg = Post_Final_Decks(dicionario["ID"], dicionario["decks"], dicionario["signed_deck"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Verify_Deck_OK":
+        try:
+            msg = Verify_Deck_OK(dicionario["ID"])
+        except:
+            raise BadFormatError(data)
+    
+    if value == "Verify_Deck_NOK":
+        try:
+            msg = Verify_Deck_NOK(dicionario["ID"], dicionario["users"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Ask_For_Winner":
+        try:
+            msg = Ask_For_Winner(dicionario["ID"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Winner":
+        try:
+            msg = Winner(dicionario["ID"], dicionario["ID_winner"])
+        except:
+            raise BadFormatError(data)
+
+    if value == "Winner_ACK":
+        try:
+            msg = Winner_ACK(dicionario["ID"], dicionario["ID_winner"])
+        except:
+            raise BadFormatError(data)
+    
+    if value == "Get_Players_List":
+        try:
+            msg = Get_Players_List(dicionario["ID"])
+        except:
+            raise BadFormatError(data)
+    
+    if value == "Players_List":
+        try:
+            msg = Players_List(dicionario["ID"], dicionario["players"])
+        except:
+            raise BadFormatError(data)
+        
+
+    return msg, signature, certificate
+
+
+def sample_frames(N):
+    """ One signed frame of every Message type, with decks and cards sized for a deck of N numbers. """
+    pk = "-----BEGIN PUBLIC KEY-----\n" + "A" * 392 + "\n-----END PUBLIC KEY-----\n"
+    deck = ["A" * 128 for _ in range(N)]
+    card = list(range(1, N // 4 + 1))
+    cards = {str(player): card for player in range(1, 5)}
+    messages = [
+        RegisterMessage("Caller", pk, nick="caller", num_players=4),
+        RegisterMessage("Player", pk, nick="player"),
+        Register_ACK(1, pk),
+        Register_NACK(),
+        Cheat(1),
+        Begin_Game(0, {str(player): pk for player in range(5)}),
+        Message_Deck(None, deck),
+        Commit_Card(1, deck, card),
+        Sign_Final_Deck_ACK(0, cards),
+        Verify_Cards(None, cards),
+        Verify_Card_OK(1),
+        Verify_Card_NOK(1, ["2"]),
+        Cheat_Verify({"1": True, "2": False}, "Cards"),
+        Disqualify(2, 0),
+        Cards_Validated(1),
+        Ask_Sym_Keys(),
+        Post_Sym_Keys(1, "A" * 44),
+        Post_Final_Decks(0, {str(player): {"deck": deck, "sym_key": "A" * 44} for player in range(5)}, deck),
+        Verify_Deck_OK(1),
+        Verify_Deck_NOK(1, ["2"]),
+        Ask_For_Winner(0),
+        Winner(1, [1]),
+        Winner_ACK(0, [1]),
+        Get_Players_List(1),
+        Players_List(None, {str(player): {"nick": "player", "disqualified": False, "playing_card": card, "public_key": pk} for player in range(1, 5)}),
+    ]
+    return [(message.command, repr(SignedMessage(message, "ab" * 256)).encode('utf-8')) for message in messages]
+
+
+@click.command()
+@click.option('--cards', '-N', default=60, type=int, help='Size of the decks carried in the frames')
+@click.option('--repeat', '-r', default=2000, type=int, help='Number of decodes timed per frame')
+def main(cards, repeat):
+    frames = sample_frames(cards)
+    print(f"{'Message':<22}{'if-chain (frames/s)':>22}{'registry (frames/s)':>22}{'speed-up':>10}")
+
+    total_legacy = total_registry = 0
+    for command, data in frames:
+        assert repr(legacy_decode(data)[0]) == repr(proto.Protocol.decode(data)[0])
+        legacy = min(timeit.repeat(lambda: legacy_decode(data), number=repeat, repeat=3))
+        registry = min(timeit.repeat(lambda: proto.Protocol.decode(data), number=repeat, repeat=3))
+        total_legacy += legacy
+        total_registry += registry
+        print(f"{command:<22}{repeat / legacy:>22,.0f}{repeat / registry:>22,.0f}{legacy / registry:>9.2f}x")
+
+    count = repeat * len(frames)
+    print(f"{'All messages':<22}{count / total_legacy:>22,.0f}{count / total_registry:>22,.0f}{total_legacy / total_registry:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/bin/python
+"""
+Bytes on the wire per game, as a function of the number of Players, with each layered encryption of the deck: the messages
+that carry decks (the Message_Deck and Commit_Card of Step 1 and the Post_Final_Decks of Step 3) are built as the Caller,
+the Players and the Playing Area build them, and the sizes of their frames added up for every hop they travel.
+"""
+import sys
+import base64
+import random
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+
+SIGNATURE = "00" * 256                              # Every frame is signed, with an RSA-2048 signature of the same size
+
+
+def frame_size(msg, wire):
+    return len(proto.Protocol.encode(proto.SignedMessage(msg, SIGNATURE), wire))
+
+
+def game_bytes(players, N, cipher, wire):
+    """ :return: bytes sent in the frames carrying decks, and the size of a card of the final deck """
+    key = secure.gen_symmetric_key()
+    decks = {0: {"deck": secure.encrypt_deck(random.sample(range(N), N), key, cipher), "sym_key": base64.b64encode(key).decode()}}
+    # Caller -> Playing Area
+    total = frame_size(proto.Message_Deck(0, decks[0]["deck"]), wire)
+
+    deck = decks[0]["deck"]
+    for player in range(1, players + 1):
+        # Playing Area -> Player, and the Commit_Card back to the Playing Area and on to the Caller
+        total += frame_size(proto.Message_Deck(None, deck), wire)
+        key = secure.gen_symmetric_key()
+        deck = random.sample(secure.encrypt_deck(deck, key, cipher), N)
+        decks[player] = {"deck": deck, "sym_key": base64.b64encode(key).decode()}
+        total += 2 * frame_size(proto.Commit_Card(player, deck, list(range(N // 4))), wire)
+
+    # Final deck to the Caller, and the Post_Final_Decks from the Caller to every Player
+    total += frame_size(proto.Message_Deck(None, deck), wire)
+    total += (players + 1) * frame_size(proto.Post_Final_Decks(0, decks, deck), wire)
+    return total, len(deck[0])
+
+
+@click.command()
+@click.option('--players', default="4,16,64", help='Comma separated numbers of Players')
+@click.option('--cards', '-N', default=100, type=int, help='Size of the deck')
+@click.option('--wire', default=proto.JSON_WIRE, type=click.Choice(proto.WIRE_FORMATS), help='Wire format of the frames')
+def main(players, cards, wire):
+    print(f"{'Players':>8}" + "".join(f"{cipher + ' card (B)':>18}{cipher + ' game (kB)':>18}" for cipher in secure.DECK_CIPHERS) + f"{'ratio':>8}")
+    for P in [int(count) for count in players.split(",")]:
+        sizes = {cipher: game_bytes(P, cards, cipher, wire) for cipher in secure.DECK_CIPHERS}
+        row = "".join(f"{card:>18}{total / 1000:>18.1f}" for total, card in sizes.values())
+        print(f"{P:>8}{row}{sizes[secure.CBC_CIPHER][0] / sizes[secure.BLOCK_CIPHER][0]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/bin/python
+"""
+Registration latency of the clients, whose connect() reads the Citizen Card certificate and signs the RegisterMessage
+with the card: Players registering at a table of the Playing Area with the in-process SoftwareToken of vsc_security.
+Given a PKCS#11 library with a Citizen Card token (--library), the card operations of connect() are also timed with a
+library load, session and login per call, as vsc_security did before, against the pooled sessions of PKCS11Token.
+"""
+import io
+import time
+import contextlib
+import click
+
+from bench_tables import start_playing_area, vsc, Caller, Player
+
+
+def per_call_operations(library, pin):
+    """ The certificate read and signature of connect(), with the library loaded and a session opened for each, as before. """
+    import PyKCS11
+
+    pkcs11 = PyKCS11.PyKCS11Lib()
+    pkcs11.load(library)
+    slot = pkcs11.getSlotList(tokenPresent=True)[0]
+    session = pkcs11.openSession(slot)
+    cert_obj = session.findObjects([(PyKCS11.CKA_CLASS, PyKCS11.CKO_CERTIFICATE), (PyKCS11.CKA_LABEL, vsc.CERTIFICATE_LABEL)])[0]
+    bytes(cert_obj.to_dict()['CKA_VALUE']).hex()
+    session.closeSession()
+
+    pkcs11 = PyKCS11.PyKCS11Lib()
+    pkcs11.load(library)
+    slot = pkcs11.getSlotList(tokenPresent=True)[0]
+    session = pkcs11.openSession(slot, PyKCS11.CKF_SERIAL_SESSION | PyKCS11.CKF_RW_SESSION)
+    session.login(pin)
+    criteria = [(PyKCS11.CKA_CLASS, PyKCS11.CKO_PRIVATE_KEY), (PyKCS11.CKA_KEY_TYPE, PyKCS11.CKK_RSA), (PyKCS11.CKA_LABEL, vsc.KEY_LABEL)]
+    key = session.findObjects(criteria)[0]
+    session.sign(key=key, data=b"RegisterMessage", mecha=PyKCS11.Mechanism(PyKCS11.CKM_SHA1_RSA_PKCS, None))
+    session.logout()
+    session.closeSession()
+
+
+def pooled_operations():
+    vsc.get_cert_data()
+    vsc.sign_message("RegisterMessage")
+
+
+def mean_time(function, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions
+
+
+@click.command()
+@click.option('--players', default=20, type=int, help='Players registered at the table')
+@click.option('--suite', default="ed25519", help='Signature suite of the keys the clients generate in connect()')
+@click.option('--library', default=None, help='PKCS#11 library with a Citizen Card token, to time the card operations')
+@click.option('--pin', default=vsc.PIN, help='PIN of the token')
+@click.option('--repetitions', '-r', default=20, type=int, help='Card operations timed with the PKCS#11 library')
+def main(players, suite, library, pin, repetitions):
+    process, port = start_playing_area()
+    try:
+        # The same software token plays the Caller, which must be in the whitelist, and the Players
+        vsc.use_token(vsc.SoftwareToken("ARISTIDES VAS", "BI096890913"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            caller = Caller("caller", port, 60, players + 1, suite=suite)
+            caller.connect()
+
+            clients = [Player(f"player{number}", port, table=caller.table, suite=suite) for number in range(players)]
+            start = time.perf_counter()
+            for player in clients:
+                player.connect()
+            registration = (time.perf_counter() - start) / players
+        card = mean_time(pooled_operations, players)
+        for client in [caller] + clients:
+            client.socket.close()
+    finally:
+        process.terminate()
+
+    print(f"{'token':>22}{'card operations (ms)':>22}{'registration (ms)':>19}")
+    print(f"{'software token':>22}{card * 1000:>22.2f}{registration * 1000:>19.2f}")
+
+    if library is not None:
+        per_call = mean_time(lambda: per_call_operations(library, pin), repetitions)
+        vsc.use_token(vsc.PKCS11Token(library, pin))
+        pooled = mean_time(pooled_operations, repetitions)
+        vsc.use_token(None)
+        print(f"{'PKCS#11 per call':>22}{per_call * 1000:>22.2f}")
+        print(f"{'PKCS#11 pooled':>22}{pooled * 1000:>22.2f}")
+
+
+if __name__ == '__main__':
+    main()
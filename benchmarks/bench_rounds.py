@@ -0,0 +1,88 @@
+#!/bin/python
+"""
+Latency of a Playing Area request/reply round (such as verify_playing_deck) with simulated Players that take some time to
+reply: contacting the Players one after the other, against the scatter-gather of parea.gather_replies.
+"""
+import os
+import sys
+import time
+import random
+import socket
+import tempfile
+import threading
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+sys.path.append(str(path_root / "playing_area"))
+
+# The Playing Area writes its audit log to the working directory when imported
+os.chdir(tempfile.mkdtemp())
+
+import messages.protocol as proto
+import parea
+
+
+def simulated_player(ID, connection, delay):
+    """ Replies to every message with a Verify_Deck_OK, after spending delay seconds processing it. """
+    while True:
+        message = proto.Protocol.recv_msg(connection)
+        if message[0] is None:
+            return
+        time.sleep(delay)
+        proto.Protocol.send_msg(connection, proto.SignedMessage(proto.Verify_Deck_OK(ID), "ab"))
+
+
+def sequential_round(table, frame):
+    """ The round as it was done before: send to one Player and wait for its reply before contacting the next. """
+    replies = {}
+    for player in table.connected_players.keys():
+        proto.Protocol.send_msg(table.connected_players[player]["socket"], frame)
+        replies[player] = table.loop.run_until_complete(table.next_message())[1:3]
+    return replies
+
+
+def route(table, connection):
+    """ Hands the replies of a Player to its Table, as the dispatch loop of the Playing Area does. """
+    while True:
+        message = proto.Protocol.recv_msg(connection)
+        if message[0] is None:
+            return
+        table.post(connection, *message)
+
+
+@click.command()
+@click.option('--players', default="4,16,64", help='Comma separated numbers of simulated Players')
+@click.option('--delay', '-d', default=0.02, type=float, help='Mean time, in seconds, a Player takes to reply')
+def main(players, delay):
+    frame = proto.Frame(proto.SignedMessage(proto.Post_Final_Decks(0, {}, []), "ab"))
+    print(f"{'Players':>8}{'slowest (s)':>13}{'sum (s)':>10}{'sequential (s)':>16}{'scatter-gather (s)':>20}{'speed-up':>10}")
+
+    for P in [int(count) for count in players.split(",")]:
+        # A Table whose event loop is run by the benchmark, instead of a thread of its own
+        table = parea.Table(P)
+        delays = [random.uniform(0.5 * delay, 1.5 * delay) for _ in range(P)]
+        for ID in range(1, P + 1):
+            pa_side, player_side = socket.socketpair()
+            threading.Thread(target=simulated_player, args=(ID, player_side, delays[ID - 1]), daemon=True).start()
+            threading.Thread(target=route, args=(table, pa_side), daemon=True).start()
+            table.connected_players[ID] = {"socket": pa_side}
+
+        start = time.perf_counter()
+        sequential_round(table, frame)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replies = table.loop.run_until_complete(parea.gather_replies(table, frame, proto.Verify_Deck_OK, "Post_Final_Decks"))
+        concurrent = time.perf_counter() - start
+        assert len(replies) == P
+
+        print(f"{P:>8}{max(delays):>13.3f}{sum(delays):>10.3f}{sequential:>16.3f}{concurrent:>20.3f}{sequential / concurrent:>9.1f}x")
+
+        for player in table.connected_players.values():
+            player["socket"].shutdown(socket.SHUT_RDWR)
+
+
+if __name__ == '__main__':
+    main()
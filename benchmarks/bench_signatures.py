@@ -0,0 +1,49 @@
+#!/bin/python
+"""
+Throughput of every signature suite of security.security: key pairs generated, messages signed and signatures verified
+per second, along with the size of the signatures, for a Message_Deck of N cards as signed by the Playing Area.
+"""
+import os
+import sys
+import time
+import base64
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+
+
+def rate(operation, seconds):
+    """ Runs operation over and over for about the given time. :return: the number of runs per second """
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        operation()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option('--cards', '-N', default="60,10000", help='Comma separated sizes of the signed Message_Deck')
+@click.option('--seconds', '-s', default=1.0, type=float, help='Time spent on each measurement')
+def main(cards, seconds):
+    # The same signatures are verified over and over: each of them is checked in full, not found in the cache of verify_signature
+    secure.VERIFICATIONS.maxsize = 0
+    print(f"{'Suite':>9}{'N':>7}{'keygen/s':>10}{'sign/s':>10}{'verify/s':>10}{'signature (B)':>15}")
+    for name in secure.SUITES:
+        keygen = rate(lambda: secure.gen_assymetric_key(name), seconds)
+        private_key, public_key = secure.gen_assymetric_key(name)
+        for N in [int(count) for count in cards.split(",")]:
+            message = proto.Message_Deck(None, [base64.b64encode(os.urandom(32)).decode() for _ in range(N)])
+            signature = secure.sign_message(message, private_key)
+            sign = rate(lambda: secure.sign_message(message, private_key), seconds)
+            verify = rate(lambda: secure.verify_signature(message, signature, public_key), seconds)
+            print(f"{name:>9}{N:>7}{keygen:>10.0f}{sign:>10.0f}{verify:>10.0f}{len(signature) // 2:>15}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/bin/python
+"""
+Progress of the other connections of the Playing Area while some clients are deliberately slow: each slow client sends
+its messages a few bytes at a time, while the other clients keep asking for the list of Players of their tables.
+The threaded dispatch reads a whole frame from a socket before serving the next one, while the asyncio mode only
+holds back the coroutine of the slow client.
+"""
+import sys
+import time
+import socket
+import threading
+import statistics
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+from bench_tables import software_card, card_signature, start_playing_area
+
+
+def register(port, card):
+    """ Opens a table of the Playing Area as its Caller. :return: the socket, and a signed Get_Players_List frame """
+    private_key, public_key = secure.gen_assymetric_key()
+    connection = socket.create_connection(("127.0.0.1", port))
+    message = proto.RegisterMessage("Caller", public_key, nick="caller", num_players=4)
+    proto.Protocol.send_msg(connection, proto.CertMessage(message, card_signature(card[0], message), card[1]))
+    reply = proto.Protocol.recv_msg(connection)[0]
+    assert isinstance(reply, proto.Register_ACK)
+
+    request = proto.Get_Players_List(0)
+    frame = proto.Frame(proto.SignedMessage(request, secure.sign_message(request, private_key)))
+    return connection, frame.encoded()
+
+
+def fast_client(connection, frame, deadline, latencies):
+    """ Asks for the list of Players, one request after the other, until the deadline. """
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        connection.sendall(frame)
+        proto.Protocol.recv_msg(connection)
+        latencies.append(time.perf_counter() - start)
+
+
+def slow_client(connection, frame, deadline, chunk, drip):
+    """ Sends the same request chunk bytes at a time, every drip seconds, until the deadline. """
+    try:
+        while time.perf_counter() < deadline:
+            for offset in range(0, len(frame), chunk):
+                connection.sendall(frame[offset:offset + chunk])
+                time.sleep(drip)
+            proto.Protocol.recv_msg(connection)
+    except OSError:
+        # The Playing Area was stopped at the end of the measurement
+        pass
+
+
+def measure(mode, fast, slow, seconds, chunk, drip, card):
+    process, port = start_playing_area(*(["--asyncio"] if mode == "asyncio" else []))
+    try:
+        fast_clients = [register(port, card) for _ in range(fast)]
+        slow_clients = [register(port, card) for _ in range(slow)]
+
+        deadline = time.perf_counter() + seconds
+        latencies = []
+        threads = [threading.Thread(target=fast_client, args=(connection, frame, deadline, latencies)) for connection, frame in fast_clients]
+        threads += [threading.Thread(target=slow_client, args=(connection, frame, deadline, chunk, drip), daemon=True) for connection, frame in slow_clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads[:fast]:
+            thread.join()
+        return len(latencies) / seconds, statistics.median(latencies), max(latencies)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@click.command()
+@click.option('--fast', default=8, type=int, help='Clients asking for the list of Players as fast as they can')
+@click.option('--slow', default="0,1,4", help='Comma separated numbers of slow clients')
+@click.option('--seconds', '-s', default=5.0, type=float, help='Duration of each measurement')
+@click.option('--chunk', default=16, type=int, help='Bytes sent at a time by the slow clients')
+@click.option('--drip', default=0.05, type=float, help='Seconds between the chunks sent by the slow clients')
+def main(fast, slow, seconds, chunk, drip):
+    card = software_card("ARISTIDES VAS", "BI096890913")
+    print(f"{'Mode':>8}{'slow clients':>14}{'requests/s':>12}{'median (ms)':>13}{'max (ms)':>10}")
+    for S in [int(count) for count in slow.split(",")]:
+        for mode in ("threads", "asyncio"):
+            rate, median, worst = measure(mode, fast, S, seconds, chunk, drip, card)
+            print(f"{mode:>8}{S:>14}{rate:>12.1f}{median * 1000:>13.2f}{worst * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
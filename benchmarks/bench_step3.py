@@ -0,0 +1,55 @@
+#!/bin/python
+"""
+Wall time of the decryption of Step 3, as done by Caller.decrypt and Player.decrypt, against the number of threads: every
+layer decrypted one after the other with decrypt_deck, against decrypt_layers sharing the chunks of every layer among a
+pool of threads.
+"""
+import os
+import sys
+import time
+import random
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import security.security as secure
+
+
+def encrypted_layers(players, N, cipher):
+    """ The decks of a game, as the Caller and each Player encrypted and shuffled them. :return: a list of (deck, key, flag) """
+    layers = []
+    deck = random.sample(range(N), N)
+    for user in range(players + 1):
+        key = secure.gen_symmetric_key()
+        deck = random.sample(secure.encrypt_deck(deck, key, cipher), N)
+        layers.append((deck, key, 1 if user == 0 else 0))
+    # From the Player with the highest ID down to the Caller
+    return list(reversed(layers))
+
+
+@click.command()
+@click.option('--players', '-P', default=8, type=int, help='Number of Players (each adds a layer)')
+@click.option('--cards', '-N', default=100000, type=int, help='Size of the deck')
+@click.option('--workers', default="1,2,4,8", help='Comma separated numbers of threads')
+@click.option('--cipher', default=secure.CBC_CIPHER, type=click.Choice(secure.DECK_CIPHERS), help='Layered encryption of the deck')
+def main(players, cards, workers, cipher):
+    layers = encrypted_layers(players, cards, cipher)
+    print(f"cores available: {os.cpu_count()}, layers: {len(layers)}, N: {cards}")
+
+    start = time.perf_counter()
+    expected = [secure.decrypt_deck(deck, key, flag, cipher) for deck, key, flag in layers]
+    sequential = time.perf_counter() - start
+    print(f"{'threads':>8}{'sequential (s)':>16}{'decrypt_layers (s)':>20}{'speed-up':>10}")
+
+    for W in [int(count) for count in workers.split(",")]:
+        start = time.perf_counter()
+        decrypted = secure.decrypt_layers(layers, cipher, workers=W)
+        elapsed = time.perf_counter() - start
+        assert decrypted == expected
+        print(f"{W:>8}{sequential:>16.3f}{elapsed:>20.3f}{sequential / elapsed:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
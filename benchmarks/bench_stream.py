@@ -0,0 +1,109 @@
+#!/bin/python
+"""
+Time to winner of Step 4: from the moment the Caller starts it to the moment it announces the winners, with the batch play,
+where every Player finds the winners from the whole deck and the Caller waits for all of them, against the streaming play,
+where the numbers are called a batch at a time and the Caller only waits for the Bingo claims of the winners.
+One of the Players can be made a straggler, taking some time before it starts Step 4, as a slow device would.
+Uses the Playing Area and the software Citizen Cards of bench_tables.py.
+"""
+import os
+import sys
+import time
+import threading
+import click
+
+from bench_tables import CARD, software_card, card_sign_message, start_playing_area, play, vsc, Caller, Player
+
+import messages.protocol as proto
+
+
+def timed(method, times, key):
+    """ Wraps a method of a client, recording in times[key] when it is first called. """
+    def wrapper(*args, **kwargs):
+        times.setdefault(key, time.perf_counter())
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def delayed(method, delay):
+    """ Wraps a method of a Player, sleeping for delay seconds the first time it is called. """
+    slept = []
+    def wrapper(*args, **kwargs):
+        if len(slept) == 0:
+            slept.append(True)
+            time.sleep(delay)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def play_game(port, players, N, mode, batch, straggler, software_cards):
+    """ :return: the time to winner, and the numbers the Caller called, or None if the game did not get to Step 4 """
+    times = {}
+    caller = Caller("caller", port, N, players, play=mode, batch=batch)
+    caller.find_winner = timed(caller.find_winner, times, "start")
+    caller.call_numbers = timed(caller.call_numbers, times, "start")
+    caller.end_game = timed(caller.end_game, times, "end")
+    CARD.value = software_cards["caller"]
+    caller.connect()
+
+    outcome = {}
+    threads = [threading.Thread(target=play, args=(caller, software_cards["caller"], outcome))]
+    for number in range(players):
+        player = Player(f"player{number}", port, table=caller.table)
+        if number == 0 and straggler > 0:
+            player.find_winner = delayed(player.find_winner, straggler)
+            player.mark_numbers = delayed(player.mark_numbers, straggler)
+        CARD.value = software_cards["player"]
+        player.connect()
+        threads.append(threading.Thread(target=play, args=(player, software_cards["player"], outcome)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if "start" not in times or "end" not in times:
+        return None
+    calls = caller.tracker.calls if caller.tracker is not None else len(caller.playing_deck)
+    return times["end"] - times["start"], calls
+
+
+@click.command()
+@click.option('--players', default=4, type=int, help='Players at the table')
+@click.option('--cards', '-N', default=60, type=int, help='Size of the deck')
+@click.option('--games', '-g', default=5, type=int, help='Games played with each play and straggler delay')
+@click.option('--batch', default=5, type=int, help='Numbers called in each batch of the streaming play')
+@click.option('--straggler', default="0,0.5", help='Comma separated delays, in seconds, of the straggler Player')
+def main(players, cards, games, batch, straggler):
+    software_cards = {"caller": software_card("ARISTIDES VAS", "BI096890913"), "player": software_card("PLAYER", "BI000000000")}
+    process, port = start_playing_area()
+    vsc.get_cert_data = lambda: CARD.value[1]
+    vsc.sign_message = card_sign_message
+
+    print(f"{'straggler (s)':>14}{'play':>8}{'games':>7}{'numbers called':>16}{'time to winner (ms)':>21}")
+    stdout = sys.stdout
+    try:
+        for delay in [float(seconds) for seconds in straggler.split(",")]:
+            for mode in proto.PLAY_MODES:
+                results = []
+                for game in range(games):
+                    sys.stdout = open(os.devnull, "w")
+                    try:
+                        result = play_game(port, players, cards, mode, batch, delay, software_cards)
+                    finally:
+                        sys.stdout.close()
+                        sys.stdout = stdout
+                    if result is not None:
+                        results.append(result)
+
+                if len(results) == 0:
+                    print(f"{delay:>14.2f}{mode:>8}{0:>7}")
+                    continue
+                called = sum(calls for elapsed, calls in results) / len(results)
+                elapsed = sum(elapsed for elapsed, calls in results) / len(results)
+                print(f"{delay:>14.2f}{mode:>8}{len(results):>7}{called:>16.1f}{elapsed * 1000:>21.1f}")
+    finally:
+        process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/bin/python
+"""
+Load test of the multi-table Playing Area: games played per minute with 1, 10 and 50 tables playing at the same time.
+Games the Caller ends because the shuffling was compromised count as played, games left waiting for a reply do not.
+The Playing Area runs in its own process and the Caller and Players of each table in another one, with a software
+Citizen Card (a self-signed certificate with the same subject fields) in place of the card reader.
+"""
+import os
+import sys
+import time
+import socket
+import hashlib
+import datetime
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+import click
+from pathlib import Path
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+from cryptography.hazmat.primitives.hashes import SHA1, SHA256
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+# The client modules, rather than the packages of the same name
+sys.path.insert(0, str(path_root / "caller"))
+sys.path.insert(0, str(path_root / "player"))
+
+import security.vsc_security as vsc
+from caller import Caller
+from player import Player
+
+CARD = threading.local()                            # Software Citizen Card of the client running in each thread
+
+
+def software_card(name, number):
+    """ Key and certificate of a software Citizen Card, with the subject fields read by get_name_and_number. """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name), x509.NameAttribute(NameOID.SERIAL_NUMBER, number)])
+    certificate = x509.CertificateBuilder().subject_name(subject).issuer_name(subject).public_key(key.public_key()) \
+        .serial_number(1).not_valid_before(datetime.datetime(2020, 1, 1)).not_valid_after(datetime.datetime(2100, 1, 1)) \
+        .sign(key, SHA256())
+    return key, certificate.public_bytes(serialization.Encoding.DER).hex()
+
+
+def card_signature(key, text):
+    # The card signs with CKM_SHA1_RSA_PKCS, over the SHA-1 digest validate_signature computes
+    digest = hashlib.sha1(text.__repr__().encode('utf-8')).digest()
+    return key.sign(digest, PKCS1v15(), SHA1()).hex()
+
+
+def card_sign_message(text):
+    return card_signature(CARD.value[0], text)
+
+
+def play(client, card, outcome):
+    """ Runs a client until its game is over, the way its loop does without the keyboard, and records how it ended. """
+    CARD.value = card
+    outcome[client] = "timeout"
+    try:
+        while not client.game_finished:
+            events = client.selector.select(timeout=30)
+            if len(events) == 0:
+                return
+            for key, mask in events:
+                key.data(key.fileobj)
+        outcome[client] = "finished"
+    except SystemExit:
+        # The Caller ends the game when the shuffling was compromised, and disqualified Players leave it
+        outcome[client] = "aborted"
+    finally:
+        client.socket.close()
+
+
+def play_table(port, players, N, games, software_cards, results):
+    """ Plays several games in a row at a table of the Playing Area, with one thread per client, and reports how the Caller saw each of them end. """
+    sys.stdout = open(os.devnull, "w")
+    vsc.get_cert_data = lambda: CARD.value[1]
+    vsc.sign_message = card_sign_message
+
+    for _ in range(games):
+        caller = Caller("caller", port, N, players)
+        CARD.value = software_cards["caller"]
+        caller.connect()
+
+        outcome = {}
+        threads = [threading.Thread(target=play, args=(caller, software_cards["caller"], outcome))]
+        for number in range(players):
+            player = Player(f"player{number}", port, table=caller.table)
+            CARD.value = software_cards["player"]
+            player.connect()
+            threads.append(threading.Thread(target=play, args=(player, software_cards["player"], outcome)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results.put(outcome[caller])
+
+
+def start_playing_area(*options):
+    """ Starts the Playing Area in a process of its own, on a free port, and waits for it to accept connections. :return: the process and its port """
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    process = subprocess.Popen([sys.executable, str(path_root / "playing_area" / "parea.py"), "-p", str(port), *options],
+                               cwd=tempfile.mkdtemp(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while process.poll() is None:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return process, port
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+    raise RuntimeError("The Playing Area did not start")
+
+
+@click.command()
+@click.option('--tables', default="1,10,50", help='Comma separated numbers of tables playing at the same time')
+@click.option('--players', default=4, type=int, help='Players at each table')
+@click.option('--cards', '-N', default=60, type=int, help='Size of the deck')
+@click.option('--games', '-g', default=2, type=int, help='Games played in a row at each table')
+@click.option('--asyncio', 'use_asyncio', is_flag=True, help='Run the Playing Area in its asyncio mode')
+def main(tables, players, cards, games, use_asyncio):
+    software_cards = {"caller": software_card("ARISTIDES VAS", "BI096890913"), "player": software_card("PLAYER", "BI000000000")}
+    process, port = start_playing_area(*(["--asyncio"] if use_asyncio else []))
+
+    print(f"{'Tables':>7}{'games':>7}{'finished':>10}{'aborted':>9}{'timeout':>9}{'elapsed (s)':>13}{'games/minute':>14}")
+    try:
+        for T in [int(count) for count in tables.split(",")]:
+            results = multiprocessing.Queue()
+            clients = [multiprocessing.Process(target=play_table, args=(port, players, cards, games, software_cards, results)) for _ in range(T)]
+            start = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - start
+
+            outcomes = [results.get() for _ in range(T * games)]
+            over = outcomes.count("finished") + outcomes.count("aborted")
+            print(f"{T:>7}{T * games:>7}{outcomes.count('finished'):>10}{outcomes.count('aborted'):>9}{outcomes.count('timeout'):>9}"
+                  f"{elapsed:>13.2f}{over * 60 / elapsed:>14.1f}")
+    finally:
+        process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/bin/python
+"""
+Hit rate and CPU time saved by the cache of verify_signature (security.VERIFICATIONS) over the signature verifications of
+a game. A game is played once with the Playing Area, the Caller and the Players in this process, recording every
+verification and who made it, and the recording is then replayed without the cache and with it:
+- apart, with a cache for each of them, as when every User and the Playing Area run in a process of their own;
+- shared, with a single cache for all of them, as when they share a process (this benchmark, the tests, or several
+  Users played from the same machine).
+Uses the software Citizen Cards of bench_tables.py.
+"""
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import collections
+import click
+
+from bench_tables import CARD, software_card, card_sign_message, play, vsc, Caller, Player, path_root
+
+sys.path.append(str(path_root / "playing_area"))
+
+# The Playing Area and the clients write their audit logs to the working directory
+os.chdir(tempfile.mkdtemp())
+
+import security.security as secure
+import parea
+
+PLAYING_AREA = "Playing Area"
+VERIFIER = threading.local()                        # Name of the User verifying in each thread, the Playing Area by default
+
+
+def recorded(verify, recording):
+    """ Wraps verify_signature, appending every verification to the recording as (verifier, message, signature, public key). """
+    def recorded_verify(message, signature, public_key):
+        recording.append((getattr(VERIFIER, "name", PLAYING_AREA), message, signature, public_key))
+        return verify(message, signature, public_key)
+    return recorded_verify
+
+
+def play_as(name, client, card, outcome):
+    VERIFIER.name = name
+    play(client, card, outcome)
+
+
+def record_game(players, N, software_cards):
+    """ Plays a game at a Playing Area started in a thread of this process. :return: the verifications it made """
+    with socket.socket() as server:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        port = server.getsockname()[1]
+        threading.Thread(target=parea.dispatch, args=(server,), daemon=True).start()
+
+        recording = []
+        verify, secure.verify_signature = secure.verify_signature, recorded(secure.verify_signature, recording)
+        try:
+            sys.stdout = open(os.devnull, "w")
+            VERIFIER.name = "Caller"
+            caller = Caller("caller", port, N, players)
+            CARD.value = software_cards["caller"]
+            caller.connect()
+            outcome = {}
+            threads = [threading.Thread(target=play_as, args=("Caller", caller, software_cards["caller"], outcome))]
+            for number in range(players):
+                VERIFIER.name = f"Player {number}"
+                player = Player(f"player{number}", port, table=caller.table)
+                CARD.value = software_cards["player"]
+                player.connect()
+                threads.append(threading.Thread(target=play_as, args=(f"Player {number}", player, software_cards["player"], outcome)))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.stdout = sys.__stdout__
+            secure.verify_signature = verify
+            VERIFIER.name = PLAYING_AREA
+    return recording
+
+
+def replay(verifications, cached):
+    """ Verifies the recorded verifications again. :return: the CPU seconds it took """
+    secure.VERIFICATIONS.maxsize = secure.VERIFICATIONS_CACHE_SIZE if cached else 0
+    start = time.thread_time()
+    for verifier, message, signature, public_key in verifications:
+        secure.verify_signature(message, signature, public_key)
+    return time.thread_time() - start
+
+
+def measure(groups, repeat):
+    """ Replays each group of verifications with a cache of its own. :return: the CPU seconds without and with the cache, the hits and the misses """
+    times = {False: 0, True: 0}
+    hits = misses = 0
+    for round in range(repeat):
+        for verifications in groups:
+            # Each mode goes first every other round
+            for cached in ((False, True) if round % 2 == 0 else (True, False)):
+                secure.VERIFICATIONS.cache_clear()
+                times[cached] += replay(verifications, cached)
+                if cached:
+                    info = secure.VERIFICATIONS.cache_info()
+                    hits, misses = hits + info.hits, misses + info.misses
+    return times[False] / repeat, times[True] / repeat, hits, misses
+
+
+@click.command()
+@click.option('--players', default=4, type=int, help='Players at the table')
+@click.option('--cards', '-N', default=60, type=int, help='Size of the deck')
+@click.option('--repeat', '-r', default=5, type=int, help='Times the recorded game is replayed for each measure')
+def main(players, cards, repeat):
+    software_cards = {"caller": software_card("ARISTIDES VAS", "BI096890913"), "player": software_card("PLAYER", "BI000000000")}
+    vsc.get_cert_data = lambda: CARD.value[1]
+    vsc.sign_message = card_sign_message
+
+    recording = record_game(players, cards, software_cards)
+    by_verifier = collections.defaultdict(list)
+    for verification in recording:
+        by_verifier[verification[0]].append(verification)
+    print(f"Game of {players} Players and N = {cards}: {len(recording)} verifications, "
+          + ", ".join(f"{len(verifications)} by the {verifier}" for verifier, verifications in by_verifier.items()))
+
+    print(f"{'Caches':>8}{'hits':>7}{'misses':>8}{'hit rate':>10}{'uncached (ms)':>15}{'cached (ms)':>13}{'CPU saved':>11}")
+    for name, groups in (("apart", list(by_verifier.values())), ("shared", [recording])):
+        uncached, cached, hits, misses = measure(groups, repeat)
+        print(f"{name:>8}{hits // repeat:>7}{misses // repeat:>8}{hits / (hits + misses):>9.0%}{uncached * 1e3:>15.1f}"
+              f"{cached * 1e3:>13.1f}{1 - cached / uncached:>10.0%}")
+    secure.VERIFICATIONS.maxsize = secure.VERIFICATIONS_CACHE_SIZE
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/bin/python
+"""
+Signature verifications per second of security.verify_signature, loading the PEM public key on every call as it was
+done before, against the loaded keys kept by security.load_public_key, for the messages of a game signed by a few keys.
+"""
+import sys
+import time
+import random
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+import security.security as secure
+
+
+def uncached(verify):
+    """ verify_signature as it was before, parsing the PEM string of the key on every call. """
+    def uncached_verify(message, signature, public_key):
+        cached, secure.load_public_key = secure.load_public_key, secure.load_public_key.__wrapped__
+        try:
+            return verify(message, signature, public_key)
+        finally:
+            secure.load_public_key = cached
+    return uncached_verify
+
+
+def signed_messages(keys, count):
+    """ Messages of a game, each signed by one of the keys. :return: a list of (message, signature, public key) """
+    messages = []
+    for number in range(count):
+        private_key, public_key = random.choice(keys)
+        message = proto.Verify_Card_OK(number)
+        messages.append((message, secure.sign_message(message, private_key), public_key))
+    return messages
+
+
+def measure(verify, messages, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for message, signature, public_key in messages:
+            assert verify(message, signature, public_key)
+        count += len(messages)
+    return count / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option('--keys', '-k', default="5,50", help='Comma separated numbers of signing keys (the Playing Area, the Caller and the Players)')
+@click.option('--seconds', '-s', default=2.0, type=float, help='Time spent on each measurement')
+def main(keys, seconds):
+    # The same signatures are verified over and over: each of them is checked in full, not found in the cache of verify_signature
+    secure.VERIFICATIONS.maxsize = 0
+    print(f"{'Keys':>6}{'uncached (verifications/s)':>28}{'cached (verifications/s)':>26}{'speed-up':>10}")
+    for K in [int(count) for count in keys.split(",")]:
+        messages = signed_messages([secure.gen_assymetric_key() for _ in range(K)], 100)
+        before = measure(uncached(secure.verify_signature), messages, seconds)
+        cached = measure(secure.verify_signature, messages, seconds)
+        print(f"{K:>6}{before:>28.0f}{cached:>26.0f}{cached / before:>9.2f}x")
+    print(secure.load_public_key.cache_info())
+
+
+if __name__ == '__main__':
+    main()
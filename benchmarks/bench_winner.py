@@ -0,0 +1,70 @@
+#!/bin/python
+"""
+Time to find the winners of a game with many Players: the scan Caller.find_winner did before, checking every card for every
+number called and removing it from the list, against the inverted index of game.engine.WinnerEngine. The list scan is stopped
+after a time budget, and its total time estimated from the calls it got through.
+"""
+import sys
+import time
+import random
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+from game.engine import WinnerEngine
+
+
+def list_scan(cards, deck, budget):
+    """ The previous Caller.find_winner, on copies of the cards. :return: the winners, and the calls made before the budget ran out """
+    cards = {player: list(card) for player, card in cards.items()}
+    winners = []
+    start = time.perf_counter()
+    for call, number in enumerate(deck, 1):
+        for player in cards:
+            if number in cards[player]:
+                cards[player].remove(number)
+            if len(cards[player]) == 0:
+                winners.append(player)
+        if len(winners) != 0 or time.perf_counter() - start > budget:
+            return winners, call
+    return winners, len(deck)
+
+
+@click.command()
+@click.option('--players', '-P', default=10000, type=int, help='Number of Players')
+@click.option('--cards', '-N', default=100000, type=int, help='Size of the deck')
+@click.option('--card-size', '-c', default=100, type=int, help='Numbers in each Playing Card (N/4 in a game)')
+@click.option('--budget', default=10.0, type=float, help='Seconds the list scan is given before its time is estimated')
+def main(players, cards, card_size, budget):
+    deck = random.sample(range(cards), cards)
+    playing_cards = {player: random.sample(range(cards), card_size) for player in range(1, players + 1)}
+
+    start = time.perf_counter()
+    engine = WinnerEngine(playing_cards)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    winners, last_call = engine.winners(deck)
+    search = time.perf_counter() - start
+    start = time.perf_counter()
+    completions = engine.completions(deck)
+    every_card = time.perf_counter() - start
+    assert min(completions.values()) == last_call
+
+    start = time.perf_counter()
+    scan_winners, calls = list_scan(playing_cards, deck, budget)
+    scan = time.perf_counter() - start
+    if calls == last_call:
+        assert scan_winners == winners
+    else:
+        scan = scan * last_call / calls
+
+    print(f"Players: {players}, N: {cards}, card size: {card_size}, winners: {winners} at call #{last_call}")
+    print(f"{'index build (s)':>16}{'winners (s)':>13}{'every card (s)':>16}{'list scan (s)':>15}{'speed-up':>10}")
+    print(f"{build:>16.3f}{search:>13.3f}{every_card:>16.3f}{scan:>15.1f}{'' if calls == last_call else ' (est.)'}"
+          f"{scan / (build + search):>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
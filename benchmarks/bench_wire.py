@@ -0,0 +1,60 @@
+#!/bin/python
+"""
+Size and throughput of the json and binary wire formats for the messages that carry decks and playing cards.
+"""
+import os
+import sys
+import time
+import click
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+import messages.protocol as proto
+
+
+def deck_messages(N, players):
+    """ The deck carrying messages of a game with N numbers, with entries of the size produced by encrypt_number. """
+    decks = {}
+    for layer in range(players + 1):
+        # 64 byte number, plus a 16 byte IV per encryption layer
+        decks[layer] = [os.urandom(64 + 16 * (layer + 1)) for _ in range(N)]
+    card = list(range(1, N // 4 + 1))
+
+    return [
+        proto.SignedMessage(proto.Message_Deck(None, decks[players]), "ab" * 256),
+        proto.SignedMessage(proto.Commit_Card(1, decks[1], card), "ab" * 256),
+        proto.SignedMessage(proto.Post_Final_Decks(0, {layer: {"deck": decks[layer], "sym_key": "A" * 44} for layer in decks}, decks[players]), "ab" * 256),
+    ]
+
+
+def measure(message, wire, seconds):
+    """ Encodes and decodes the message for the given time. :return: the frame size and the frames/sec """
+    data = proto.Protocol.encode(message, wire)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds or count == 0:
+        data = proto.Protocol.encode(message, wire)
+        proto.Protocol.decode(data)
+        count += 1
+    return len(data), count / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option('--sizes', '-N', default="60,10000,100000", help='Comma separated deck sizes to measure')
+@click.option('--players', default=4, type=int, help='Number of players shuffling the deck')
+@click.option('--seconds', '-s', default=1.0, type=float, help='Time spent on each measurement')
+def main(sizes, players, seconds):
+    print(f"{'N':>8} {'Message':<18}{'json (bytes)':>14}{'binary (bytes)':>16}{'saved':>8}{'json (MB/s)':>13}{'binary (MB/s)':>15}")
+    for N in [int(size) for size in sizes.split(",")]:
+        for message in deck_messages(N, players):
+            json_size, json_rate = measure(message, proto.JSON_WIRE, seconds)
+            binary_size, binary_rate = measure(message, proto.BINARY_WIRE, seconds)
+            # Throughput is measured over the payload of the json frame, so both columns count the same content
+            print(f"{N:>8} {message.message.command:<18}{json_size:>14,}{binary_size:>16,}{1 - binary_size / json_size:>8.0%}"
+                  f"{json_size * json_rate / 1e6:>13.1f}{json_size * binary_rate / 1e6:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,20 +15,27 @@ sys.path.append(str(path_root))
 import messages.protocol as proto
 import security.security as secure
 import security.vsc_security as vsc
+import security.audit as audit
+from game.engine import WinnerEngine, CardTracker
 
 class Caller:
     ADDRESS = '127.0.0.1'
 
-    def __init__(self, nick: str, port, N = 60, players = 4):
+    def __init__(self, nick: str, port, N = 60, players = 4, wire = proto.JSON_WIRE, table = None, suite = secure.DEFAULT_SUITE, cipher = secure.CBC_CIPHER, verification = proto.BULK_VERIFICATION, play = proto.BATCH_PLAY, batch = 5, auth = proto.SIGNATURE_AUTH):
         # Personal Information
         self.nick = nick
         self.port = port
         self.ID = 0
+        self.wire = wire                                                        # Wire format requested to the Playing Area
+        self.table = table                                                      # Table of the Playing Area hosting the game
 
         # Generated Keys
+        self.suite = suite                                                      # Signature suite of the assymetric key pair
         self.private_key = None
         self.public_key = None
         self.sym_key = None
+        self.auth = auth                                                        # Authentication of the messages of the game
+        self.session = None                                                     # Session key agreed with the Playing Area, in the MAC authentication
 
         # Game Information
         self.number_of_players = players
@@ -36,11 +43,18 @@ class Caller:
         self.PLAYERS_SHUFFLE = {}                                               # Dictionary holding the symmetric key and shuffled deck of each Player
         self.player_counter = 0                                                 # Counts already registered Players
         self.winners = []                                                       # The determined winners
+        self.claims = set()                                                     # Winners that claimed Bingo, in the streaming play
         self.playing_area_pk = None                                             # Playing Area Public Key
         self.game_finished = False                                              # Flag to determine if the game has finished
 
         # Playing Deck Information
         self.N = N                                                              # Size of the Playing Deck
+        self.cipher = cipher                                                    # Layered encryption of the Playing Deck
+        self.verification = verification                                        # Deck verification of Step 3
+        self.play = play                                                        # Play of Step 4
+        self.batch = batch                                                      # Numbers called in each Call_Numbers, in the streaming play
+        self.tracker = None                                                     # State of the Playing Cards while the numbers are called, in the streaming play
+        self.initial_digest = None                                              # Digest of the deck encrypted by the Caller, for the incremental verification
         self.initial_deck = []                                                  # Deck after shuffling in the first step of the shuffling process
         self.signed_final_deck = []                                             # Signed Deck at the end of the shuffling process
         self.playing_deck = []                                                  # Plaintext version of the final Playing Deck
@@ -62,7 +76,11 @@ class Caller:
         self.generate_keys()
 
         # Envio da Register Message à Playing Area
-        message = proto.RegisterMessage("Caller", self.public_key, nick=self.nick, num_players=self.number_of_players)
+        wire = self.wire if self.wire != proto.JSON_WIRE else None
+        suite = self.suite if self.suite != secure.DEFAULT_SUITE else None
+        # Ephemeral key to agree on a session key with the Playing Area, which the routine messages are then authenticated with
+        session_key, session = secure.gen_session_key() if self.auth == proto.MAC_AUTH else (None, None)
+        message = proto.RegisterMessage("Caller", self.public_key, nick=self.nick, num_players=self.number_of_players, wire=wire, table=self.table, suite=suite, session=session)
         signature = vsc.sign_message(message)
         certificate = vsc.get_cert_data()    
 
@@ -87,7 +105,25 @@ class Caller:
             exit()
         elif isinstance(msg, proto.Register_ACK):
             self.playing_area_pk = msg.pk
-            print("Register Accepted")
+            secure.register_public_keys(msg.pk)
+            proto.Protocol.set_wire(self.socket, msg.wire)
+            self.table = msg.table
+            if session_key is not None and msg.session is not None:
+                self.agree_session(session_key, msg, signature)
+            print(f"Register Accepted at table {self.table}")
+
+    def agree_session(self, session_key, msg, signature):
+        """
+        Agrees on a session key with the Playing Area, from the ephemeral key it sent in the Register_ACK.
+        """
+        if not secure.verify_signature(msg, signature, msg.pk):
+            # The ephemeral key is only trusted if the Playing Area signed it
+            print("The Register_ACK signature was forged! The game is compromised.")
+            print("Shutting down...")
+            self.socket.close()
+            exit()
+        self.session = secure.agree_session(session_key, msg.session)
+        proto.Protocol.set_session(self.socket, self.session)
 
 
     def read_data(self, socket):
@@ -110,12 +146,20 @@ class Caller:
         # Verify if the signature of the message belongs to the Playing Area
         if signature is not None:
             sender_ID = msg.ID
-            if sender_ID is None:
-                sender_pub_key = self.playing_area_pk
+            if sender_ID is not None and sender_ID not in self.PLAYERS:
+                # A message the Playing Area forwarded before learning the Player was disqualified
+                print(f"Ignoring a message from Player {sender_ID}, who was disqualified")
+                return
+
+            if isinstance(signature, proto.Mac):
+                # Routine messages are authenticated by the Playing Area, with the session key of the connection
+                valid = self.session is not None and not isinstance(msg, proto.SIGNED_MESSAGES) and self.session.verify(msg, signature)
+                sender_ID = None
             else:
-                sender_pub_key = self.PLAYERS[sender_ID]["pk"]
+                sender_pub_key = self.playing_area_pk if sender_ID is None else self.PLAYERS[sender_ID]["pk"]
+                valid = secure.verify_signature(msg, signature, sender_pub_key)
 
-            if not secure.verify_signature(msg, signature, sender_pub_key):
+            if not valid:
                 if sender_ID is None:
                     # If the Playing Area signature is faked, the game is compromised
                     print("The Playing Area signature was forged! The game is compromised.")
@@ -132,6 +176,7 @@ class Caller:
             # REGISTER MESSAGE WITH PLAYER INFORMATION
             self.player_counter += 1
             self.PLAYERS[self.player_counter] = {"nick": msg.nick, "pk": msg.pk}
+            secure.register_public_keys(msg.pk)
             self.PLAYERS_SHUFFLE[self.player_counter] = {"deck": None, "sym_key": None}
 
             print(f"Registered Player {self.player_counter} with nick {msg.nick}")
@@ -145,19 +190,25 @@ class Caller:
                 users[0] = self.public_key
                 # Add the other players public keys
                 users = {**users, **{user_id: self.PLAYERS[user_id]["pk"] for user_id in self.PLAYERS.keys()}}
-                msg = proto.Begin_Game(self.ID, users)
-                signature = secure.sign_message(msg, self.private_key)
-                reply = proto.SignedMessage(msg, signature)
-
-                proto.Protocol.send_msg(socket, reply)
+                cipher = self.cipher if self.cipher != secure.CBC_CIPHER else None
+                verification = self.verification if self.verification != proto.BULK_VERIFICATION else None
+                play = self.play if self.play != proto.BATCH_PLAY else None
+                msg = proto.Begin_Game(self.ID, users, cipher, verification, play)
 
                 # Gerar o deck e criar a mensagem para enviá-lo
-                reply = self.generate_deck()
+                deck = self.generate_deck()
                 print("Generated the Deck")
+
+                # Both messages go together, under a single signature
+                for message in self.signed_batch([msg, deck]):
+                    proto.Protocol.send_msg(socket, message)
         elif isinstance(msg, proto.Commit_Card):
             self.PLAYERS[msg.ID]["card"] = msg.card
             self.PLAYERS[msg.ID]["cheated"] = False
             self.PLAYERS_SHUFFLE[msg.ID]["deck"] = msg.deck
+            if self.verification == proto.INCREMENTAL_VERIFICATION:
+                # Hashed as it arrives, so Step 3 only has to send and compare the digest
+                self.PLAYERS_SHUFFLE[msg.ID]["digest"] = secure.deck_digest(msg.deck)
         elif isinstance(msg, proto.Message_Deck):
             # RECEIVED THE PLAYING DECK
             self.signed_final_deck = msg.deck
@@ -180,8 +231,8 @@ class Caller:
                 if self.PLAYERS[int(player)]["cheated"]:
                     cheaters.append(int(player))
 
-            for player in set(cheaters):
-                self.disqualify_player(int(player))
+            if len(cheaters) > 0:
+                self.disqualify_players(set(cheaters))
 
             if msg.stage == "Cards":
                 print("Verification process completed")
@@ -190,11 +241,32 @@ class Caller:
                 print("\nStep 3")
                 info = {}
                 info[0] = {"deck": self.initial_deck, "sym_key": self.sym_key}
-                for player in self.PLAYERS_SHUFFLE.keys():
+                # Players that did not shuffle the deck in time were left out of it
+                shufflers = [player for player in self.PLAYERS_SHUFFLE.keys() if self.PLAYERS_SHUFFLE[player]["deck"] is not None]
+                if any(self.PLAYERS_SHUFFLE[int(player)]["sym_key"] is None for player in shufflers):
+                    # A Player that shuffled the deck left without sharing its key, so its layer of the deck can not be removed
+                    print("The Playing Deck can not be recovered. This game can no longer go on.")
+                    self.selector.unregister(socket)
+                    socket.close()
+                    print('Shutting down...')
+                    exit()
+                for player in shufflers:
                     info[player] = {"deck": self.PLAYERS_SHUFFLE[int(player)]["deck"],
                                     "sym_key": self.PLAYERS_SHUFFLE[int(player)]["sym_key"]}
 
-                reply = proto.Post_Final_Decks(self.ID, info, self.signed_final_deck)
+                if self.verification == proto.INCREMENTAL_VERIFICATION:
+                    # The Players already hold the decks they check: only the deck of the Caller, to get the Playing Deck, the final deck and the digests go
+                    info[0]["digest"] = self.initial_digest
+                    for player in shufflers:
+                        info[player]["digest"] = self.PLAYERS_SHUFFLE[int(player)]["digest"]
+                    digests = {user_id: {"digest": layer["digest"], "sym_key": layer["sym_key"]} for user_id, layer in info.items()}
+                    digests[0]["deck"] = self.initial_deck
+                    if len(shufflers) > 0:
+                        # No Player checks the last shuffle but the first one, over the final deck
+                        digests[shufflers[-1]]["deck"] = info[shufflers[-1]]["deck"]
+                    reply = proto.Post_Final_Decks(self.ID, digests, [])
+                else:
+                    reply = proto.Post_Final_Decks(self.ID, info, self.signed_final_deck)
 
                 print("I will now start to decrypt the Deck and verify if anyone cheated")
                 self.decrypt(info)
@@ -207,8 +279,11 @@ class Caller:
                     socket.close()
                     print('Shutting down...')
                     exit()
-                reply = proto.Ask_For_Winner(self.ID)
-                self.find_winner()
+                if self.play == proto.STREAM_PLAY:
+                    reply = self.call_numbers(socket)
+                else:
+                    reply = proto.Ask_For_Winner(self.ID)
+                    self.find_winner()
         elif isinstance(msg, proto.Post_Sym_Keys):
             # Symmetric keys of all Players in the games
             print("Received the symmetric keys of the Players")
@@ -228,23 +303,34 @@ class Caller:
                     break
 
             if finished:
-                print("\nThe official winners are:")
-                for person in self.winners:
-                    nick = self.PLAYERS[person]["nick"]
-                    print(f"-> Player #{person}, {nick}")
-                if (len(self.winners) > 0):
-                    print("Congratulations!")
-                else:
-                    print("There are no winners, only cheaters")
-                self.game_finished = True
-                reply = proto.Winner_ACK(self.ID, self.winners)    
+                reply = self.end_game()
+        elif isinstance(msg, proto.Bingo):
+            player = int(msg.ID)
+            if self.tracker is None or self.game_finished:
+                print(f"Player {player} claimed Bingo outside of the streaming play")
+            elif msg.call != self.tracker.completed.get(player):
+                # The card of the Player does not complete at the call it claimed
+                print(f"Player {player} claimed a Bingo at call #{msg.call}, which its card does not have!")
+                self.disqualify_player(player)
+            elif player in self.winners:
+                print(f"Player {player} claimed Bingo at call #{msg.call}")
+                self.claims.add(player)
+            else:
+                print(f"Player {player} claimed Bingo at call #{msg.call}, after the winners")
+
+            if self.tracker is not None and not self.game_finished and self.claims.issuperset(self.winners):
+                reply = self.end_game()
         elif isinstance(msg, proto.Ask_Sym_Keys):
             sk = base64.b64encode(self.sym_key).decode()
             reply = proto.Post_Sym_Keys(self.ID, sk)
         elif isinstance(msg, proto.Disqualify):
-            # The PA as warned the Caller that someone forged a signature
-            print(f"Player {msg.disqualified_ID} has forged a signature. They are now disqualified")
-            self.disqualify_player(int(msg.disqualified_ID))
+            # The PA as warned the Caller that someone forged a signature, or did not reply in time
+            if int(msg.disqualified_ID) in self.PLAYERS:
+                print(f"The Playing Area has disqualified Player {msg.disqualified_ID}, who forged a signature or did not reply in time")
+                self.disqualify_player(int(msg.disqualified_ID))
+            if self.tracker is not None and not self.game_finished and self.claims.issuperset(self.winners):
+                # The winners still in the game have all claimed Bingo
+                reply = self.end_game()
         elif isinstance(msg, proto.Players_List):
             print("\nThe list of players is:")
             for player in msg.players:
@@ -262,16 +348,32 @@ class Caller:
 
         if reply != None:
             # There is a message to be sent
-            signature = secure.sign_message(reply, self.private_key)
-            new_message = proto.SignedMessage(reply, signature)
-            proto.Protocol.send_msg(socket, new_message)
+            proto.Protocol.send_msg(socket, self.signed(reply))
 
     def generate_keys(self):
         """
         Function responsible for the generation of this User's assymetric key pair
         :return:
         """
-        self.private_key, self.public_key = secure.gen_assymetric_key()
+        self.private_key, self.public_key = secure.gen_assymetric_key(self.suite)
+
+    def signed(self, msg):
+        """
+        :return: the message signed with my private key. With a session key, routine messages are left unsigned, as the
+        connection authenticates them with it when they are sent.
+        """
+        if self.session is not None and not isinstance(msg, proto.SIGNED_MESSAGES):
+            return proto.SignedMessage(msg, None)
+        return proto.SignedMessage(msg, secure.sign_message(msg, self.private_key))
+
+    def signed_batch(self, messages):
+        """
+        :return: the messages signed with my private key, with a single signature over the Merkle root of their digests.
+        With a session key, routine messages are left unsigned, as in signed.
+        """
+        batch = [msg for msg in messages if self.session is None or isinstance(msg, proto.SIGNED_MESSAGES)]
+        signatures = {id(msg): signature for msg, signature in zip(batch, secure.sign_batch(batch, self.private_key))}
+        return [proto.SignedMessage(msg, signatures.get(id(msg))) for msg in messages]
 
     def generate_deck(self):
         """
@@ -282,12 +384,11 @@ class Caller:
         self.sym_key = secure.gen_symmetric_key()
         self.initial_deck = random.sample(list(range(self.N)), self.N)
 
-        deck = list()
-        for number in self.initial_deck:
-            encrypted_number = base64.b64encode(secure.encrypt_number(number, self.sym_key)).decode('utf-8')
-            deck.append(encrypted_number)
+        deck = secure.encrypt_deck(self.initial_deck, self.sym_key, self.cipher)
 
         self.initial_deck = deck
+        if self.verification == proto.INCREMENTAL_VERIFICATION:
+            self.initial_digest = secure.deck_digest(deck)
         self.sym_key = base64.b64encode(self.sym_key).decode('utf-8')
 
         # Criar mensagem do tipo POST_INITIAL_DECK
@@ -307,26 +408,28 @@ class Caller:
         keys = sorted(decks, reverse=True)
         current_deck = list()
 
+        # Every layer is decrypted at once, with its key decoded a single time, before the decks are compared
+        layers = [(decks[key]["deck"], base64.b64decode(decks[key]["sym_key"]), 1 if key == 0 else 0) for key in keys]
+        decrypted_decks = secure.decrypt_layers(layers, self.cipher)
+
         # We start the decryption process by taking the Deck encrypted by the player with the highest ID, and working all the way down to the lowest ID
         for i in range(len(keys)):
             if i != 0:
                 # If there's a difference between the deck received in this step, and the deck determined after decryption in the previous step, the previous player cheated
                 # The only being compared is if the set of numbers in both decks are matching - order doesn't matter
-                dif = set(current_deck).difference(set([base64.b64decode(number) for number in decks[keys[i]]["deck"]]))
+                if "digest" in decks[keys[i]]:
+                    # Incremental verification: the deck was hashed when it arrived in Step 1
+                    cheated = secure.deck_digest(current_deck) != decks[keys[i]]["digest"]
+                else:
+                    cheated = len(set(current_deck).difference(set(decks[keys[i]]["deck"]))) > 0
 
-                if len(dif) > 0 and keys[i-1] in self.PLAYERS:
+                if cheated and keys[i-1] in self.PLAYERS:
                     self.PLAYERS[keys[i-1]]["cheated"] = True
                     nick = self.PLAYERS[keys[i-1]]["nick"]
                     print(f"Player {keys[i-1]}, {nick}, cheated!")
 
-            new_deck = list()
-            for number in decks[keys[i]]["deck"]:
-                flag = 1 if keys[i] == 0 else 0
-                decrypted_number = secure.decrypt_number(base64.b64decode(number), base64.b64decode(decks[keys[i]]["sym_key"]), flag)
-                new_deck.append(decrypted_number)
-
             # The new current_deck will be the deck resulting from the decryption of the deck signed by the current player being analysed
-            current_deck = new_deck 
+            current_deck = decrypted_decks[i]
 
         print("Final plaintext Deck: " + str(current_deck))
 
@@ -337,61 +440,108 @@ class Caller:
     def find_winner(self):
         print("\nStep 4")
         print("I will now call out all the numbers, and find the winner:")
-        counter = 0
-        for number in self.playing_deck:
-            counter += 1
+        engine = WinnerEngine({player: self.PLAYERS[player]["card"] for player in self.PLAYERS.keys()})
+        winners, last_call = engine.winners(self.playing_deck)
+
+        for counter, number in enumerate(self.playing_deck[:last_call], 1):
             print(f"#{counter}: {number}")
-            for player in self.PLAYERS.keys():
-                if number in self.PLAYERS[player]["card"]:
-                    self.PLAYERS[player]["card"].remove(number)
+        self.winners.extend(winners)
 
-                if len(self.PLAYERS[player]["card"]) == 0:
-                    self.winners.append(player)
+        for person in self.winners:
+            print(f"\nI determined {person} as a winner")
 
-            if len(self.winners) != 0:
+    def call_numbers(self, socket):
+        """
+        Streaming play of Step 4: calls out the numbers of the Playing Deck, a batch at a time, following the Playing Cards
+        as they go, and stops after the batch in which the first card completes. The winners then have to claim their Bingo.
+        :param socket: the socket of the Playing Area
+        :return: the Winner_ACK, if no card completes and the game is over, None otherwise
+        """
+        print("\nStep 4")
+        print(f"I will now call out the numbers, {self.batch} at a time:")
+        self.tracker = CardTracker({player: self.PLAYERS[player]["card"] for player in self.PLAYERS.keys()})
+
+        # No card completes if the Playing Deck is empty
+        winners, last_call = [], 0
+        for first in range(0, len(self.playing_deck), self.batch):
+            numbers = self.playing_deck[first:first + self.batch]
+            for counter, number in enumerate(numbers, first + 1):
+                print(f"#{counter}: {number}")
+
+            msg = proto.Call_Numbers(self.ID, numbers)
+            proto.Protocol.send_msg(socket, self.signed(msg))
+
+            self.tracker.call(numbers)
+            winners, last_call = self.tracker.first_completed(self.PLAYERS)
+            if len(winners) > 0:
                 break
 
+        self.winners.extend(winners)
         for person in self.winners:
-            print(f"\nI determined {person} as a winner")
+            print(f"\nI determined {person} as a winner, at call #{last_call}")
+
+        if len(self.winners) == 0:
+            return self.end_game()
+        return None
+
+    def end_game(self):
+        """
+        Announces the official winners.
+        :return: the Winner_ACK to be sent to the Players
+        """
+        print("\nThe official winners are:")
+        for person in self.winners:
+            nick = self.PLAYERS[person]["nick"]
+            print(f"-> Player #{person}, {nick}")
+        if (len(self.winners) > 0):
+            print("Congratulations!")
+        else:
+            print("There are no winners, only cheaters")
+        self.game_finished = True
+        return proto.Winner_ACK(self.ID, self.winners)
 
     def disqualify_player(self, player):
         """
 
         """
-        nick = self.PLAYERS[player]["nick"]
-        print(f"Player #{player}, {nick}, has been disqualified.")
+        self.disqualify_players([player])
 
-        # Create DISQUALIFY message
-        dsq_message = proto.Disqualify(player, self.ID)
-        signature = secure.sign_message(dsq_message, self.private_key)
-        new_message = proto.SignedMessage(dsq_message, signature)
-        proto.Protocol.send_msg(self.socket, new_message)
+    def disqualify_players(self, players):
+        """
+        Disqualifies several Players at once, with their Disqualify messages signed together.
+        """
+        for player in players:
+            nick = self.PLAYERS[player]["nick"]
+            print(f"Player #{player}, {nick}, has been disqualified.")
+
+        # Create DISQUALIFY messages
+        dsq_messages = [proto.Disqualify(player, self.ID) for player in players]
+        for message in self.signed_batch(dsq_messages):
+            proto.Protocol.send_msg(self.socket, message)
+
+        for player in players:
+            # Eliminate info about the player
+            self.PLAYERS.pop(int(player))
+
+            # If the player is in the winners list, take them off
+            if player in self.winners:
+                self.winners.remove(player)
 
-        # Eliminate info about the player
-        self.PLAYERS.pop(int(player))
         if self.PLAYERS == {}: # If there are no more players in the game, end it
             print("\nThere are no more players in the game. I will now end it.")
             self.selector.unregister(self.socket)
             self.socket.close()
             exit()
 
-        # If the player is in the winners list, take them off
-        if player in self.winners:
-            self.winners.remove(player)
-
     def got_keyboard_data(self, stdin):
         txt = stdin.read().strip()
         
         if txt == "1":
             msg = proto.Get_Players_List(self.ID)
-            signature = secure.sign_message(msg, self.private_key)
-            reply = proto.SignedMessage(msg, signature)
-            proto.Protocol.send_msg(self.socket, reply)
+            proto.Protocol.send_msg(self.socket, self.signed(msg))
         elif txt == "2":
-            f = open("security.log", "r")
-            content = f.read()
-            print(content)
-            f.close()
+            # Read through a memory map and an index, rather than all at once
+            audit.show_log("security.log")
         elif txt == "3":
             print("Shutting down...")
             self.selector.unregister(self.socket)
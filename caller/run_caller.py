@@ -1,4 +1,4 @@
-from caller import Caller
+from caller import Caller, proto, secure
 import click
 
 @click.command()
@@ -6,8 +6,16 @@ import click
 @click.option('--port', '-p', type=int, required=True, help='Port to connect to the Playing Area')
 @click.option('--cards', '-N', default=60, type=click.IntRange(0, 100), help='Number of cards (N) to be used')
 @click.option('--players', default=4, type=click.IntRange(0, 6), help='Number of players to accept in the game')
-def main(nick, port, cards, players):
-    c = Caller(nick, port, cards, players)
+@click.option('--wire', default=proto.JSON_WIRE, type=click.Choice(proto.WIRE_FORMATS), help='Wire format to request to the Playing Area')
+@click.option('--table', '-t', default=None, type=int, help='Table to open in the Playing Area (a free one is chosen by default)')
+@click.option('--suite', default=secure.DEFAULT_SUITE, type=click.Choice(list(secure.SUITES)), help='Signature suite of the keys used to sign the messages of the game')
+@click.option('--cipher', default=secure.CBC_CIPHER, type=click.Choice(secure.DECK_CIPHERS), help='Layered encryption of the deck: AES-CBC, growing 16 bytes per Player, or a single AES block')
+@click.option('--verification', default=proto.BULK_VERIFICATION, type=click.Choice(proto.VERIFICATION_MODES), help='Deck verification of Step 3: every layer by every User, or each shuffle by the next Player and the Caller')
+@click.option('--play', default=proto.BATCH_PLAY, type=click.Choice(proto.PLAY_MODES), help='Play of Step 4: every User finds the winners from the whole deck, or the numbers are called a batch at a time and the Players claim Bingo')
+@click.option('--batch', default=5, type=click.IntRange(1), help='Numbers called in each batch of the streaming play')
+@click.option('--auth', default=proto.SIGNATURE_AUTH, type=click.Choice(proto.AUTH_MODES), help='Authentication of the messages of the game: every message signed, or the routine ones with HMAC session keys agreed at registration')
+def main(nick, port, cards, players, wire, table, suite, cipher, verification, play, batch, auth):
+    c = Caller(nick, port, cards, players, wire, table, suite, cipher, verification, play, batch, auth)
     c.connect()
     c.loop()
 
@@ -0,0 +1,209 @@
+try:
+    import numpy
+except ImportError:
+    # numpy is optional: without it, CardEngine works on lists
+    numpy = None
+
+
+class WinnerEngine:
+    """
+    Finds the winners of a game from the Playing Cards of the Players and the Playing Deck.
+    An inverted index of the cards, from each number to the Players whose card holds it, and a counter of the numbers left in
+    each card are built once, so every number called only touches the cards that hold it. The cards themselves are not changed.
+    """
+
+    def __init__(self, cards):
+        """
+        :param cards: dictionary holding the Playing Card of each Player {player: [numbers]}
+        """
+        self.players = list(cards.keys())                                       # Players, in the order their winners are reported
+        self.index = {}                                                         # Players whose card holds each number {number: [players]}
+        self.remaining = {}                                                     # Numbers of each card not called yet {player: count}
+
+        for player, card in cards.items():
+            # A number repeated in a card is only called once, so that card never completes
+            self.remaining[player] = len(card)
+            for number in set(card):
+                self.index.setdefault(number, []).append(player)
+
+    def completions(self, deck):
+        """
+        Calls out every number of the deck.
+        :param deck: the Playing Deck, in the order its numbers are called
+        :return: the call, counted from 1, at which the card of each Player completes {player: call}, for the cards that do
+        """
+        remaining = dict(self.remaining)
+        completed = {player: 1 for player, count in remaining.items() if count == 0} if len(deck) > 0 else {}
+
+        for call, number in enumerate(deck, 1):
+            for player in self.index.get(number, ()):
+                remaining[player] -= 1
+                if remaining[player] == 0:
+                    completed[player] = call
+        return completed
+
+    def winners(self, deck):
+        """
+        Calls out the numbers of the deck until a card is complete.
+        :param deck: the Playing Deck, in the order its numbers are called
+        :return: the Players whose card completes first, and the call, counted from 1, at which they do (None if no card completes)
+        """
+        # Empty cards are complete from the first call on
+        completed = set(player for player, count in self.remaining.items() if count == 0)
+        remaining = dict(self.remaining)
+        for call, number in enumerate(deck, 1):
+            for player in self.index.get(number, ()):
+                remaining[player] -= 1
+                if remaining[player] == 0:
+                    completed.add(player)
+            if len(completed) > 0:
+                return [player for player in self.players if player in completed], call
+        return [], None
+
+
+class CardTracker(WinnerEngine):
+    """
+    Follows the Playing Cards while the numbers are called, a batch at a time, for the streaming play of Step 4.
+    It keeps the counters of the numbers left in each card from one batch to the next, so each batch only touches the cards holding its numbers.
+    """
+
+    def __init__(self, cards):
+        """
+        :param cards: dictionary holding the Playing Card of each Player {player: [numbers]}
+        """
+        super().__init__(cards)
+        self.left = dict(self.remaining)                                        # Numbers of each card not called yet {player: count}
+        self.calls = 0                                                          # Numbers called so far
+        self.completed = {}                                                     # Call at which each card completed {player: call}
+
+    def call(self, numbers):
+        """
+        Calls out the next numbers of the deck.
+        :param numbers: the numbers called, in order
+        :return: the call, counted from 1, at which each card completed with these numbers {player: call}
+        """
+        completed = {}
+        for number in numbers:
+            self.calls += 1
+            if self.calls == 1:
+                # Empty cards are complete from the first call on
+                completed.update({player: 1 for player, count in self.left.items() if count == 0})
+            for player in self.index.get(number, ()):
+                self.left[player] -= 1
+                if self.left[player] == 0:
+                    completed[player] = self.calls
+        self.completed.update(completed)
+        return completed
+
+    def first_completed(self, players=None):
+        """
+        :param players: the Players still in the game, all of them by default
+        :return: the Players whose card completed first, in the order of the cards, and the call at which they did (None if no card completed yet)
+        """
+        calls = {player: call for player, call in self.completed.items() if players is None or player in players}
+        if len(calls) == 0:
+            return [], None
+        first = min(calls.values())
+        return [player for player in self.players if calls.get(player) == first], first
+
+
+class CardEngine:
+    """
+    Checks and plays the Playing Cards of every Player at once, from a matrix with a row per card.
+    The call at which a card completes is the latest call of its numbers, so the winners are the cards with the earliest one:
+    with numpy the matrix is an integer array and every step works on all the cards at once, otherwise the cards are lists.
+    """
+    NEVER = 2 ** 62                                                             # Call of the numbers that are never called
+
+    def __init__(self, cards):
+        """
+        :param cards: dictionary holding the Playing Card of each Player {player: [numbers]}
+        """
+        self.players = list(cards.keys())                                       # Players, in the order of the rows
+        self.cards = list(cards.values())                                       # The cards themselves are not changed
+        self.matrix = None                                                      # Cards padded with -1 to the longest one, with numpy
+        self.lengths = None
+
+        # numpy would turn strings and floats into integers: only cards of integers (not booleans) become a matrix, so a
+        # card is flagged the same way whether numpy is installed or not
+        integers = all(type(number) is int for card in self.cards for number in card)
+        if numpy is not None and len(self.cards) > 0 and integers:
+            try:
+                self.lengths = numpy.array([len(card) for card in self.cards], dtype=numpy.int64)
+                width = int(self.lengths.max())
+                full = self.lengths == width
+                if full.all():
+                    self.matrix = numpy.array(self.cards, dtype=numpy.int64).reshape(len(self.cards), width)
+                else:
+                    # The cards of the longest size are copied at once, and the shorter ones one by one
+                    self.matrix = numpy.full((len(self.cards), width), -1, dtype=numpy.int64)
+                    rows = numpy.flatnonzero(full)
+                    self.matrix[rows] = numpy.array([self.cards[row] for row in rows], dtype=numpy.int64).reshape(len(rows), width)
+                    for row in numpy.flatnonzero(~full):
+                        self.matrix[row, :self.lengths[row]] = self.cards[row]
+            except (TypeError, ValueError, OverflowError):
+                # Numbers that do not fit in the array are checked as lists
+                self.matrix = None
+
+    def invalid(self, N):
+        """
+        Checks every card: it must hold N/4 different numbers, from 0 to N (the cards are drawn from 1 to N, and the deck from 0 to N-1).
+        :param N: the size of the Playing Deck
+        :return: the Players whose card is not valid
+        """
+        size = int(N/4)
+        if self.matrix is None:
+            return [player for player, card in zip(self.players, self.cards)
+                    if len(card) != size or len(set(card)) != size or not all(type(number) is int and 0 <= number <= N for number in card)]
+
+        numbers = numpy.arange(self.matrix.shape[1]) < self.lengths[:, None]    # Cells holding a number, not padding
+        out_of_range = ((self.matrix < 0) | (self.matrix > N)) & numbers
+        ordered = numpy.sort(numpy.where(numbers, self.matrix, -1), axis=1)
+        repeated = (ordered[:, 1:] == ordered[:, :-1]) & (ordered[:, 1:] >= 0)
+        invalid = (self.lengths != size) | out_of_range.any(axis=1) | repeated.any(axis=1)
+        return [self.players[row] for row in numpy.flatnonzero(invalid)]
+
+    def completions(self, deck):
+        """
+        :param deck: the Playing Deck, in the order its numbers are called
+        :return: the call, counted from 1, at which each card completes, NEVER for the cards that do not, in the order of the players
+        """
+        if self.matrix is None:
+            calls = {number: call for call, number in enumerate(deck, 1)}
+            completions = []
+            for card in self.cards:
+                if len(set(card)) != len(card):
+                    # A number repeated in a card is only called once, so that card never completes
+                    completions.append(self.NEVER)
+                else:
+                    completions.append(max([calls.get(number, self.NEVER) for number in card], default=1))
+            return completions
+
+        # Call of every number, from 0 to the largest one in the deck or in a card
+        numbers = numpy.arange(self.matrix.shape[1]) < self.lengths[:, None]
+        largest = max(max(deck, default=0), int(self.matrix.max(initial=0)))
+        calls = numpy.full(largest + 1, self.NEVER, dtype=numpy.int64)
+        calls[numpy.asarray(deck, dtype=numpy.int64)] = numpy.arange(1, len(deck) + 1, dtype=numpy.int64)
+
+        marked = numpy.where(self.matrix >= 0, calls[numpy.clip(self.matrix, 0, None)], self.NEVER)
+        marked = numpy.where(numbers, marked, 1)
+        completions = marked.max(axis=1, initial=1)
+
+        ordered = numpy.sort(numpy.where(numbers, self.matrix, -1), axis=1)
+        repeated = ((ordered[:, 1:] == ordered[:, :-1]) & (ordered[:, 1:] >= 0)).any(axis=1)
+        completions[repeated] = self.NEVER
+        return completions.tolist()
+
+    def winners(self, deck):
+        """
+        :param deck: the Playing Deck, in the order its numbers are called
+        :return: the Players whose card completes first, and the call, counted from 1, at which they do (None if no card completes)
+        """
+        if len(deck) == 0 or len(self.players) == 0:
+            return [], None
+
+        completions = self.completions(deck)
+        first = min(completions)
+        if first >= self.NEVER:
+            return [], None
+        return [player for player, call in zip(self.players, completions) if call == first], first
@@ -0,0 +1,145 @@
+from engine import WinnerEngine, CardTracker, CardEngine
+import engine as card_engine
+import random
+import click
+
+
+def list_scan_winners(cards, deck):
+    """ The winners as Caller.find_winner found them before, removing each number called from copies of the cards. """
+    cards = {player: list(card) for player, card in cards.items()}
+    winners = []
+    for call, number in enumerate(deck, 1):
+        for player in cards:
+            if number in cards[player]:
+                cards[player].remove(number)
+            if len(cards[player]) == 0:
+                winners.append(player)
+        if len(winners) != 0:
+            return winners, call
+    return winners, None
+
+
+def test_winners():
+    for seed in range(50):
+        random.seed(seed)
+        N = random.randint(4, 60)
+        deck = random.sample(range(N), N)
+        cards = {player: random.sample(range(N), N // 4) for player in range(1, random.randint(1, 8))}
+        stored = {player: list(card) for player, card in cards.items()}
+
+        engine = WinnerEngine(cards)
+        assert engine.winners(deck) == list_scan_winners(cards, deck)
+        # The stored cards are left as they were
+        assert cards == stored
+
+        # Every card completes at the call of the last of its numbers
+        completions = engine.completions(deck)
+        for player, card in cards.items():
+            assert completions[player] == max(deck.index(number) for number in card) + 1
+
+
+def test_incomplete_cards():
+    deck = [3, 1, 2, 0]
+    # A repeated number, or one that is not in the deck, keeps a card from completing
+    engine = WinnerEngine({1: [3, 3], 2: [5], 3: [1, 2]})
+    assert engine.winners(deck) == ([3], 3)
+    assert engine.completions(deck) == {3: 3}
+    assert WinnerEngine({1: [5]}).winners(deck) == ([], None)
+    assert WinnerEngine({1: [], 2: [3]}).winners(deck) == ([1, 2], 1)
+    assert WinnerEngine({1: [], 2: [3]}).winners(deck) == list_scan_winners({1: [], 2: [3]}, deck)
+    assert WinnerEngine({1: [3]}).winners([]) == ([], None)
+
+
+def test_card_tracker():
+    for seed in range(50):
+        random.seed(seed)
+        N = random.randint(4, 60)
+        deck = random.sample(range(N), N)
+        cards = {player: random.sample(range(N), N // 4) for player in range(1, random.randint(1, 8))}
+        cards[0] = random.choice([[], [0, 0], [N + 5], random.sample(range(N), N // 8)])
+        batch = random.randint(1, 10)
+
+        # The numbers are called a batch at a time until a card completes, as in the streaming play
+        tracker = CardTracker(cards)
+        for first in range(0, N, batch):
+            tracker.call(deck[first:first + batch])
+            if len(tracker.completed) > 0:
+                break
+
+        assert tracker.first_completed() == WinnerEngine(cards).winners(deck)
+        completions = WinnerEngine(cards).completions(deck)
+        assert tracker.completed == {player: call for player, call in completions.items() if call <= tracker.calls}
+
+    tracker = CardTracker({1: [3, 1], 2: [1, 2], 3: [2]})
+    assert tracker.call([1, 3]) == {1: 2}
+    assert tracker.call([2]) == {2: 3, 3: 3}
+    assert tracker.first_completed() == ([1], 2)
+    assert tracker.first_completed(players=[2, 3]) == ([2, 3], 3)
+
+
+def both_engines(cards):
+    """ CardEngine over a numpy matrix, when numpy is installed, and over lists. """
+    engines = [CardEngine(cards)]
+    numpy, card_engine.numpy = card_engine.numpy, None
+    try:
+        engines.append(CardEngine(cards))
+    finally:
+        card_engine.numpy = numpy
+    return engines
+
+
+def test_card_engine():
+    for seed in range(50):
+        random.seed(seed)
+        N = random.randint(4, 60)
+        deck = random.sample(range(N), N)
+        cards = {player: random.sample(range(N), N // 4) for player in range(1, random.randint(1, 8))}
+        # Cards with a repeated number, a number out of the deck, or no numbers at all
+        cards[0] = random.choice([[], [0, 0], [N + 5], random.sample(range(N), N // 8)])
+
+        for engine in both_engines(cards):
+            assert engine.winners(deck) == list_scan_winners(cards, deck)
+            assert engine.winners([]) == ([], None)
+
+    for engine in both_engines({1: [3, 3], 2: [5], 3: [1, 2]}):
+        assert engine.completions([3, 1, 2, 0]) == [CardEngine.NEVER, CardEngine.NEVER, 3]
+
+
+def test_valid_cards():
+    N = 40
+    cards = {1: random.sample(range(1, N + 1), N // 4),
+             2: random.sample(range(1, N + 1), N // 8),                         # Too small
+             3: [7] * (N // 4),                                                 # Repeated numbers
+             4: [N + 1] + random.sample(range(1, N + 1), N // 4 - 1),           # Out of the deck
+             5: [-1] + random.sample(range(1, N + 1), N // 4 - 1),
+             6: list(range(N // 4)),
+             7: [2 ** 70] + random.sample(range(1, N + 1), N // 4 - 1)}
+    for engine in both_engines(cards):
+        assert engine.invalid(N) == [2, 3, 4, 5, 7]
+    for engine in both_engines({1: list(range(1, N // 4 + 1)), 2: list(range(N - N // 4 + 1, N + 1))}):
+        assert engine.invalid(N) == []
+    # Entries that are not integers are never taken for numbers, with numpy or without it
+    for engine in both_engines({'1': ['1', '2', '3'], '2': [1.0, 2, 3], '3': [True, 2, 3], '4': [1, 2, 3]}):
+        assert engine.invalid(12) == ['1', '2', '3']
+
+
+@click.command()
+@click.option('--test', '-t', help='choose from: [winners, incomplete_cards, card_tracker, card_engine, valid_cards]')
+def main(test):
+    if test == 'winners':
+        test_winners()
+    elif test == 'incomplete_cards':
+        test_incomplete_cards()
+    elif test == 'card_tracker':
+        test_card_tracker()
+    elif test == 'card_engine':
+        test_card_engine()
+    elif test == 'valid_cards':
+        test_valid_cards()
+    else:
+        print("No test chosen")
+        return
+    print("All tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,120 @@
 import base64
 import json 
+import asyncio
+import struct
+from operator import itemgetter
 from socket import socket
 
+DECODERS = {}                                       # Dictionary holding the decoder of each Message type {command: decoder}
+
+JSON_WIRE = "json"                                  # Wire formats a client can negotiate in its RegisterMessage
+BINARY_WIRE = "binary"
+WIRE_FORMATS = (JSON_WIRE, BINARY_WIRE)
+BINARY_FRAME = b"\x00"                              # First byte of a binary frame (json frames always begin with "{")
+
+BULK_VERIFICATION = "bulk"                          # Deck verifications of Step 3 the Caller can announce in Begin_Game: every User decrypts every layer,
+INCREMENTAL_VERIFICATION = "incremental"            # or each Player checks the shuffle of the one before it, against digests recorded in Step 1
+VERIFICATION_MODES = (BULK_VERIFICATION, INCREMENTAL_VERIFICATION)
+
+BATCH_PLAY = "batch"                                # Plays of Step 4 the Caller can announce in Begin_Game: every User finds the winners from the whole deck,
+STREAM_PLAY = "stream"                              # or the Caller calls the numbers a batch at a time and the Players claim Bingo as their card completes
+PLAY_MODES = (BATCH_PLAY, STREAM_PLAY)
+
+SIGNATURE_AUTH = "signature"                        # Authentication of the messages the Caller chooses for its table: every message signed,
+MAC_AUTH = "mac"                                    # or the routine ones authenticated with the session keys agreed at registration (HMAC)
+AUTH_MODES = (SIGNATURE_AUTH, MAC_AUTH)
+SIGNED_PREFIX = b'{"message": '                    # Beginning of a json frame carrying a signed or authenticated message
+JSON_DECODER = json.JSONDecoder()
+
 #Parent Message Classes ---------------------------------------------------
 class SuperMessage:
     """Used in the definition of send and recv functions"""
     def __init__(self):
         pass
 
+    def canonical(self):
+        """
+        :return: the json representation of the message, as bytes: what its json frame holds and its signature is computed over
+        """
+        return repr(self).encode('UTF-8')
+
 class Message(SuperMessage):
-    """Message Type"""
+    """Message Type
+
+    Every subclass declares its COMMAND and the FIELDS its constructor receives, in order.
+    OPTIONAL_FIELDS are passed as keyword arguments, and are None when the sender left them out.
+    Declaring a COMMAND registers the subclass in DECODERS, so recv_msg can build it with a single lookup.
+    """
+    COMMAND = None
+    FIELDS = ()
+    OPTIONAL_FIELDS = ()
+
     def __init__(self, command, ID=None):
         self.command = command
         self.ID = ID
         super().__init__()
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.COMMAND is not None:
+            DECODERS[cls.COMMAND] = cls.decoder()
+
+    def __setattr__(self, name, value):
+        # A field that changes changes the representation of the message
+        self.invalidate()
+        super().__setattr__(name, value)
+
+    def canonical(self):
+        """
+        The representation of a message is serialized once, and reused to sign it, to frame it and to verify its signature.
+        Assigning a field serializes it again, but changing a list or dictionary field in place does not: call invalidate()
+        after doing so, or the message is still signed, framed and verified as it was.
+        :return: the json representation of the message, as bytes
+        """
+        data = self.__dict__.get("_canonical")
+        if data is None:
+            data = repr(self).encode('UTF-8')
+            self.__dict__["_canonical"] = data
+        return data
+
+    def invalidate(self):
+        """
+        Drops the serialized representation of the message, after one of its list or dictionary fields was changed in place.
+        """
+        self.__dict__.pop("_canonical", None)
+
+    def received_as(self, data):
+        """
+        Keeps the bytes the message was received as, its signature having been computed over them, so it is neither
+        serialized again to verify it nor to forward it.
+        """
+        self.__dict__["_canonical"] = bytes(data)
+
+    @classmethod
+    def decoder(cls):
+        """
+        Generates the function that builds an instance of this class from its decoded json dictionary.
+        :return: a function receiving the dictionary and returning the Message
+        """
+        if len(cls.OPTIONAL_FIELDS) > 0:
+            fields = cls.FIELDS
+            optional = cls.OPTIONAL_FIELDS
+            return lambda dicionario: cls(*[dicionario[field] for field in fields], **{field: dicionario.get(field) for field in optional})
+
+        if len(cls.FIELDS) == 0:
+            return lambda dicionario: cls()
+
+        getter = itemgetter(*cls.FIELDS)
+        if len(cls.FIELDS) == 1:
+            return lambda dicionario: cls(getter(dicionario))
+        return lambda dicionario: cls(*getter(dicionario))
+
+    def to_binary(self):
+        """
+        Dictionary sent in the binary wire format. Unlike to_json, it may hold raw bytes.
+        """
+        return self.to_json()
+
 class SignedMessage(SuperMessage):
     """Signed message"""
     def __init__(self, message, signature):
@@ -23,8 +123,32 @@ class SignedMessage(SuperMessage):
         super().__init__()
 
     def __repr__(self):
-        data = self.message.to_json()
-        return json.dumps({"message": data, "signature": self.signature})
+        return self.canonical().decode('UTF-8')
+
+    def canonical(self):
+        return SIGNED_PREFIX + self.message.canonical() + b', "signature": ' + json.dumps(self.signature).encode('UTF-8') + b'}'
+
+    def to_binary(self):
+        return {"message": self.message.to_binary(), "signature": self.signature}
+
+class Mac(str):
+    """HMAC of a received message, made with the session key of its connection, in place of a signature"""
+
+class MacMessage(SuperMessage):
+    """Message authenticated with the session key of the connection it is sent through"""
+    def __init__(self, message, mac):
+        self.message = message
+        self.mac = mac
+        super().__init__()
+
+    def __repr__(self):
+        return self.canonical().decode('UTF-8')
+
+    def canonical(self):
+        return SIGNED_PREFIX + self.message.canonical() + b', "mac": ' + json.dumps(self.mac).encode('UTF-8') + b'}'
+
+    def to_binary(self):
+        return {"message": self.message.to_binary(), "mac": self.mac}
 
 class CertMessage(SignedMessage):
     """Message accompanied by a CC signature"""
@@ -32,48 +156,114 @@ class CertMessage(SignedMessage):
         self.certificate = certificate
         super().__init__(message, signature)
     def __repr__(self):
-        data = self.message.to_json()
-        return json.dumps({"message": data, "signature": self.signature, "certificate": self.certificate})
+        return self.canonical().decode('UTF-8')
+
+    def canonical(self):
+        return SIGNED_PREFIX + self.message.canonical() + b', "signature": ' + json.dumps(self.signature).encode('UTF-8') \
+            + b', "certificate": ' + json.dumps(self.certificate).encode('UTF-8') + b'}'
+
+    def to_binary(self):
+        return {"message": self.message.to_binary(), "signature": self.signature, "certificate": self.certificate}
+
+def encode_deck(deck):
+    """ Encodes the raw entries of a deck in base64, so they can travel in a json frame. """
+    return [base64.b64encode(entry).decode('utf-8') if isinstance(entry, bytes) else entry for entry in deck]
+
+def decode_deck(deck):
+    """ Decodes the base64 entries of a deck received in a json frame back to raw bytes. """
+    return [base64.b64decode(entry) if isinstance(entry, str) else entry for entry in deck]
 
 
 #Register Messages ---------------------------------------------------
 class RegisterMessage(Message):
     """Message to register username in the server."""
-    def __init__(self, type, pk = None, ass_cc = None, nick = None, num_players = None):
+    COMMAND = "Register"
+    FIELDS = ("type", "pk", "ass_cc", "nick")
+    OPTIONAL_FIELDS = ("wire", "table", "suite", "session")
+
+    def __init__(self, type, pk = None, ass_cc = None, nick = None, num_players = None, wire = None, table = None, suite = None, session = None):
         self.type = type
         self.pk = pk
         self.ass_cc = ass_cc
         self.nick = nick
         self.num_players = num_players
-        super().__init__("Register")
+        self.wire = wire                                                        # Wire format requested by the client, None for json
+        self.table = table                                                      # Table to open or join, None to let the Playing Area choose
+        self.suite = suite                                                      # Signature suite of pk, None for RSA-PSS
+        self.session = session                                                  # Ephemeral X25519 public key offered to agree on a session key, None if not
+        super().__init__(self.COMMAND)
+
+    @classmethod
+    def decoder(cls):
+        # The Caller registration carries the number of players as well
+        player_getter = itemgetter(*cls.FIELDS)
+        caller_getter = itemgetter(*cls.FIELDS, "num_players")
+        optional = cls.OPTIONAL_FIELDS
+
+        def decode(dicionario):
+            if dicionario["type"] == "Caller":
+                return cls(*caller_getter(dicionario), **{field: dicionario.get(field) for field in optional})
+            if dicionario["type"] == "Player":
+                return cls(*player_getter(dicionario), **{field: dicionario.get(field) for field in optional})
+            return None
+        return decode
 
     def __repr__(self):
-        if self.type == "Caller":
-            return json.dumps({"command": self.command, "ID": self.ID, "nick": self.nick, "pk": self.pk, "ass_cc": self.ass_cc, "type": self.type, "num_players": self.num_players })
-        if self.type == "Player":
-            return json.dumps({"command": self.command, "ID": self.ID, "nick": self.nick, "pk": self.pk, "ass_cc": self.ass_cc, "type": self.type})
+        return json.dumps(self.to_json())
 
     def to_json(self):
         if self.type == "Caller":
-            return {"command": self.command, "ID": self.ID, "nick": self.nick, "pk": self.pk, "ass_cc": self.ass_cc, "type": self.type, "num_players": self.num_players }
-        if self.type == "Player":
-            return {"command": self.command, "ID": self.ID, "nick": self.nick, "pk": self.pk, "ass_cc": self.ass_cc, "type": self.type}
+            data = {"command": self.command, "ID": self.ID, "nick": self.nick, "pk": self.pk, "ass_cc": self.ass_cc, "type": self.type, "num_players": self.num_players }
+        elif self.type == "Player":
+            data = {"command": self.command, "ID": self.ID, "nick": self.nick, "pk": self.pk, "ass_cc": self.ass_cc, "type": self.type}
+        else:
+            return None
+        # Clients that keep the json wire format, let the Playing Area choose the table, sign with RSA-PSS, or sign every message, do not send the fields at all
+        if self.wire is not None:
+            data["wire"] = self.wire
+        if self.table is not None:
+            data["table"] = self.table
+        if self.suite is not None:
+            data["suite"] = self.suite
+        if self.session is not None:
+            data["session"] = self.session
+        return data
 
 
 class Register_ACK(Message):
-    def __init__(self, ID, pk):
+    COMMAND = "Register_ACK"
+    FIELDS = ("ID", "pk")
+    OPTIONAL_FIELDS = ("wire", "table", "suite", "session")
+
+    def __init__(self, ID, pk, wire=None, table=None, suite=None, session=None):
         self.pk = pk
-        super().__init__("Register_ACK", ID)
+        self.wire = wire                                                        # Wire format accepted by the Playing Area
+        self.table = table                                                      # Table the client was seated at
+        self.suite = suite                                                      # Signature suite of the Playing Area, None for RSA-PSS
+        self.session = session                                                  # Ephemeral X25519 public key of the Playing Area, if a session key was agreed
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
-        return json.dumps({"command": self.command, "ID": self.ID, "pk": self.pk})
+        return json.dumps(self.to_json())
 
     def to_json(self):
-        return {"command": self.command, "ID": self.ID, "pk": self.pk}
+        data = {"command": self.command, "ID": self.ID, "pk": self.pk}
+        if self.wire is not None:
+            data["wire"] = self.wire
+        if self.table is not None:
+            data["table"] = self.table
+        if self.suite is not None:
+            data["suite"] = self.suite
+        if self.session is not None:
+            data["session"] = self.session
+        return data
 
 class Cheat(Message):
+    COMMAND = "Cheat"
+    FIELDS = ("ID",)
+
     def __init__(self, ID):
-        super().__init__("Cheat", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID})
@@ -82,8 +272,11 @@ class Cheat(Message):
         return {"command": self.command, "ID": self.ID}
 
 class Register_NACK(Message):
+    COMMAND = "Register_NACK"
+    FIELDS = ()
+
     def __init__(self):
-        super().__init__("Register_NACK")
+        super().__init__(self.COMMAND)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID})
@@ -92,44 +285,73 @@ class Register_NACK(Message):
         return {"command": self.command, "ID": self.ID}
 
 class Begin_Game(Message):
-    def __init__(self, ID, pks):
+    COMMAND = "Begin_Game"
+    FIELDS = ("ID", "pks")
+    OPTIONAL_FIELDS = ("cipher", "verification", "play")
+
+    def __init__(self, ID, pks, cipher=None, verification=None, play=None):
         self.pks = pks
-        super().__init__("Begin_Game", ID)
+        self.cipher = cipher                                                    # Layered encryption of the deck, None for AES-CBC
+        self.verification = verification                                        # Deck verification of Step 3, None for the bulk one
+        self.play = play                                                        # Play of Step 4, None for the batch one
+        super().__init__(self.COMMAND, ID)
     
     def __repr__(self):
-        return json.dumps({"command": self.command, "ID": self.ID, "pks": self.pks})
+        return json.dumps(self.to_json())
 
     def to_json(self):
-        return {"command": self.command, "ID": self.ID, "pks": self.pks}
+        data = {"command": self.command, "ID": self.ID, "pks": self.pks}
+        if self.cipher is not None:
+            data["cipher"] = self.cipher
+        if self.verification is not None:
+            data["verification"] = self.verification
+        if self.play is not None:
+            data["play"] = self.play
+        return data
 
 class Message_Deck(Message):
+    COMMAND = "Message_Deck"
+    FIELDS = ("ID", "deck")
+
     def __init__(self, ID, deck):
-        self.deck = deck
-        super().__init__("Message_Deck", ID)
+        self.deck = decode_deck(deck)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
-        return json.dumps({"command": self.command, "ID": self.ID, "deck": self.deck})
+        return json.dumps(self.to_json())
     
     def to_json(self):
+        return {"command": self.command, "ID": self.ID, "deck": encode_deck(self.deck)}
+
+    def to_binary(self):
         return {"command": self.command, "ID": self.ID, "deck": self.deck}
 
 class Commit_Card(Message):
+    COMMAND = "Commit_Card"
+    FIELDS = ("ID", "deck", "card")
+
     def __init__(self, ID, deck, card):
-        self.deck = deck
+        self.deck = decode_deck(deck)
         self.card = card
-        super().__init__("Commit_Card", ID)
+        super().__init__(self.COMMAND, ID)
     
     def __repr__(self):
-        return json.dumps({"command": self.command, "ID": self.ID, "deck": self.deck, "card": self.card})
+        return json.dumps(self.to_json())
 
     def to_json(self):
+        return {"command": self.command, "ID": self.ID, "deck": encode_deck(self.deck), "card": self.card}
+
+    def to_binary(self):
         return {"command": self.command, "ID": self.ID, "deck": self.deck, "card": self.card}
 
 class Sign_Final_Deck_ACK(Message):
     """Message to chat with other clients."""
+    COMMAND = "Sign_Final_Deck_ACK"
+    FIELDS = ("ID", "playing_cards")
+
     def __init__(self, ID, playing_cards):
         self.playing_cards = playing_cards
-        super().__init__("Sign_Final_Deck_ACK", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "playing_cards": self.playing_cards})
@@ -140,9 +362,12 @@ class Sign_Final_Deck_ACK(Message):
 #Verificação das playing cards ---------------------------------------------------
 
 class Verify_Cards(Message):
+    COMMAND = "Verify_Cards"
+    FIELDS = ("ID", "playing_cards")
+
     def __init__(self, ID, playing_cards):
         self.playing_cards = playing_cards
-        super().__init__("Verify_Cards", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "playing_cards": self.playing_cards})
@@ -151,8 +376,11 @@ class Verify_Cards(Message):
         return {"command": self.command, "ID": self.ID, "playing_cards": self.playing_cards}
 
 class Verify_Card_OK(Message):
+    COMMAND = "Verify_Card_OK"
+    FIELDS = ("ID",)
+
     def __init__(self, ID):
-        super().__init__("Verify_Card_OK", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID})
@@ -161,9 +389,12 @@ class Verify_Card_OK(Message):
         return {"command": self.command, "ID": self.ID}
 
 class Verify_Card_NOK(Message):
+    COMMAND = "Verify_Card_NOK"
+    FIELDS = ("ID", "users")
+
     def __init__(self, ID, users):
         self.users = users
-        super().__init__("Verify_Card_NOK", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "users": self.users})
@@ -172,10 +403,13 @@ class Verify_Card_NOK(Message):
         return {"command": self.command, "ID": self.ID, "users": self.users}
 
 class Cheat_Verify(Message):
+    COMMAND = "Cheat_Verify"
+    FIELDS = ("cheaters", "stage")
+
     def __init__(self, cheaters, stage):
         self.cheaters = cheaters
         self.stage = stage
-        super().__init__("Cheat_Verify")
+        super().__init__(self.COMMAND)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "cheaters": self.cheaters, "stage": self.stage})
@@ -184,9 +418,12 @@ class Cheat_Verify(Message):
         return {"command": self.command, "ID": self.ID, "cheaters": self.cheaters, "stage": self.stage}
 
 class Disqualify(Message):
+    COMMAND = "Disqualify"
+    FIELDS = ("disqualified_ID", "ID")
+
     def __init__(self, disqualified_ID, ID=None):
         self.disqualified_ID = disqualified_ID
-        super().__init__("Disqualify", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "disqualified_ID": self.disqualified_ID})
@@ -195,8 +432,11 @@ class Disqualify(Message):
         return {"command": self.command, "ID": self.ID, "disqualified_ID": self.disqualified_ID}
 
 class Cards_Validated(Message):
+    COMMAND = "Cards_Validated"
+    FIELDS = ("ID",)
+
     def __init__(self, ID):
-        super().__init__("Cards_Validated", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID})
@@ -207,8 +447,11 @@ class Cards_Validated(Message):
 # Validação do playing deck ------------------------------------------------------
 
 class Ask_Sym_Keys(Message):
+    COMMAND = "Ask_Sym_Keys"
+    FIELDS = ()
+
     def __init__(self):
-        super().__init__("Ask_Sym_Keys")
+        super().__init__(self.COMMAND)
 
     def __repr__(self):
         return json.dumps({"command": self.command})
@@ -217,9 +460,12 @@ class Ask_Sym_Keys(Message):
         return {"command": self.command}
 
 class Post_Sym_Keys(Message):
+    COMMAND = "Post_Sym_Keys"
+    FIELDS = ("ID", "sym_key")
+
     def __init__(self, ID, sym_key):
         self.sym_key = sym_key
-        super().__init__("Post_Sym_Keys", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "sym_key": self.sym_key})
@@ -228,20 +474,30 @@ class Post_Sym_Keys(Message):
         return {"command": self.command, "ID": self.ID, "sym_key": self.sym_key}
 
 class Post_Final_Decks(Message):
+    COMMAND = "Post_Final_Decks"
+    FIELDS = ("ID", "decks", "signed_deck")
+
     def __init__(self, ID, decks, signed_deck):
-        self.decks = decks
-        self.signed_deck = signed_deck
-        super().__init__("Post_Final_Decks", ID)
+        self.decks = {user_id: {**info, "deck": decode_deck(info["deck"])} if info.get("deck") is not None else info for user_id, info in decks.items()}
+        self.signed_deck = decode_deck(signed_deck)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
-        return json.dumps({"command": self.command, "ID": self.ID, "decks": self.decks, "signed_deck": self.signed_deck})
+        return json.dumps(self.to_json())
 
     def to_json(self):
+        decks = {user_id: {**info, "deck": encode_deck(info["deck"])} if info.get("deck") is not None else info for user_id, info in self.decks.items()}
+        return {"command": self.command, "ID": self.ID, "decks": decks, "signed_deck": encode_deck(self.signed_deck)}
+
+    def to_binary(self):
         return {"command": self.command, "ID": self.ID, "decks": self.decks, "signed_deck": self.signed_deck}
 
 class Verify_Deck_OK(Message):
+    COMMAND = "Verify_Deck_OK"
+    FIELDS = ("ID",)
+
     def __init__(self, ID):
-        super().__init__("Verify_Deck_OK", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID})
@@ -250,8 +506,11 @@ class Verify_Deck_OK(Message):
         return {"command": self.command, "ID": self.ID}
 
 class Verify_Deck_NOK(Message):
+    COMMAND = "Verify_Deck_NOK"
+    FIELDS = ("ID", "users")
+
     def __init__(self, ID, users):
-        super().__init__("Verify_Deck_NOK", ID)
+        super().__init__(self.COMMAND, ID)
         self.users = users
 
     def __repr__(self):
@@ -263,8 +522,11 @@ class Verify_Deck_NOK(Message):
 # Determinar Vencedor ------------------------------------------------------------
 
 class Ask_For_Winner(Message):
+    COMMAND = "Ask_For_Winner"
+    FIELDS = ("ID",)
+
     def __init__(self, ID):
-        super().__init__("Ask_For_Winner", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID})
@@ -273,9 +535,12 @@ class Ask_For_Winner(Message):
         return {"command": self.command, "ID": self.ID}
 
 class Winner(Message):
+    COMMAND = "Winner"
+    FIELDS = ("ID", "ID_winner")
+
     def __init__(self, ID, ID_winner):
         self.ID_winner = ID_winner
-        super().__init__("Winner", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "ID_winner": self.ID_winner})
@@ -284,9 +549,12 @@ class Winner(Message):
         return {"command": self.command, "ID": self.ID, "ID_winner": self.ID_winner}
 
 class Winner_ACK(Message):
+    COMMAND = "Winner_ACK"
+    FIELDS = ("ID", "ID_winner")
+
     def __init__(self, ID, ID_winner):
         self.ID_winner = ID_winner
-        super().__init__("Winner_ACK", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "ID_winner": self.ID_winner})
@@ -294,9 +562,40 @@ class Winner_ACK(Message):
     def to_json(self):
         return {"command": self.command, "ID": self.ID, "ID_winner": self.ID_winner}
 
+class Call_Numbers(Message):
+    COMMAND = "Call_Numbers"
+    FIELDS = ("ID", "numbers")
+
+    def __init__(self, ID, numbers):
+        self.numbers = numbers                                                  # The next numbers called, in order
+        super().__init__(self.COMMAND, ID)
+
+    def __repr__(self):
+        return json.dumps({"command": self.command, "ID": self.ID, "numbers": self.numbers})
+
+    def to_json(self):
+        return {"command": self.command, "ID": self.ID, "numbers": self.numbers}
+
+class Bingo(Message):
+    COMMAND = "Bingo"
+    FIELDS = ("ID", "call")
+
+    def __init__(self, ID, call):
+        self.call = call                                                        # Call, counted from 1, at which the card of the Player completed
+        super().__init__(self.COMMAND, ID)
+
+    def __repr__(self):
+        return json.dumps({"command": self.command, "ID": self.ID, "call": self.call})
+
+    def to_json(self):
+        return {"command": self.command, "ID": self.ID, "call": self.call}
+
 class Get_Players_List(Message):
+    COMMAND = "Get_Players_List"
+    FIELDS = ("ID",)
+
     def __init__(self, ID):
-        super().__init__("Get_Players_List", ID)
+        super().__init__(self.COMMAND, ID)
 
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID})
@@ -305,9 +604,12 @@ class Get_Players_List(Message):
         return {"command": self.command, "ID": self.ID}
 
 class Players_List(Message):
+    COMMAND = "Players_List"
+    FIELDS = ("ID", "players")
+
     def __init__(self, ID, players):
         self.players = players
-        super().__init__("Players_List", ID)
+        super().__init__(self.COMMAND, ID)
     
     def __repr__(self):
         return json.dumps({"command": self.command, "ID": self.ID, "players": self.players})
@@ -315,17 +617,232 @@ class Players_List(Message):
     def to_json(self):
         return {"command": self.command, "ID": self.ID, "players": self.players}
 
+# Messages that keep their signature when the connections are authenticated with session keys: the Register_ACK, which
+# carries the session key of the Playing Area, and those relayed to a third party, who must be able to prove who sent them
+SIGNED_MESSAGES = (Register_ACK, Commit_Card, Winner, Bingo, Disqualify)
+
+# Binary wire format ------------------------------------------------------------
+# Values are written as a one byte tag followed by their content. Lists of raw bytes (decks) and of integers (cards)
+# are written as packed arrays, so they travel without the base64 and json overhead.
+
+def pack_value(value, out):
+    """
+    Appends the binary encoding of a json-like value, which may hold raw bytes, to the list of chunks out.
+    """
+    if value is None:
+        out.append(b"N")
+    elif value is True:
+        out.append(b"T")
+    elif value is False:
+        out.append(b"F")
+    elif isinstance(value, int):
+        out.append(b"i" + struct.pack(">q", value))
+    elif isinstance(value, str):
+        data = value.encode('UTF-8')
+        out.append(b"s" + struct.pack(">I", len(data)))
+        out.append(data)
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(b"b" + struct.pack(">I", len(value)))
+        out.append(bytes(value))
+    elif isinstance(value, dict):
+        out.append(b"m" + struct.pack(">I", len(value)))
+        for key, item in value.items():
+            # Keys become strings, as they would in a json frame
+            pack_value(key if isinstance(key, str) else json.dumps(key), out)
+            pack_value(item, out)
+    elif isinstance(value, (list, tuple)):
+        if len(value) > 0 and all(type(entry) is bytes for entry in value):
+            width = len(value[0])
+            if all(len(entry) == width for entry in value):
+                # Array of entries with the same length, such as the ciphertexts of a deck
+                out.append(b"B" + struct.pack(">II", len(value), width))
+            else:
+                out.append(b"V" + struct.pack(">I", len(value)))
+                out.append(struct.pack(">%dI" % len(value), *[len(entry) for entry in value]))
+            out.append(b"".join(value))
+        elif len(value) > 0 and all(type(entry) is int and -2**31 <= entry < 2**31 for entry in value):
+            # Array of integers, such as a playing card
+            out.append(b"I" + struct.pack(">I%di" % len(value), len(value), *value))
+        else:
+            out.append(b"l" + struct.pack(">I", len(value)))
+            for entry in value:
+                pack_value(entry, out)
+    else:
+        raise TypeError(f"Value of type {type(value).__name__} can not be sent in the binary wire format")
+
+def unpack_value(data, offset=0):
+    """
+    Reads the value whose binary encoding starts at the given offset.
+    :return: a tuple with the value and the offset where its encoding ends
+    """
+    tag = data[offset:offset+1]
+    offset += 1
+    if tag == b"N":
+        return None, offset
+    if tag == b"T":
+        return True, offset
+    if tag == b"F":
+        return False, offset
+    if tag == b"i":
+        return struct.unpack_from(">q", data, offset)[0], offset + 8
+    if tag in (b"s", b"b"):
+        (length,) = struct.unpack_from(">I", data, offset)
+        offset += 4
+        value = bytes(data[offset:offset+length])
+        if len(value) != length:
+            raise ValueError("Truncated binary frame")
+        return (value.decode('UTF-8') if tag == b"s" else value), offset + length
+    if tag == b"m":
+        (count,) = struct.unpack_from(">I", data, offset)
+        offset += 4
+        value = {}
+        for _ in range(count):
+            key, offset = unpack_value(data, offset)
+            value[key], offset = unpack_value(data, offset)
+        return value, offset
+    if tag == b"B":
+        count, width = struct.unpack_from(">II", data, offset)
+        offset += 8
+        end = offset + count * width
+        if end > len(data):
+            raise ValueError("Truncated binary frame")
+        return [bytes(data[start:start+width]) for start in range(offset, end, width)], end
+    if tag == b"V":
+        (count,) = struct.unpack_from(">I", data, offset)
+        offset += 4
+        lengths = struct.unpack_from(">%dI" % count, data, offset)
+        offset += 4 * count
+        value = []
+        for length in lengths:
+            value.append(bytes(data[offset:offset+length]))
+            offset += length
+        if offset > len(data):
+            raise ValueError("Truncated binary frame")
+        return value, offset
+    if tag == b"I":
+        (count,) = struct.unpack_from(">I", data, offset)
+        offset += 4
+        return list(struct.unpack_from(">%di" % count, data, offset)), offset + 4 * count
+    if tag == b"l":
+        (count,) = struct.unpack_from(">I", data, offset)
+        offset += 4
+        value = []
+        for _ in range(count):
+            entry, offset = unpack_value(data, offset)
+            value.append(entry)
+        return value, offset
+    raise ValueError(f"Unknown tag {tag} in binary frame")
+
+
+class Frame:
+    """
+    A message serialized and framed once, so it can be written to several connections.
+    The encoding of each wire format is computed the first time it is needed and reused afterwards.
+    """
+    def __init__(self, msg: SuperMessage):
+        self.message = msg
+        self.frames = {}                            # Framed bytes of the message {wire: length prefix + frame}
+        self.bodies = {}                            # Encoding of the message inside a signed one, for the frames authenticated by a session {wire: bytes}
+
+    def encoded(self, wire=JSON_WIRE, session=None):
+        """
+        :param session: the session key of the connection the frame is written to, if it has one. Signed messages other than
+        SIGNED_MESSAGES are then authenticated with it instead of their signature.
+        :return: the framed bytes, with their length prefix
+        """
+        if session is not None and type(self.message) is SignedMessage and not isinstance(self.message.message, SIGNED_MESSAGES):
+            return self.authenticated(wire, session)
+
+        data = self.frames.get(wire)
+        if data is None:
+            frame = Protocol.encode(self.message, wire)
+            data = len(frame).to_bytes(4, "big") + frame
+            self.frames[wire] = data
+        return data
+
+    def authenticated(self, wire, session):
+        """
+        Frames the message as a MacMessage, with the HMAC of the session key of a connection. The message is serialized
+        once, and only its HMAC is computed for each connection.
+        """
+        # The HMAC is computed over the same representation as a signature
+        text = self.message.message.canonical()
+        mac = session.mac(text)
+
+        if wire == BINARY_WIRE:
+            body = self.bodies.get(BINARY_WIRE)
+            if body is None:
+                out = []
+                pack_value(self.message.message.to_binary(), out)
+                body = b"".join(out)
+                self.bodies[BINARY_WIRE] = body
+            out = [BINARY_FRAME, b"m" + struct.pack(">I", 2)]
+            pack_value("message", out)
+            out.append(body)
+            pack_value("mac", out)
+            pack_value(mac, out)
+            frame = b"".join(out)
+        else:
+            frame = b'{"message": ' + text + b', "mac": "' + mac.encode('UTF-8') + b'"}'
+        return len(frame).to_bytes(4, "big") + frame
+
+
 class Protocol:
     # Adaptar para as mensagens raw: 
+    WIRES = {}                                      # Wire format negotiated for each connection {socket: wire}, json when absent
+    SESSIONS = {}                                   # Session key agreed for each connection {socket: Session}, none when absent
 
     @classmethod
-    def send_msg(cls, connection: socket, msg: SuperMessage):
+    def set_wire(cls, connection: socket, wire):
+        """
+        Sets the wire format used from now on to send messages through the connection.
+        """
+        if wire == BINARY_WIRE:
+            cls.WIRES[connection] = wire
+        else:
+            cls.WIRES.pop(connection, None)
+
+    @classmethod
+    def set_session(cls, connection: socket, session):
+        """
+        Sets the session key the routine messages sent through the connection are authenticated with from now on, None to sign them.
+        """
+        if session is not None:
+            cls.SESSIONS[connection] = session
+        else:
+            cls.SESSIONS.pop(connection, None)
+
+    @classmethod
+    def encode(cls, msg: SuperMessage, wire=JSON_WIRE):
+        """
+        Encodes a message in the given wire format.
+        :return: the frame, without its length prefix
+        """
+        if wire == BINARY_WIRE:
+            out = [BINARY_FRAME]
+            pack_value(msg.to_binary(), out)
+            return b"".join(out)
+        return msg.canonical()
+
+    @classmethod
+    def send_msg(cls, connection: socket, msg):
+        """
+        Sends a message, or an already encoded Frame, through the connection.
+        """
         #connection e uma socket -> depende do channel e do user maybe
-        dicionario = repr(msg)
+        if not isinstance(msg, Frame):
+            msg = Frame(msg)
+        connection.sendall(msg.encoded(cls.WIRES.get(connection, JSON_WIRE), cls.SESSIONS.get(connection)))
 
-        size = len(dicionario)
-        connection.send(size.to_bytes(4, "big"))
-        connection.send(dicionario.encode('UTF-8'))
+    @classmethod
+    async def send_msg_async(cls, writer: asyncio.StreamWriter, msg):
+        """
+        Sends a message, or an already encoded Frame, through an asyncio stream, waiting only while its buffer is full.
+        """
+        if not isinstance(msg, Frame):
+            msg = Frame(msg)
+        writer.write(msg.encoded(cls.WIRES.get(writer, JSON_WIRE), cls.SESSIONS.get(writer)))
+        await writer.drain()
 
     @classmethod
     def exact_recv(cls, src, length):
@@ -345,10 +862,6 @@ class Protocol:
     @classmethod
     def recv_msg(cls, src):
         """Receives through a connection a Message object."""
-        isSigned = True
-        isCertified = True
-        signature = None
-
         # Get the length of the message
         data = Protocol.exact_recv(src, 4) # 4-byte integer, network byte order (Big Endian)
 
@@ -359,187 +872,101 @@ class Protocol:
         length = int.from_bytes(data, 'big')
         data = Protocol.exact_recv(src, length)
 
+        return Protocol.decode(data)
+
+    @classmethod
+    async def recv_msg_async(cls, reader: asyncio.StreamReader):
+        """Receives through an asyncio stream a Message object, without blocking the other connections while it arrives."""
+        try:
+            data = await reader.readexactly(4)
+            length = int.from_bytes(data, 'big')
+            data = await reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # End-of-File
+            return None, None
+
+        return Protocol.decode(data)
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Builds the Message object carried in a received frame.
+        :param data: the frame, without its length prefix
+        :return: a tuple with the message, its signature (a Mac, if it was authenticated with a session key) and its certificate
+        """
+        signature = None
+
         # Check if message is SIgned or not
         msg = None
         certificate = None
+        received = None
         try:
-            dicionario = json.loads(data.decode('UTF-8'))
+            if data[:1] == BINARY_FRAME:
+                dicionario, end = unpack_value(data, 1)
+            else:
+                text = data.decode('UTF-8')
+                dicionario, received = cls.split_signed(data, text)
+                if dicionario is None:
+                    dicionario = json.loads(text)
         except:
             raise BadFormatError(data)
-        
-        try:
-            ## Message is signed
-            msg = dicionario["message"]
-            signature = dicionario["signature"]
-            try:
-                ## Message comes with certificate
-                certificate = dicionario["certificate"]
-            except:
-                ## Message does not come with certificate
-                isCertified = False
 
+        if isinstance(dicionario, dict) and "message" in dicionario:
+            ## Message is signed, and may come with a certificate
+            msg = dicionario["message"]
+            signature = dicionario.get("signature")
+            if "mac" in dicionario:
+                signature = Mac(dicionario["mac"])
+            certificate = dicionario.get("certificate")
             dicionario = msg                                            # So the code below can be reused without an if
-        except:
-            ## Message is not signed
-            isSigned = False
-        
+
         try:
             value = dicionario["command"]
         except:
             raise BadFormatError(data)
 
-
         # Check the type of the Message
-        if value == "Register":
-            try:
-                if dicionario["type"] == "Caller":
-                    msg = RegisterMessage(dicionario["type"], dicionario["pk"], dicionario["ass_cc"], dicionario["nick"], dicionario["num_players"])
-                elif dicionario["type"] == "Player":
-                    msg = RegisterMessage(dicionario["type"], dicionario["pk"], dicionario["ass_cc"], dicionario["nick"])
-            except:
-                raise BadFormatError(data)
-        
-        if value == "Register_ACK":
-            try:
-                msg = Register_ACK(dicionario["ID"], dicionario["pk"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Register_NACK":
-            try:
-                msg = Register_NACK()
-            except:
-                raise BadFormatError(data)
-
-        if value == "Cheat":
-            try:
-                msg = Cheat(dicionario["ID"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Begin_Game":
-            try:
-                msg = Begin_Game(dicionario["ID"], dicionario["pks"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Message_Deck":
-            try:
-                msg = Message_Deck(dicionario["ID"], dicionario["deck"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Commit_Card":
-            try:
-                msg = Commit_Card(dicionario["ID"], dicionario["deck"], dicionario["card"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Sign_Final_Deck_ACK":
-            try:
-                msg = Sign_Final_Deck_ACK(dicionario["ID"], dicionario["playing_cards"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Verify_Cards":
-            try:
-                msg = Verify_Cards(dicionario["ID"], dicionario["playing_cards"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Verify_Card_OK":
-            try:
-                msg = Verify_Card_OK(dicionario["ID"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Verify_Card_NOK":
-            try:
-                msg = Verify_Card_NOK(dicionario["ID"], dicionario["users"])
-            except:
-                raise BadFormatError(data)
-        
-        if value == "Cheat_Verify":
-            try:
-                msg = Cheat_Verify(dicionario["cheaters"], dicionario["stage"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Disqualify":
-            try:
-                msg = Disqualify(dicionario["disqualified_ID"], dicionario["ID"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Cards_Validated":
-            try:
-                msg = Cards_Validated(dicionario["ID"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Ask_Sym_Keys":
-            try:
-                msg = Ask_Sym_Keys()
-            except:
-                raise BadFormatError(data)
-
-        if value == "Post_Sym_Keys":
-            try:
-                msg = Post_Sym_Keys(dicionario["ID"], dicionario["sym_key"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Post_Final_Decks":
-            try:
-                msg = Post_Final_Decks(dicionario["ID"], dicionario["decks"], dicionario["signed_deck"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Verify_Deck_OK":
-            try:
-                msg = Verify_Deck_OK(dicionario["ID"])
-            except:
-                raise BadFormatError(data)
-        
-        if value == "Verify_Deck_NOK":
-            try:
-                msg = Verify_Deck_NOK(dicionario["ID"], dicionario["users"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Ask_For_Winner":
-            try:
-                msg = Ask_For_Winner(dicionario["ID"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Winner":
-            try:
-                msg = Winner(dicionario["ID"], dicionario["ID_winner"])
-            except:
-                raise BadFormatError(data)
-
-        if value == "Winner_ACK":
-            try:
-                msg = Winner_ACK(dicionario["ID"], dicionario["ID_winner"])
-            except:
-                raise BadFormatError(data)
-        
-        if value == "Get_Players_List":
-            try:
-                msg = Get_Players_List(dicionario["ID"])
-            except:
-                raise BadFormatError(data)
-        
-        if value == "Players_List":
-            try:
-                msg = Players_List(dicionario["ID"], dicionario["players"])
-            except:
-                raise BadFormatError(data)
-            
+        decoder = DECODERS.get(value)
+        if decoder is None:
+            # Not a command of the Protocol
+            raise BadFormatError(data)
+        try:
+            msg = decoder(dicionario)
+        except (KeyError, TypeError):
+            raise BadFormatError(data)
+        if not isinstance(msg, Message):
+            # Such as a Register message of a type of client other than the Caller and the Player
+            raise BadFormatError(data)
+        if received is not None:
+            msg.received_as(received)
 
         return msg, signature, certificate
-        
+
+    @classmethod
+    def split_signed(cls, data, text):
+        """
+        Parses a json frame carrying a signed or authenticated message apart from the bytes of the message, which are the
+        ones its signature was computed over. The message is parsed from those very bytes, so what is verified is what is read.
+        :param text: the frame, decoded
+        :return: the decoded frame and the bytes of its message, or None and None if the frame is not laid out that way
+        """
+        start = len(SIGNED_PREFIX)
+        # Frames are written in ascii, so the offsets of the text are those of the bytes
+        if data[:start] != SIGNED_PREFIX or len(text) != len(data):
+            return None, None
+        try:
+            message, end = JSON_DECODER.raw_decode(text, start)
+            if text[end:end + 2] != ", ":
+                return None, None
+            # The fields that follow the message: its signature, or its HMAC, and its certificate
+            dicionario = json.loads("{" + text[end + 2:])
+        except ValueError:
+            return None, None
+        if not isinstance(message, dict) or not isinstance(dicionario, dict) or "message" in dicionario:
+            return None, None
+        dicionario["message"] = message
+        return dicionario, data[start:end]
+
 
 class BadFormatError(Exception):
     """Exception when source message is not in the Protocol."""
@@ -0,0 +1,228 @@
+from protocol import *
+import hashlib
+import socket
+import asyncio
+import click
+
+def sample_messages():
+    """ One instance of every Message type, as they are built by the Caller, the Players and the Playing Area. """
+    return [
+        RegisterMessage("Caller", "pk", nick="caller", num_players=4),
+        RegisterMessage("Player", "pk", nick="player"),
+        RegisterMessage("Player", "pk", nick="player", wire=BINARY_WIRE, table=2),
+        RegisterMessage("Caller", "pk", nick="caller", num_players=4, suite="ed25519"),
+        RegisterMessage("Player", "pk", nick="player", session="ab" * 32),
+        Register_ACK(1, "pk"),
+        Register_ACK(1, "pk", BINARY_WIRE, 2),
+        Register_ACK(1, "pk", suite="ed25519"),
+        Register_ACK(1, "pk", session="cd" * 32),
+        Register_NACK(),
+        Cheat(1),
+        Begin_Game(0, {"0": "pk0", "1": "pk1"}),
+        Begin_Game(0, {"0": "pk0", "1": "pk1"}, "block"),
+        Begin_Game(0, {"0": "pk0", "1": "pk1"}, verification=INCREMENTAL_VERIFICATION),
+        Begin_Game(0, {"0": "pk0", "1": "pk1"}, play=STREAM_PLAY),
+        Message_Deck(None, ["a2V5", "Y2FyZA=="]),
+        Commit_Card(1, ["a2V5", "Y2FyZA=="], [1, 2, 3]),
+        Sign_Final_Deck_ACK(0, {"1": [1, 2, 3]}),
+        Verify_Cards(None, {"1": [1, 2, 3]}),
+        Verify_Card_OK(1),
+        Verify_Card_NOK(1, ["2"]),
+        Cheat_Verify({"1": True}, "Cards"),
+        Disqualify(2, 0),
+        Cards_Validated(1),
+        Ask_Sym_Keys(),
+        Post_Sym_Keys(1, "c3ltX2tleQ=="),
+        Post_Final_Decks(0, {"0": {"deck": ["a2V5"], "sym_key": "c3ltX2tleQ=="}}, ["a2V5"]),
+        Verify_Deck_OK(1),
+        Verify_Deck_NOK(1, ["2"]),
+        Ask_For_Winner(0),
+        Winner(1, [1]),
+        Winner_ACK(0, [1]),
+        Call_Numbers(0, [7, 0, 42]),
+        Bingo(1, 17),
+        Get_Players_List(1),
+        Players_List(None, {"1": {"nick": "player"}}),
+    ]
+
+
+def test_decode_every_message():
+    for message in sample_messages():
+        msg, signature, certificate = Protocol.decode(repr(message).encode('utf-8'))
+        assert type(msg) == type(message)
+        assert repr(msg) == repr(message)
+        assert signature is None and certificate is None
+
+        msg, signature, certificate = Protocol.decode(repr(SignedMessage(message, "ab")).encode('utf-8'))
+        assert repr(msg) == repr(message)
+        assert signature == "ab" and certificate is None
+
+        msg, signature, certificate = Protocol.decode(repr(CertMessage(message, "ab", "cd")).encode('utf-8'))
+        assert repr(msg) == repr(message)
+        assert signature == "ab" and certificate == "cd"
+
+
+def test_binary_wire():
+    for message in sample_messages():
+        data = Protocol.encode(SignedMessage(message, "ab"), BINARY_WIRE)
+        assert data[:1] == BINARY_FRAME
+
+        msg, signature, certificate = Protocol.decode(data)
+        assert type(msg) == type(message)
+        assert repr(msg) == repr(message)
+        assert signature == "ab" and certificate is None
+
+    # Decks travel as raw bytes, without the base64 overhead
+    deck = [bytes([number]) * 96 for number in range(60)]
+    message = Commit_Card(1, deck, list(range(1, 16)))
+    msg, signature, certificate = Protocol.decode(Protocol.encode(message, BINARY_WIRE))
+    assert msg.deck == deck and msg.card == list(range(1, 16))
+    assert len(Protocol.encode(message, BINARY_WIRE)) < len(Protocol.encode(message, JSON_WIRE))
+
+
+def test_frame():
+    message = SignedMessage(Verify_Cards(None, {"1": [1, 2, 3]}), "ab")
+    frame = Frame(message)
+
+    # Encoded once per wire format, then reused
+    assert frame.encoded(JSON_WIRE) is frame.encoded(JSON_WIRE)
+    for wire in WIRE_FORMATS:
+        data = frame.encoded(wire)
+        assert int.from_bytes(data[:4], "big") == len(data) - 4
+        assert data[4:] == Protocol.encode(message, wire)
+
+
+class Session:
+    """ Session key of a connection, as security.Session: anything with a mac of the bytes of a message. """
+    def mac(self, data):
+        return hashlib.sha256(b"key" + data).hexdigest()
+
+
+def test_mac_frame():
+    session = Session()
+    for message in sample_messages():
+        frame = Frame(SignedMessage(message, "ab"))
+        for wire in WIRE_FORMATS:
+            data = frame.encoded(wire, session)
+            msg, signature, certificate = Protocol.decode(data[4:])
+            assert repr(msg) == repr(message)
+            if isinstance(message, SIGNED_MESSAGES):
+                # Relayed messages keep the signature of their sender
+                assert signature == "ab" and not isinstance(signature, Mac)
+            else:
+                assert isinstance(signature, Mac) and signature == session.mac(repr(message).encode('utf-8'))
+                assert data[4:] == Protocol.encode(MacMessage(message, signature), wire)
+
+    # Without a session key, the frame is the signed one
+    frame = Frame(SignedMessage(Ask_For_Winner(0), "ab"))
+    assert frame.encoded(JSON_WIRE, None) == frame.encoded(JSON_WIRE)
+
+
+def test_canonical_bytes():
+    for message in sample_messages():
+        canonical = message.canonical()
+        assert canonical == repr(message).encode('utf-8') and message.canonical() is canonical
+        for signed in (SignedMessage(message, "ab"), CertMessage(message, "ab", "cd"), MacMessage(message, "ef"), SignedMessage(message, {"root": "ab", "path": ["L00"]})):
+            # The same frames the json representation of the whole dictionary gave
+            data = json.loads(signed.canonical())
+            assert signed.canonical() == json.dumps(data).encode('utf-8')
+
+            # The message is received as the bytes it was signed over
+            msg, signature, certificate = Protocol.decode(Protocol.encode(signed))
+            assert msg.__dict__.get("_canonical") == canonical and repr(msg) == repr(message)
+
+    # A field that changes changes the representation
+    message = Verify_Cards(0, [[1, 2, 3]])
+    before = message.canonical()
+    message.playing_cards = [[4, 5, 6]]
+    assert message.canonical() != before and message.canonical() == repr(message).encode('utf-8')
+    msg, signature, certificate = Protocol.decode(SignedMessage(Verify_Cards(0, [[1, 2, 3]]), "ab").canonical())
+    msg.ID = 1
+    assert b'"ID": 1' in msg.canonical()
+
+    # A field changed in place is only serialized again once the message is invalidated
+    message = Verify_Cards(0, [[1, 2, 3]])
+    before = message.canonical()
+    message.playing_cards[0].append(4)
+    assert message.canonical() == before
+    message.invalidate()
+    assert message.canonical() == repr(message).encode('utf-8') and b'[[1, 2, 3, 4]]' in message.canonical()
+    msg, signature, certificate = Protocol.decode(Protocol.encode(SignedMessage(message, "ab")))
+    assert msg.playing_cards == [[1, 2, 3, 4]]
+    msg.playing_cards.pop()
+    msg.invalidate()
+    assert msg.canonical() == b'{"command": "Verify_Cards", "ID": 0, "playing_cards": []}'
+
+    # Frames laid out otherwise are read whole, and what is kept is always what was parsed
+    for data in (b'{"signature": "ab", "message": {"command": "Cheat", "ID": 1}}',
+                 b'{"message": {"command": "Cheat", "ID": 2}, "message": {"command": "Cheat", "ID": 1}, "signature": "ab"}',
+                 b'{"message": {"command": "Cheat", "ID": 1}, "signature": "ab", "message": {"command": "Cheat", "ID": 2}}'):
+        msg, signature, certificate = Protocol.decode(data)
+        assert signature == "ab"
+        assert msg.canonical() == repr(msg).encode('utf-8')
+
+
+def test_decode_bad_format():
+    for data in [b'not json', b'{"ID": 1}', b'{"command": "Winner", "ID": 1}', b'{"command": "Unknown", "ID": 1}',
+                 b'{"message": {"command": "Unknown", "ID": 1}, "signature": "ab"}',
+                 b'{"message": {"command": "Register", "type": "Foo"}, "signature": "ab"}']:
+        try:
+            Protocol.decode(data)
+            assert False
+        except BadFormatError:
+            pass
+
+    data = Protocol.encode(Message_Deck(None, [b"a" * 96] * 60), BINARY_WIRE)
+    try:
+        Protocol.decode(data[:-1])
+        assert False
+    except BadFormatError:
+        pass
+
+
+def test_async_streams():
+    async def exchange():
+        pa_side, client_side = socket.socketpair()
+        reader, writer = await asyncio.open_connection(sock=pa_side)
+
+        message = SignedMessage(Commit_Card(1, [b"a" * 96] * 60, [1, 2, 3]), "ab")
+        Protocol.send_msg(client_side, message)
+        msg, signature, certificate = await Protocol.recv_msg_async(reader)
+        assert repr(msg) == repr(message.message) and signature == "ab"
+
+        await Protocol.send_msg_async(writer, Frame(message))
+        msg, signature, certificate = Protocol.recv_msg(client_side)
+        assert repr(msg) == repr(message.message) and signature == "ab"
+
+        # The End-of-File of the other side
+        client_side.close()
+        assert await Protocol.recv_msg_async(reader) == (None, None)
+        writer.close()
+
+    asyncio.run(exchange())
+
+
+@click.command()
+@click.option('--test', '-t', help='choose from: [decode_every_message, binary_wire, frame, mac_frame, canonical_bytes, decode_bad_format, async_streams]')
+def main(test):
+    if test == 'decode_every_message':
+        test_decode_every_message()
+    elif test == 'binary_wire':
+        test_binary_wire()
+    elif test == 'frame':
+        test_frame()
+    elif test == 'mac_frame':
+        test_mac_frame()
+    elif test == 'canonical_bytes':
+        test_canonical_bytes()
+    elif test == 'decode_bad_format':
+        test_decode_bad_format()
+    elif test == 'async_streams':
+        test_async_streams()
+    else:
+        print("No test chosen")
+        return
+    print("All tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -15,23 +15,35 @@ sys.path.append(str(path_root))
 import messages.protocol as proto
 import security.security as secure
 import security.vsc_security as vsc
+import security.audit as audit
+from game.engine import CardEngine, CardTracker
 
 class Player:
     ADDRESS = '127.0.0.1'
 
-    def __init__(self, nick: str, port):
+    def __init__(self, nick: str, port, wire = proto.JSON_WIRE, table = None, suite = secure.DEFAULT_SUITE):
         # Personal Information
         self.nick = nick
         self.ID = None
         self.port = port
+        self.wire = wire                                                        # Wire format requested to the Playing Area
+        self.table = table                                                      # Table of the Playing Area hosting the game
 
         # Generated Keys
+        self.suite = suite                                                      # Signature suite of the assymetric key pair
         self.private_key = None
         self.public_key = None
         self.sym_key = None
+        self.session = None                                                     # Session key agreed with the Playing Area, if the Caller chose the MAC authentication
 
         # Game Information
         self.N = 0                                                              # Size of the Playing Deck
+        self.cipher = secure.CBC_CIPHER                                         # Layered encryption of the Playing Deck, chosen by the Caller
+        self.verification = proto.BULK_VERIFICATION                             # Deck verification of Step 3, chosen by the Caller
+        self.play = proto.BATCH_PLAY                                            # Play of Step 4, chosen by the Caller
+        self.tracker = None                                                     # State of my Playing Card while the numbers are called, in the streaming play
+        self.claimed = False                                                    # Flag to indicate if I already claimed Bingo
+        self.received_deck = []                                                 # Deck received to shuffle in Step 1
         self.players_info = {}                                                  # Info about the Players
         self.card = []                                                          # My playing card
         self.playing_deck = []                                                  # Playing Deck in plaintext form
@@ -56,7 +68,11 @@ class Player:
         self.generate_keys()
 
         # Envio da Register Message à Playing Area
-        message = proto.RegisterMessage("Player", self.public_key, nick=self.nick)
+        wire = self.wire if self.wire != proto.JSON_WIRE else None
+        suite = self.suite if self.suite != secure.DEFAULT_SUITE else None
+        # Ephemeral key to agree on a session key with the Playing Area, used if the Caller of the table chose the MAC authentication
+        session_key, session = secure.gen_session_key()
+        message = proto.RegisterMessage("Player", self.public_key, nick=self.nick, wire=wire, table=self.table, suite=suite, session=session)
         signature = vsc.sign_message(message)
         certificate = vsc.get_cert_data()        
         cert_message = proto.CertMessage(message, signature, certificate)
@@ -81,8 +97,26 @@ class Player:
             exit()
         elif isinstance(msg, proto.Register_ACK):
             self.playing_area_pk = msg.pk
+            secure.register_public_keys(msg.pk)
             self.ID = msg.ID
-            print("Register Accepted")
+            proto.Protocol.set_wire(self.socket, msg.wire)
+            self.table = msg.table
+            if msg.session is not None:
+                self.agree_session(session_key, msg, signature)
+            print(f"Register Accepted at table {self.table}")
+
+    def agree_session(self, session_key, msg, signature):
+        """
+        Agrees on a session key with the Playing Area, from the ephemeral key it sent in the Register_ACK.
+        """
+        if not secure.verify_signature(msg, signature, msg.pk):
+            # The ephemeral key is only trusted if the Playing Area signed it
+            print("The Register_ACK signature was forged! The game is compromised.")
+            print("Shutting down...")
+            self.socket.close()
+            exit()
+        self.session = secure.agree_session(session_key, msg.session)
+        proto.Protocol.set_session(self.socket, self.session)
 
     def read_data(self, socket):
         """
@@ -104,11 +138,13 @@ class Player:
         # Verify if the signature of the message belongs to the Playing Area
         if signature is not None:
             sender_ID = msg.ID
-            if sender_ID is None:
-                sender_pub_key = self.playing_area_pk
+            if isinstance(signature, proto.Mac):
+                # Routine messages are authenticated by the Playing Area, with the session key of the connection
+                valid = self.session is not None and not isinstance(msg, proto.SIGNED_MESSAGES) and self.session.verify(msg, signature)
             else:
-                sender_pub_key = self.users[sender_ID]
-            if not secure.verify_signature(msg, signature, sender_pub_key):
+                sender_pub_key = self.playing_area_pk if sender_ID is None else self.users[sender_ID]
+                valid = secure.verify_signature(msg, signature, sender_pub_key)
+            if not valid:
                 # If the Playing Area signature is faked, the game is compromised
                 print("The Playing Area or the Caller signature was forged! The game is compromised.")
                 print("Shutting down...")
@@ -122,8 +158,13 @@ class Player:
         if isinstance(msg, proto.Begin_Game):
             print("\nThe game is starting...")
             self.users = {int(k): v for k, v in msg.pks.items()}
+            self.cipher = msg.cipher or secure.CBC_CIPHER
+            self.verification = msg.verification or proto.BULK_VERIFICATION
+            self.play = msg.play or proto.BATCH_PLAY
+            secure.register_public_keys(*self.users.values())
         elif isinstance(msg, proto.Message_Deck):
             self.N = len(msg.deck)
+            self.received_deck = msg.deck
 
             print("\nStep 1")
             print("I am shuffling the deck...")
@@ -139,9 +180,7 @@ class Player:
                 print("I have generated my Cheating Playing Card...")
 
                 cheat_message = proto.Cheat(self.ID)
-                signature = secure.sign_message(cheat_message, self.private_key)
-                new_message = proto.SignedMessage(cheat_message, signature)
-                proto.Protocol.send_msg(socket, new_message)
+                proto.Protocol.send_msg(socket, self.signed(cheat_message))
 
             reply = proto.Commit_Card(self.ID, shuffled_deck, self.card)
         elif isinstance(msg, proto.Ask_Sym_Keys):
@@ -162,11 +201,17 @@ class Player:
             else:
                 # Someone else was disqualified
                 print(f"Player {msg.disqualified_ID} has been disqualified.")
-                self.players_info.pop(int(msg.disqualified_ID))
+                # A Player disqualified before Step 3 has no info yet
+                self.players_info.pop(int(msg.disqualified_ID), None)
         elif isinstance(msg, proto.Post_Final_Decks):
-            reply = self.decrypt(msg.decks)
+            if self.verification == proto.INCREMENTAL_VERIFICATION:
+                reply = self.verify_previous_shuffle(msg.decks)
+            else:
+                reply = self.decrypt(msg.decks)
         elif isinstance(msg, proto.Ask_For_Winner):
             reply = self.find_winner()
+        elif isinstance(msg, proto.Call_Numbers):
+            reply = self.mark_numbers(msg.numbers)
         elif isinstance(msg, proto.Winner_ACK):
             if self.ID in [int(id) for id in msg.ID_winner]:
                 print("\nBingo! I'm the Winner!")
@@ -192,16 +237,23 @@ class Player:
 
         if reply is not None:
             # There is a message to be sent
-            signature = secure.sign_message(reply, self.private_key)
-            new_message = proto.SignedMessage(reply, signature)
-            proto.Protocol.send_msg(socket, new_message)
+            proto.Protocol.send_msg(socket, self.signed(reply))
 
     def generate_keys(self):
         """
         Function responsible for the generation of this User's assymetric key pair
         :return:
         """
-        self.private_key, self.public_key = secure.gen_assymetric_key()
+        self.private_key, self.public_key = secure.gen_assymetric_key(self.suite)
+
+    def signed(self, msg):
+        """
+        :return: the message signed with my private key. With a session key, routine messages are left unsigned, as the
+        connection authenticates them with it when they are sent.
+        """
+        if self.session is not None and not isinstance(msg, proto.SIGNED_MESSAGES):
+            return proto.SignedMessage(msg, None)
+        return proto.SignedMessage(msg, secure.sign_message(msg, self.private_key))
 
     def shuffle_deck(self, deck):
         """
@@ -212,9 +264,7 @@ class Player:
         self.sym_key = secure.gen_symmetric_key()
         rand = random.randint(0, 100)
         if rand>5:
-            new_deck = []
-            for number in deck:
-                new_deck.append(base64.b64encode(secure.encrypt_number(base64.b64decode(number), self.sym_key)).decode('utf-8'))
+            new_deck = secure.encrypt_deck(deck, self.sym_key, self.cipher)
 
             return random.sample(new_deck, len(deck))
         else:
@@ -239,21 +289,19 @@ class Player:
     def verify_cards(self, msg):
         print("\nStep 2")
         print("Starting the process of validating Playing Cards...")
-        cheaters = []
-
-        for player in msg.playing_cards.keys():
-            if int(player) == self.ID:
-                continue
+        # Every card is checked at once: N/4 different numbers, in the range of the deck
+        cards = {player: card for player, card in msg.playing_cards.items() if int(player) != self.ID}
+        cheaters = CardEngine(cards).invalid(self.N)
 
+        for player in cards.keys():
             print(f"Verifying Player {player}'s Playing Card...")
 
-            if len(set(msg.playing_cards[player])) != int(self.N/4):
+            if player in cheaters:
                 print(f"Player {player} has cheated!")
-                cheaters.append(player)
             else:
                 print("Everything OK!")
 
-            self.players_info[int(player)] = {"card": msg.playing_cards[player]}
+            self.players_info[int(player)] = {"card": cards[player]}
 
         if len(cheaters) > 0:
             return proto.Verify_Card_NOK(self.ID, cheaters)
@@ -264,29 +312,28 @@ class Player:
     def decrypt(self, decks):
         print("\nStep 3")
         print("I will now start to decrypt the Deck and verify if anyone cheated")
-        keys = sorted(decks, reverse=True)
+        # The IDs are strings when the decks come in a json frame
+        keys = sorted(decks, key=int, reverse=True)
         current_deck = list()
         cheaters = []
 
+        # Every layer is decrypted at once, with its key decoded a single time, before the decks are compared
+        layers = [(decks[key]["deck"], base64.b64decode(decks[key]["sym_key"]), 1 if int(key) == 0 else 0) for key in keys]
+        decrypted_decks = secure.decrypt_layers(layers, self.cipher)
+
         # We start the decryption process by taking the Deck encrypted by the player with the highest ID, and working all the way down to the lowest ID
         for i in range(len(keys)):
             if i != 0:
                 # If there's a difference between the deck received in this step, and the deck determined after decryption in the previous step, the previous player cheated
                 # The only being compared is if the set of numbers in both decks are matching - order doesn't matter
-                dif = set(current_deck).difference(set([base64.b64decode(number) for number in decks[keys[i]]["deck"]]))
+                dif = set(current_deck).difference(set(decks[keys[i]]["deck"]))
 
                 if len(dif) > 0 and keys[i-1] != self.ID:
                     cheaters.append(keys[i-1])
                     print(f"Player {keys[i - 1]} cheated!")
 
-            new_deck = list()
-            for number in decks[keys[i]]["deck"]:
-                flag = 1 if int(keys[i]) == 0 else 0
-                decrypted_number = secure.decrypt_number(base64.b64decode(number), base64.b64decode(decks[keys[i]]["sym_key"]), flag)
-                new_deck.append(decrypted_number)
-
             # The new current_deck will be the deck resulting from the decryption of the deck signed by the current player being analysed
-            current_deck = new_deck
+            current_deck = decrypted_decks[i]
 
         print("Final plaintext Deck: " + str(current_deck))
 
@@ -300,30 +347,73 @@ class Player:
             print("Nobody has cheated")
             return proto.Verify_Deck_OK(self.ID)
 
-    def find_winner(self):
-        print("\nStep 4")
-        print("\nI will now start the process of determining the winner:")
-        print("This is my Playing card: " + str(self.card))
+    def verify_previous_shuffle(self, decks):
+        """
+        Incremental verification of Step 3: instead of every layer, only the shuffle of the User before this Player is checked,
+        by decrypting the deck received from it in Step 1 and comparing it with the digest the Caller recorded of the deck it
+        was given. The first Player checks instead that it was given the deck of the Caller, and also checks the shuffle of the
+        last Player, whose deck the Caller sends along with its own; so each shuffle is checked by a Player and by the Caller.
+        :return: the Verify_Deck_OK or Verify_Deck_NOK message
+        """
+        print("\nStep 3")
+        print("I will now decrypt the Deck I received and verify if the Player before me cheated")
+        decks = {int(user_id): layer for user_id, layer in decks.items()}
+        keys = sorted(decks)
+        cheaters = []
 
-        winners = []
+        previous = keys[keys.index(self.ID) - 1] if self.ID in keys else 0
+        if previous != 0:
+            # The deck received must be the one the Caller recorded for the previous Player, and decrypt to the deck that Player was given
+            if not self.shuffled(self.received_deck, decks, previous):
+                cheaters.append(previous)
+                print(f"Player {previous} cheated!")
+        elif self.ID in keys:
+            # The deck received must be the one the Caller encrypted, which the Playing Deck is obtained from
+            if secure.deck_digest(self.received_deck) != decks[0]["digest"] or secure.deck_digest(decks[0]["deck"]) != decks[0]["digest"]:
+                print("The deck of the Caller was tampered with! The game is compromised.")
+                print("Shutting down...")
+                self.selector.unregister(self.socket)
+                self.socket.close()
+                exit()
 
-        # Find the Winner
-        for number in self.playing_deck:
-            if number in self.card:
-                self.card.remove(number)
+            # No Player comes after the last one: the first Player checks its shuffle, over the final deck
+            last = keys[-1]
+            if last != self.ID and not self.shuffled(decks[last].get("deck", []), decks, last):
+                cheaters.append(last)
+                print(f"Player {last} cheated!")
 
-            if len(self.card) == 0:
-                winners.append(self.ID)
+        # The playing deck is the plaintext deck obtained by decrypting the deck of the Caller
+        self.playing_deck = secure.decrypt_deck(decks[0]["deck"], base64.b64decode(decks[0]["sym_key"]), 1, self.cipher)
+        print("Final plaintext Deck: " + str(self.playing_deck))
 
-            for player in self.players_info.keys():
-                if number in self.players_info[player]["card"]:
-                    self.players_info[player]["card"].remove(number)
+        if len(cheaters) > 0:
+            return proto.Verify_Deck_NOK(self.ID, cheaters)
+        else:
+            print("Nobody has cheated")
+            return proto.Verify_Deck_OK(self.ID)
 
-                if len(self.players_info[player]["card"]) == 0:
-                    winners.append(player)
+    def shuffled(self, deck, decks, player):
+        """
+        Checks the shuffle of a Player in the incremental verification of Step 3.
+        :param deck: the deck the Player returned in Step 1
+        :param decks: the digests and symmetric keys sent by the Caller, by User
+        :return: whether the deck is the one the Caller recorded for the Player, and decrypts to the deck that Player was given
+        """
+        keys = sorted(decks)
+        before = keys[keys.index(player) - 1]
+        if secure.deck_digest(deck) != decks[player]["digest"]:
+            return False
+        decrypted_deck = secure.decrypt_deck(deck, base64.b64decode(decks[player]["sym_key"]), 0, self.cipher)
+        return secure.deck_digest(decrypted_deck) == decks[before]["digest"]
+
+    def find_winner(self):
+        print("\nStep 4")
+        print("\nI will now start the process of determining the winner:")
+        print("This is my Playing card: " + str(self.card))
 
-            if len(winners) != 0:
-                break
+        # Find the Winner, from the call at which each card completes
+        engine = CardEngine({self.ID: self.card, **{player: self.players_info[player]["card"] for player in self.players_info.keys()}})
+        winners = engine.winners(self.playing_deck)[0]
 
         if self.ID not in winners:
             # Maybe I will cheat
@@ -339,19 +429,51 @@ class Player:
             print(f"I determined {person} as a winner")
         return proto.Winner(self.ID, winners)
 
+    def mark_numbers(self, numbers):
+        """
+        Streaming play of Step 4: marks the numbers just called in my Playing Card, and claims Bingo as soon as it completes.
+        :param numbers: the numbers called, in order
+        :return: the Bingo claim, or None
+        """
+        if self.tracker is None:
+            print("\nStep 4")
+            print("\nThe numbers are being called:")
+            print("This is my Playing card: " + str(self.card))
+            self.tracker = CardTracker({self.ID: self.card})
+
+        first = self.tracker.calls + 1
+        completed = self.tracker.call(numbers)
+        for counter, number in enumerate(numbers, first):
+            print(f"#{counter}: {number}")
+
+        if self.claimed:
+            return None
+
+        if self.ID in completed:
+            print(f"\nBingo! My card is complete at call #{completed[self.ID]}")
+            self.claimed = True
+            return proto.Bingo(self.ID, completed[self.ID])
+
+        if first == 1:
+            # Maybe I will cheat
+            rand = random.randint(0, 100)
+
+            if rand < 5:
+                print("I am cheating... claiming a Bingo I do not have")
+                proto.Protocol.send_msg(self.socket, proto.Cheat(self.ID))
+                self.claimed = True
+                return proto.Bingo(self.ID, self.tracker.calls)
+        return None
+
     def got_keyboard_data(self, stdin):
         txt = stdin.read().strip()
 
         if txt == "1":
             msg = proto.Get_Players_List(self.ID)
-            signature = secure.sign_message(msg, self.private_key)
-            reply = proto.SignedMessage(msg, signature)
-            proto.Protocol.send_msg(self.socket, reply)
+            proto.Protocol.send_msg(self.socket, self.signed(msg))
         elif txt == "2":
-            f = open("security.log", "r")
-            content = f.read()
-            print(content)
-            f.close()
+            # Read through a memory map and an index, rather than all at once
+            audit.show_log("security.log")
         elif txt == "3":
             print("Shutting down...")
             self.selector.unregister(self.socket)
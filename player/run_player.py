@@ -1,11 +1,14 @@
-from player import Player
+from player import Player, proto, secure
 import click
 
 @click.command()
 @click.option('--nick', '-n', prompt="Enter your nick, please", help='Port to connect to the Playing Area')
 @click.option('--port', '-p', type=int, required=True, help='Port to connect to the Playing Area')
-def main(nick, port):
-    p = Player(nick, port)
+@click.option('--wire', default=proto.JSON_WIRE, type=click.Choice(proto.WIRE_FORMATS), help='Wire format to request to the Playing Area')
+@click.option('--table', '-t', default=None, type=int, help='Table to join in the Playing Area (the oldest one still registering Players by default)')
+@click.option('--suite', default=secure.DEFAULT_SUITE, type=click.Choice(list(secure.SUITES)), help='Signature suite of the keys used to sign the messages of the game')
+def main(nick, port, wire, table, suite):
+    p = Player(nick, port, wire, table, suite)
     p.connect()
     p.loop()
 
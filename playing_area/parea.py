@@ -1,10 +1,13 @@
 #!/bin/python
 
 import sys
+import time
 import socket
+import asyncio
 import selectors
+import threading
+import collections
 import click
-import logging
 from pathlib import Path
 from cryptography.hazmat.primitives import serialization
 
@@ -14,27 +17,207 @@ sys.path.append(str(path_root))
 import messages.protocol as proto
 import security.security as secure
 import security.vsc_security as vsc
+import security.audit as audit
+import security.offload as offload
 
-CONNECTED_PLAYERS = {}                              # Dictionary holding the Connected Clients {ID: socket}
-PLAYERS_INFO = {}
-CALLER = {}
+TABLES = {}                                         # Dictionary holding the open Tables {table ID: Table}
+SOCKET_TABLES = {}                                  # Dictionary holding the Table each registered socket is seated at {socket: Table}
+TABLES_LOCK = threading.Lock()
 CALLER_WHITELIST = {"BI096890913": "ARISTIDES VAS"}
-CURRENT_ID = 1
 NUMBER_OF_PLAYERS = 4
 PUBLIC_KEY = None
 PRIVATE_KEY = None
-CONTADOR = 1
-NHASHED = ""
+SUITE = secure.DEFAULT_SUITE                        # Signature suite of the key pair of the Playing Area
+ROUND_TIMEOUT = 60                                  # Seconds the Players have to reply to each request/reply round
+AUDIT_LOG = audit.AuditLog('security.log')          # Hash-chained log of the messages of every Table
+CRYPTO_WORKERS = 0                                  # Processes the signatures are verified and made in, 0 to do it in the handler of each Table
+CRYPTO = None                                       # Pool of those processes
+
+
+class Table:
+    """
+    A game hosted by the Playing Area, with its own Caller and Players.
+    The messages of a Table are handled, in order, by a task of its event loop, so a round waiting on the Players of one game does not hold back the others.
+    Each Table runs its own event loop in a thread of its own, unless the Playing Area serves every Table from a single loop, in the asyncio mode.
+    """
+    def __init__(self, ID, loop=None):
+        self.ID = ID
+        self.connected_players = {}                 # Dictionary holding the Connected Players {ID: {"socket": connection, "public_key": pk}}
+        self.players_info = {}
+        self.caller = {}
+        self.current_id = 1
+        self.seats = set()                          # Connections of the Players routed to the Table, registered or not, guarded by TABLES_LOCK
+        self.number_of_players = NUMBER_OF_PLAYERS
+        self.started = False                        # Set when the Caller begins the game, closing the registration
+        self.sessions = False                       # Set when the Caller asks for the routine messages to be authenticated with session keys
+        self.closed = False
+        self.loop = asyncio.new_event_loop() if loop is None else loop
+        self.inbox = asyncio.Queue()                # Messages routed to this Table (connection, msg, signature, certificate)
+        self.deferred = collections.deque()         # Messages set aside during a round, handled after it
+
+    def post(self, connection, msg, signature=None, certificate=None):
+        """
+        Hands a received message to the Table. It may be called from any thread.
+        """
+        message = (connection, msg, signature, certificate)
+        if not self.closed:
+            try:
+                self.loop.call_soon_threadsafe(self.receive, message)
+                return
+            except RuntimeError:
+                # The event loop of the Table was closed meanwhile
+                pass
+        self.receive(message)
+
+    def receive(self, message):
+        """
+        Queues a message in the event loop of the Table. The connection is closed instead if the Table was already closed and its client left.
+        """
+        if not self.closed:
+            self.inbox.put_nowait(message)
+        elif message[1] is None:
+            close_connection(message[0])
+
+    async def next_message(self, timeout=None):
+        """
+        :return: the next message to be handled, (connection, msg, signature, certificate)
+        """
+        if len(self.deferred) > 0:
+            return self.deferred.popleft()
+        return await asyncio.wait_for(self.inbox.get(), timeout)
+
+    def is_open(self):
+        """
+        :return: whether Players can still take a seat at the Table
+        """
+        return not self.started and not self.closed and len(self.seats) < self.number_of_players
+
+    def free_seat(self, connection):
+        """
+        Frees the seat held by the connection of a Player that was not registered, or that left the Table.
+        """
+        with TABLES_LOCK:
+            self.seats.discard(connection)
+
+    def registered(self, connection):
+        """
+        :return: whether the connection belongs to the Caller or to a Player registered at the Table
+        """
+        if len(self.caller) > 0 and self.caller[0]["socket"] == connection:
+            return True
+        return any(player["socket"] == connection for player in self.connected_players.values())
+
+
+def open_table(ID=None, loop=None):
+    """
+    Opens a new Table, with the given ID or the lowest free one.
+    :param loop: the event loop serving every Table in the asyncio mode, None to give the Table a thread of its own
+    :return: the Table, or None if the ID is taken
+    """
+    with TABLES_LOCK:
+        if ID is None:
+            ID = 1
+            while ID in TABLES:
+                ID += 1
+        elif ID in TABLES:
+            return None
+        table = Table(ID, loop)
+        TABLES[ID] = table
+
+    if loop is None:
+        threading.Thread(target=run_table, args=(table,), daemon=True).start()
+    else:
+        loop.create_task(serve_table(table))
+    print(f"Table {ID} opened")
+    return table
+
+
+def run_table(table):
+    """
+    Serves a Table in a thread of its own, until it is closed.
+    """
+    table.loop.run_until_complete(serve_table(table))
+    table.loop.close()
+
+
+def close_table(table):
+    """
+    Closes a Table, whose game is over or compromised. The connections of the clients that already left are closed.
+    """
+    with TABLES_LOCK:
+        TABLES.pop(table.ID, None)
+    table.closed = True
+
+    messages = list(table.deferred)
+    while not table.inbox.empty():
+        messages.append(table.inbox.get_nowait())
+    for connection, msg, signature, certificate in messages:
+        if msg is None:
+            close_connection(connection)
+
+    # The game is over for the Players still seated
+    for player in table.connected_players.values():
+        end_connection(player["socket"])
+    print(f"Table {table.ID} closed")
+
+
+def seat(connection, msg, loop=None):
+    """
+    Chooses the Table a client will register at: the Caller opens a new Table, and a Player joins the one it asked for or,
+    by default, the oldest Table still registering Players.
+    :param connection: the connection of the client
+    :param msg: the RegisterMessage of the client
+    :param loop: the event loop serving every Table in the asyncio mode
+    :return: the Table, or None if there is no Table for the client
+    """
+    if msg.type == "Caller":
+        return open_table(msg.table, loop)
+    with TABLES_LOCK:
+        # The seat is held as the Player is routed, so the Players registering at once do not all take the last one
+        if msg.table is not None:
+            table = TABLES.get(msg.table)
+        else:
+            table = next((table for table in TABLES.values() if table.is_open()), None)
+        if table is not None:
+            table.seats.add(connection)
+        return table
+
+
+def route(connection, msg, signature, certificate, loop=None):
+    """
+    Hands a message received from a client to the Table it is seated at. Register messages seat new clients.
+    :param loop: the event loop serving every Table in the asyncio mode
+    :return: False if the client has no Table to register at, True otherwise
+    """
+    table = SOCKET_TABLES.get(connection)
+
+    if msg == None:
+        # The client left, the Table it was seated at is told about it
+        SOCKET_TABLES.pop(connection, None)
+        if table is not None:
+            table.post(connection, None)
+        else:
+            close_connection(connection)
+        return True
+
+    if table is None and isinstance(msg, proto.RegisterMessage):
+        table = seat(connection, msg, loop)
+        if table is None:
+            print("There is no table for the client. It will not be registered.")
+            return False
+        SOCKET_TABLES[connection] = table
+
+    if table is not None:
+        table.post(connection, msg, signature, certificate)
+    return True
 
-logging.basicConfig(filename='security.log', filemode='w', level=logging.INFO, \
-                    format='%(seq)s - %(asctime)s - %(hash)s - %(message)s', \
-                    datefmt='%m/%d/%Y %I:%M:%S %p')
 
 def dispatch( srv_socket ):
+    """
+    Serves the clients of every Table from a single selector, routing their messages to their Tables.
+    """
     global PRIVATE_KEY
     global PUBLIC_KEY
-    global CONTADOR
-    global NHASHED
 
     selector = selectors.DefaultSelector()
 
@@ -42,7 +225,8 @@ def dispatch( srv_socket ):
     selector.register( srv_socket, selectors.EVENT_READ, data=None )
 
     # Generate assymetric key pair for signing Messages
-    PRIVATE_KEY, PUBLIC_KEY = secure.gen_assymetric_key()
+    PRIVATE_KEY, PUBLIC_KEY = secure.gen_assymetric_key(SUITE)
+    start_crypto_pool()
 
     while True:
         events = selector.select( timeout=None )
@@ -69,196 +253,289 @@ def dispatch( srv_socket ):
                     msg, signature = message
                     certificate = None
 
-                
-                if signature is not None and certificate is None:
-                    # Verify if the signature of the message belongs to the Client that sent it
-                    sender_ID = msg.ID
-                    if sender_ID == 0:
-                        sender_pub_key = CALLER[sender_ID]["public_key"]
-                    else:
-                        sender_pub_key = CONNECTED_PLAYERS[sender_ID]["public_key"]
-
-                    if not secure.verify_signature(msg, signature, sender_pub_key):
-                        # If the Client signature is fake
-                        if sender_ID == 0:
-                            # The game is compromised, shut PA down
-                            print('The Caller signature was forged! The game is compromised.')
-                            print('Shutting down, as the game now has no caller...')
-                            selector.unregister(key.fileobj)
-                            key.fileobj.close()
-                            exit()
-                        else:
-                            # Disqualify Player
-                            m = proto.Disqualify(msg.ID)
-                            signature = secure.sign_message(m, PRIVATE_KEY)
-                            new_msg = proto.Message(m, signature)
-                            proto.Protocol.send_msg(CALLER[0]["socket"], new_msg)
-                            logging.info('Sent Disqualify message to caller - %s', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-                            NHASHED = "Sent Disqualify message to caller"
-                            CONTADOR += 1
-                
-                if signature is not None and certificate is not None:
-                    print("Received a certificate. Validating it...")
-                    if vsc.validate_signature(signature, msg, certificate):
-                        print("The signature is valid. The client will be registered.")
-                        # If the signature is valid, we can proceed with the registration
-                        string, reply = register_new_client(msg, certificate, key.fileobj)
-                        if reply is not None:
-                            print("Sending reply to client...")
-                            signature = secure.sign_message(reply, PRIVATE_KEY)
-                            new_msg = proto.SignedMessage(reply, signature)
-                            proto.Protocol.send_msg(key.fileobj, new_msg)
-                            if msg.type == "Caller":
-                                logging.info('Sent %s to caller - %s ', string,  signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-                                NHASHED = "Sent " + string + "to caller"
-                                CONTADOR += 1
-                            else:
-                                logging.info('Sent %s to player %s - %s ', string, msg.nick, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-                                NHASHED = "Sent " + string + "to player " + msg.nick
-                                CONTADOR += 1
-                        continue
-                    else:
-                        print("The signature is not valid. The client will not be registered.")
-
                 if msg == None:
-                    if key.fileobj == CALLER[0]["socket"]:
-                        CALLER.pop(0)
-                        print( 'Caller removed' )
-                        print( 'Shutting down, as the game now has no caller...')
-                        selector.unregister(key.fileobj)
-                        key.fileobj.close()
-                        exit()
-                    else:
-                        key_to_remove = next((k for k, value in CONNECTED_PLAYERS.items() if value == key.fileobj), None)
-                        if key_to_remove != None:
-                            CONNECTED_PLAYERS.pop(key_to_remove)
-                            print( 'Player removed' )
                     selector.unregister(key.fileobj)
-                    key.fileobj.close()
-                    continue
 
-                read_data(msg, signature, key.fileobj)
+                if not route(key.fileobj, msg, signature, certificate):
+                    nack = proto.Register_NACK()
+                    proto.Protocol.send_msg(key.fileobj, proto.SignedMessage(nack, sign(nack)))
+
 
-def read_data(msg, signature, socket):
+async def serve_client(reader, writer):
+    """
+    Reads the messages of a client, in the asyncio mode, and routes them to its Table.
+    A client that is slow to send a message only holds back its own coroutine.
+    """
+    while True:
+        try:
+            message = (None, None)
+            message = await proto.Protocol.recv_msg_async(reader)
+            msg = message[0]
+            signature = message[1]
+            certificate = message[2]
+        except Exception:
+            msg, signature = message
+            certificate = None
+
+        if not route(writer, msg, signature, certificate, asyncio.get_running_loop()):
+            await send(writer, await signed(proto.Register_NACK()))
+        if msg == None:
+            return
+
+
+async def serve( srv_socket ):
+    """
+    The asyncio mode of dispatch: serves the clients of every Table, and the Tables themselves, from a single event loop.
+    """
+    global PRIVATE_KEY
+    global PUBLIC_KEY
+
+    # Generate assymetric key pair for signing Messages
+    PRIVATE_KEY, PUBLIC_KEY = secure.gen_assymetric_key(SUITE)
+    start_crypto_pool()
+
+    server = await asyncio.start_server(serve_client, sock=srv_socket)
+    async with server:
+        await server.serve_forever()
+
+
+async def serve_table(table):
+    """
+    Handles the messages of a Table, in the order they were received, until the Table is closed.
+    """
+    while not table.closed:
+        await handle_message(table, *(await table.next_message()))
+
+
+async def handle_message(table, socket, msg, signature, certificate):
+    """
+    Verifies a message received from a client seated at the Table, and executes the code for it.
+    """
+    global PRIVATE_KEY
+
+    if msg == None:
+        if len(table.caller) > 0 and socket == table.caller[0]["socket"]:
+            table.caller.pop(0)
+            print( 'Caller removed' )
+            print( f'Closing table {table.ID}, as the game now has no caller...')
+            close_table(table)
+        else:
+            key_to_remove = next((k for k, value in table.connected_players.items() if value["socket"] == socket), None)
+            if key_to_remove != None:
+                table.connected_players.pop(key_to_remove)
+                print( 'Player removed' )
+            # Registered or not, the Player no longer holds a seat
+            table.free_seat(socket)
+        close_connection(socket)
+        return
+
+    if not isinstance(msg, proto.Message):
+        # Only the Messages of the Protocol are handled
+        if table.registered(socket):
+            log_event(table, "Dropped a message that is not of the Protocol", signature)
+        else:
+            turn_away(table, socket, "Turned away an unregistered client that sent a message that is not of the Protocol", signature)
+        return
+
+    if not table.registered(socket):
+        # A client registers, with the signature of its Citizen Card, before sending anything else
+        if signature is None or certificate is None or not isinstance(msg, proto.RegisterMessage):
+            turn_away(table, socket, f"Turned away {msg.command} message of an unregistered client", signature)
+            return
+    elif certificate is not None:
+        log_event(table, f"Dropped {msg.command} message of a client already registered", signature)
+        return
+
+    if signature is not None and certificate is None:
+        # Verify if the signature of the message belongs to the Client that sent it
+        sender_ID = getattr(msg, "ID", None)
+        if sender_ID == 0:
+            sender = table.caller.get(sender_ID)
+        else:
+            sender = table.connected_players.get(sender_ID) if isinstance(sender_ID, int) else None
+        if sender is None or sender["socket"] != socket:
+            # The ID is not the one of the client that sent the message: a client that left the game, or a forged ID
+            log_event(table, f"Dropped {msg.command} message with a forged or unknown ID", signature)
+            return
+
+        try:
+            if isinstance(signature, proto.Mac):
+                # Routine messages authenticated with the session key of the connection of the Client
+                session = proto.Protocol.SESSIONS.get(sender["socket"])
+                valid = session is not None and not isinstance(msg, proto.SIGNED_MESSAGES) and session.verify(msg, signature)
+            else:
+                valid = await offload_job(socket, secure.verify_signature, msg, signature, sender["public_key"])
+        except (ValueError, TypeError):
+            # A signature that can not even be parsed is not valid either
+            valid = False
+
+        if not valid:
+            # If the Client signature is fake
+            if sender_ID == 0:
+                # The game is compromised, close the Table
+                print('The Caller signature was forged! The game is compromised.')
+                print(f'Closing table {table.ID}, as the game now has no caller...')
+                close_table(table)
+                return
+            else:
+                # Disqualify Player
+                await disqualify(table, sender_ID, "it forged a signature")
+                return
+
+    if signature is not None and certificate is not None:
+        print("Received a certificate. Validating it...")
+        try:
+            valid = await offload_job(socket, vsc.validate_signature, signature, msg, certificate)
+        except (ValueError, TypeError):
+            # A signature or a certificate that can not even be parsed is not valid either
+            valid = False
+        if valid:
+            print("The signature is valid. The client will be registered.")
+            # If the signature is valid, we can proceed with the registration
+            string, reply = await register_new_client(table, msg, certificate, socket)
+            if reply is not None:
+                print("Sending reply to client...")
+                if msg.type == "Caller":
+                    await send_signed(socket, reply, table, f"Sent {string} to caller")
+                else:
+                    await send_signed(socket, reply, table, f"Sent {string} to player {msg.nick}")
+            if not isinstance(reply, proto.Register_ACK):
+                SOCKET_TABLES.pop(socket, None)
+                table.free_seat(socket)
+                if len(table.caller) == 0:
+                    close_table(table)
+            return
+        else:
+            print("The signature is not valid. The client will not be registered.")
+            turn_away(table, socket, f"Turned away {msg.command} message with an invalid Citizen Card signature", signature)
+            return
+
+    await read_data(table, msg, signature, socket)
+
+
+def turn_away(table, socket, event, signature=None):
+    """
+    Turns away a client that is not registered at the Table: its seat is freed and its connection ended, while the game of
+    the Table goes on. The Table is closed if the client was the Caller that opened it.
+    :param event: what the client sent, for the log
+    """
+    log_event(table, event, signature)
+    SOCKET_TABLES.pop(socket, None)
+    table.free_seat(socket)
+    end_connection(socket)
+    if len(table.caller) == 0:
+        close_table(table)
+
+
+async def read_data(table, msg, signature, socket):
     """
     This function will determine the class of the received Message, and call the code that should be executed when an instance of this Message is received.
+    :param table: The Table the message was sent to
     :param msg: The message received
     :param socket: The socket that sent the message
     :return:
     """
     global PRIVATE_KEY
 
-    global CONTADOR
-    global NHASHED
-
     reply = None
 
     if isinstance(msg, proto.Begin_Game):
-        logging.info('Received Begin_Game message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Begin_Game message"
-        CONTADOR += 1
+        log_event(table, "Received Begin_Game message", signature)
         # Fazer forward da Mensagem para todos os jogadores
         print("Registration process is completed!\n\nTHE GAME WILL NOW START")
         print("\nStep 1. Generation of the Playing Deck and the Player Cards")
+        table.started = True
         msg.ID = None
-        signature = secure.sign_message(msg, PRIVATE_KEY)
-        broadcast_to_players(msg, signature, "Begin_Game")
+        signature = (await signed(msg, table.sessions)).signature
+        await broadcast_to_players(table, msg, signature, "Begin_Game")
     elif isinstance(msg, proto.Message_Deck):
-        logging.info('Received Message_Deck message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Message_Deck message"
-        CONTADOR += 1
+        log_event(table, "Received Message_Deck message", signature)
         # Processo de shuffling do deck
-        deck_generation(msg.deck)
+        await deck_generation(table, msg.deck)
     elif isinstance(msg, proto.Sign_Final_Deck_ACK):
-        logging.info('Received Sign_Final_Deck_Ack message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Sign_Final_Deck_Ack message"
-        CONTADOR += 1
+        log_event(table, "Received Sign_Final_Deck_ACK message", signature)
 
         print("\nStep 2: Validating player cards")
         # Pedir chaves simétricas a todos os Utilizadors e enviar para o Caller
-        reply = share_sym_keys()
-
-        signature = secure.sign_message(reply, PRIVATE_KEY)
-        reply = proto.SignedMessage(reply, signature)
-        proto.Protocol.send_msg(socket, reply)
-
-        logging.info('Sent Post_Sym_Keys message to caller - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Post_Sym_Keys message to caller"
-        CONTADOR += 1
+        reply = await share_sym_keys(table)
+        await send_signed(socket, reply, table, "Sent Post_Sym_Keys message to caller")
 
-        reply = verify_playing_cards(msg.playing_cards)
+        reply = await verify_playing_cards(table, msg.playing_cards)
     elif isinstance(msg, proto.Disqualify):
-        logging.info('Received Disqualify message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Disqualify message"
-        CONTADOR += 1
-        broadcast_to_players(msg, signature, "Disqualify")
-        CONNECTED_PLAYERS.pop(int(msg.disqualified_ID))
-        PLAYERS_INFO[int(msg.disqualified_ID)]["disqualified"] = True
+        log_event(table, "Received Disqualify message", signature)
+        await broadcast_to_players(table, msg, signature, "Disqualify")
+        # The Playing Area may have disqualified the Player already
+        table.connected_players.pop(int(msg.disqualified_ID), None)
+        table.players_info[int(msg.disqualified_ID)]["disqualified"] = True
     elif isinstance(msg, proto.Post_Final_Decks):
-        logging.info('Received Post_Final_Decks message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Post_Final_Decks message"
-        CONTADOR += 1
+        log_event(table, "Received Post_Final_Decks message", signature)
         print("\nStep 3: Validating the Playing Deck")
         print("Received all decks and symmetric keys. Broadcasting to players...")
-        reply = verify_playing_deck(msg, signature)
+        reply = await verify_playing_deck(table, msg, signature)
 
     elif isinstance(msg, proto.Ask_For_Winner):
-        logging.info('Received Ask_For_Winner message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Ask_For_Winner message"
-        CONTADOR += 1
+        log_event(table, "Received Ask_For_Winner message", signature)
 
         print("\nStep 4: Determining the Winner")
-        broadcast_to_players(msg, signature, "Ask_For_Winner")
+        await broadcast_to_players(table, msg, signature, "Ask_For_Winner")
     elif isinstance(msg, proto.Winner):
-        logging.info('Received Winner message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Winner message"
-        CONTADOR += 1
-        new_msg = proto.SignedMessage(msg, signature)
-        proto.Protocol.send_msg(CALLER[0]["socket"], new_msg)
-        logging.info('Sent Winner message to caller - %s', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Winner message to caller"
-        CONTADOR += 1
+        log_event(table, "Received Winner message", signature)
+        await send_to_caller(table, proto.SignedMessage(msg, signature), "Winner")
+    elif isinstance(msg, proto.Call_Numbers):
+        log_event(table, "Received Call_Numbers message", signature)
+        # Fan out each batch of the streaming play as soon as it is called
+        await broadcast_to_players(table, msg, signature, "Call_Numbers")
+    elif isinstance(msg, proto.Bingo):
+        log_event(table, "Received Bingo message", signature)
+        await send_to_caller(table, proto.SignedMessage(msg, signature), "Bingo")
     elif isinstance(msg, proto.Winner_ACK):
-        logging.info('Received Winner_ACK message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Winner_ACK message"
-        CONTADOR += 1
-        broadcast_to_players(msg, signature, "Winner_ACK")
-        print("\nThe game has succesfully finished!")
+        log_event(table, "Received Winner_ACK message", signature)
+        await broadcast_to_players(table, msg, signature, "Winner_ACK")
+        print(f"\nThe game of table {table.ID} has succesfully finished!")
     elif isinstance(msg, proto.Get_Players_List):
-        logging.info('Received Get_Players_List message - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Received Get_Players_List message"
-        CONTADOR += 1
+        log_event(table, "Received Get_Players_List message", signature)
         print("Received request for Players List")
-        reply = proto.Players_List(None, PLAYERS_INFO)
+        reply = proto.Players_List(None, table.players_info)
 
     if reply != None:
-        signature = secure.sign_message(reply, PRIVATE_KEY)
-        reply = proto.SignedMessage(reply, signature)
-        proto.Protocol.send_msg(socket, reply)
-        logging.info('Sent Message  - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Message"
-        CONTADOR += 1
+        await send_signed(socket, reply, table, f"Sent {reply.command} message")
 
 
-def register_new_client(msg, certificate, socket):
+async def register_new_client(table, msg, certificate, socket):
     """
-    Function that will verify a Register Message to check whether the new Client can be registered as a Player/Caller or not.
+    Function that will verify a Register Message to check whether the new Client can be registered as a Player/Caller of the Table or not.
+    :param table: The Table the client asked to be seated at
     :param msg:
     :param socket:
     :return:
     """
     reply = None
-    global NUMBER_OF_PLAYERS
-    global CURRENT_ID
+    string = None
     global PUBLIC_KEY
-    global CONTADOR
-    global NHASHED
     cc_name, cc_number = vsc.get_name_and_number(certificate)
 
-    if msg.type == "Caller":
+    # Binary wire format, if the client asked for it; json otherwise
+    wire = msg.wire if msg.wire in proto.WIRE_FORMATS else None
+    # Signature suite of the Playing Area, left out for RSA-PSS
+    suite = SUITE if SUITE != secure.DEFAULT_SUITE else None
+    # Session key of the connection, if the client offered one at a Table whose routine messages are authenticated with them
+    session, session_public_key = None, None
+    if msg.session is not None and (msg.type == "Caller" or table.sessions):
+        try:
+            session_private_key, session_public_key = secure.gen_session_key()
+            session = secure.agree_session(session_private_key, msg.session)
+        except (ValueError, TypeError):
+            session, session_public_key = None, None
+
+    if secure.public_key_suite(msg.pk) != (msg.suite or secure.DEFAULT_SUITE):
+        # The public key does not belong to the signature suite the client announced
+        print("Public key does not match the signature suite")
+        reply = proto.Register_NACK()
+        string = "Register_NACK"
+    elif msg.type == "Caller":
         print("Received a Register Message from a Caller")
-        if len(CALLER.keys()) > 0:
-            # We already have a Caller registered in the Playing Area
+        if len(table.caller.keys()) > 0:
+            # We already have a Caller registered in the Table
             reply = proto.Register_NACK()
             string = "Register_NACK"
         else:
@@ -267,9 +544,13 @@ def register_new_client(msg, certificate, socket):
                 print("Caller is in the whitelist")
                 if cc_name == CALLER_WHITELIST[cc_number]:
                     print("Caller name is correct")
-                    CALLER[0] = {"socket": socket, "public_key": msg.pk}
-                    NUMBER_OF_PLAYERS = msg.num_players
-                    reply = proto.Register_ACK(0, PUBLIC_KEY)
+                    table.caller[0] = {"socket": socket, "public_key": msg.pk}
+                    secure.register_public_keys(msg.pk)
+                    table.number_of_players = msg.num_players
+                    table.sessions = session is not None
+                    reply = proto.Register_ACK(0, PUBLIC_KEY, wire, table.ID, suite, session_public_key)
+                    proto.Protocol.set_wire(socket, wire)
+                    proto.Protocol.set_session(socket, session)
                     string = "Register_ACK"
             else:
                 print("Caller is not in the whitelist")
@@ -277,242 +558,395 @@ def register_new_client(msg, certificate, socket):
                 string = "Register_NACK"
     else:
         # User do tipo Cliente
-        if len(CONNECTED_PLAYERS.keys()) > NUMBER_OF_PLAYERS or len(CALLER.keys()) == 0:
+        if len(table.connected_players.keys()) > table.number_of_players or len(table.caller.keys()) == 0 or table.started:
             # Refuse new player connection
             reply = proto.Register_NACK()
             string = "Register_NACK"
+        elif table.sessions and session is None:
+            # Every connection of the Table must authenticate its routine messages with a session key
+            print("The Player did not offer a session key")
+            reply = proto.Register_NACK()
+            string = "Register_NACK"
         else:
-            CONNECTED_PLAYERS[CURRENT_ID] = {"socket": socket, "public_key": msg.pk}
-            PLAYERS_INFO[CURRENT_ID] = {"nick": msg.nick, "disqualified": False, "playing_card": None, "public_key": msg.pk}
-            reply = proto.Register_ACK(CURRENT_ID, PUBLIC_KEY)
+            table.connected_players[table.current_id] = {"socket": socket, "public_key": msg.pk}
+            table.players_info[table.current_id] = {"nick": msg.nick, "disqualified": False, "playing_card": None, "public_key": msg.pk}
+            secure.register_public_keys(msg.pk)
+            reply = proto.Register_ACK(table.current_id, PUBLIC_KEY, wire, table.ID, suite, session_public_key)
+            proto.Protocol.set_wire(socket, wire)
+            proto.Protocol.set_session(socket, session)
             string = "Register_ACK"
-            CURRENT_ID += 1
+            table.current_id += 1
 
             # Redirect to the Caller player registration signed
-            signature = secure.sign_message(msg, PRIVATE_KEY)
-            r = proto.SignedMessage(msg, signature)
-            proto.Protocol.send_msg(CALLER[0]["socket"], r)
-            logging.info('Sent RegisterMessage to caller - %s', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-            NHASHED = "Sent RegisterMessage to caller"
-            CONTADOR += 1
+            await send_to_caller(table, await signed(msg, table.sessions), "Register")
 
-            print(f"Welcome to the Playing Area, {msg.nick}.")
+            print(f"Welcome to table {table.ID} of the Playing Area, {msg.nick}.")
 
     return string, reply
 
-def deck_generation(initial_deck):
+
+async def deck_generation(table, initial_deck):
     """
     The Playing Area will redirect the initial deck created by the Caller to each Player, in turn, in order to shuffle the deck.
     During this process, the Playing Area will also receive the Playing Card form each Player
+    The Commit_Card of each Player is forwarded to the Caller while the next Player is already shuffling, so the forward is not on the critical path.
+    :param table: The Table whose deck is being shuffled
     :param initial_deck: The initial deck created by the Caller
     """
     global PRIVATE_KEY
-    global CONTADOR
-    global NHASHED
 
     print("Deck shuffling process beginning: ")
+    start = time.perf_counter()
     current_deck = initial_deck
+    pending = None                                  # Commit_Card of the previous Player, still to be forwarded to the Caller
 
-    for player in CONNECTED_PLAYERS.keys():
+    for player in list(table.connected_players.keys()):
         # Send the Deck to the Player
         print(f"Sending deck to player {player}.")
         msg = proto.Message_Deck(None, current_deck)
-        signature = secure.sign_message(msg, PRIVATE_KEY)
-        new_msg = proto.SignedMessage(msg, signature)
-        proto.Protocol.send_msg(CONNECTED_PLAYERS[player]["socket"], new_msg)
-        logging.info('Sent Message_Deck message to %s - %s ', player, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Message_Deck message to player " + str(player)
-        CONTADOR += 1
+        await scatter(table, proto.Frame(await signed(msg, table.sessions)), "Message_Deck", [player])
+
+        # While the Player shuffles, forward the previous Commit_Card to the Caller
+        if pending is not None:
+            await forward_commit_card(table, *pending)
+            pending = None
 
         # Wait for the reply
-        while True:
-            try:
-                message = (None, None)
-                message = proto.Protocol.recv_msg(CONNECTED_PLAYERS[player]["socket"])
-                reply = message[0]
-                signature = message[1]
-                certificate = message[2]
-            except:
-                reply, signature = message
-                certificate = None
-
-            if isinstance(reply, proto.Commit_Card):
-                # If the player is sending a CHEAT message, ignore, else continue the process
-                break
-
-        # Forward the Commit Card message to the Caller
-        print(
-            f"Player {player} has returned their shuffled version of the deck and their playing card. Forwarding the deck to the Caller.")
-
-        new_msg = proto.SignedMessage(reply, signature)
-        proto.Protocol.send_msg(CALLER[0]["socket"], new_msg)
-        logging.info('Sent Commit_Card message to caller - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Commit_Card message to caller"
-        CONTADOR += 1
-
-        if isinstance(reply, proto.Commit_Card):
-            current_deck = reply.deck
+        replies = await collect_replies(table, proto.Commit_Card, "Message_Deck", [player])
+        if player not in replies:
+            # The Caller never gets a playing card from this Player: it leaves the game before Step 2
+            await disqualify(table, player, "it did not reply to the Message_Deck message in time")
+            continue
+
+        reply, signature = replies[player]
+        print(f"Player {player} has returned their shuffled version of the deck and their playing card.")
+        pending = (player, reply, signature)
+        current_deck = reply.deck
+
+    if pending is not None:
+        await forward_commit_card(table, *pending)
 
     # Send the final deck to the Caller
     msg = proto.Message_Deck(None, current_deck)
-    signature = secure.sign_message(msg, PRIVATE_KEY)
-    new_msg = proto.SignedMessage(msg, signature)
-    proto.Protocol.send_msg(CALLER[0]["socket"], new_msg)
-    logging.info('Sent Message_Deck message to caller - %s ', signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-    NHASHED = "Sent Message_Deck message to caller"
-    CONTADOR += 1
-    
+    await send_to_caller(table, await signed(msg, table.sessions), "Message_Deck")
+    print(f"Deck shuffling process completed in {time.perf_counter() - start:.3f} seconds")
+
+
+async def disqualify(table, player, reason):
+    """
+    Disqualifies a Player that forged a signature or did not reply in time. The Player and the Caller are sent a Disqualify
+    signed by the Playing Area, and the Player leaves the Table; the Caller then disqualifies it as it does a cheater, so the
+    other Players learn of it.
+    :param reason: why the Player is disqualified, for the log
+    """
+    print(f"Player {player} is disqualified, as {reason}.")
+    m = proto.Disqualify(player)
+    msg = proto.SignedMessage(m, await offload_job(None, sign, m))
+    try:
+        await send(table.connected_players[player]["socket"], msg)
+    except OSError:
+        # The Player had already left
+        pass
+    table.connected_players.pop(player)
+    table.players_info[player]["disqualified"] = True
+    await send_to_caller(table, msg, "Disqualify")
+
+
+async def disqualify_late(table, players, replies, string):
+    """
+    Disqualifies the Players that did not reply to a round in time, so the game goes on without them.
+    :param players: the IDs of the Players the round was sent to
+    :param replies: the replies collected, by Player
+    :param string: the name of the message of the round, for the log
+    """
+    for player in players:
+        if player not in replies and player in table.connected_players:
+            await disqualify(table, player, f"it did not reply to the {string} message in time")
+
+
+async def forward_commit_card(table, player, reply, signature):
+    """
+    Forwards the Commit_Card of a Player, with its original signature, to the Caller.
+    """
+    print(f"Forwarding the deck and playing card of player {player} to the Caller.")
+    await send_to_caller(table, proto.SignedMessage(reply, signature), "Commit_Card")
+
+
+async def send_to_caller(table, msg, string):
+    """
+    Sends a signed message to the Caller of the Table, and logs it.
+    """
+    await send(table.caller[0]["socket"], msg)
+    log_event(table, "Sent " + string + " message to caller", msg.signature)
+
+
+async def signed(msg, sessions=False):
+    """
+    :param sessions: whether every connection the message is sent through has a session key. Routine messages are then
+    left unsigned, as each connection authenticates them with its own key when they are sent.
+    :return: the message signed by the Playing Area
+    """
+    if sessions and not isinstance(msg, proto.SIGNED_MESSAGES):
+        return proto.SignedMessage(msg, None)
+    return proto.SignedMessage(msg, await offload_job(None, sign, msg))
+
+
+def sign(msg):
+    """
+    :return: the signature of the message by the Playing Area. The workers of the crypto pool, forked after the key pair
+    was generated, hold the same key.
+    """
+    return secure.sign_message(msg, PRIVATE_KEY)
+
+
+async def offload_job(connection, function, *args):
+    """
+    Runs a signature verification or signing in the crypto pool, if the Playing Area has one, and waits for its result
+    without holding back the other Tables served by the same event loop. It runs right away otherwise.
+    :param connection: the connection the job is about, whose jobs are delivered in order, None if any
+    """
+    if CRYPTO is None:
+        return function(*args)
+    return await asyncio.wrap_future(CRYPTO.submit(function, *args, key=connection))
 
 
-def verify_playing_cards(playing_cards):
+def start_crypto_pool():
+    """
+    Starts the crypto pool, once the key pair of the Playing Area is generated, if it was asked for.
+    """
+    global CRYPTO
+    if CRYPTO_WORKERS > 0:
+        CRYPTO = offload.CryptoPool(CRYPTO_WORKERS)
+
+
+async def send(connection, msg):
+    """
+    Sends a message through the connection of a client: its socket, or its StreamWriter in the asyncio mode.
+    """
+    if isinstance(connection, asyncio.StreamWriter):
+        await proto.Protocol.send_msg_async(connection, msg)
+    else:
+        proto.Protocol.send_msg(connection, msg)
+
+
+def end_connection(connection):
+    """
+    Ends the connection of a client still seated at a closed Table. It is closed once its reader gets to the End-of-File.
+    """
+    try:
+        if isinstance(connection, asyncio.StreamWriter):
+            connection.close()
+        else:
+            connection.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        # The client had already left
+        pass
+
+
+def close_connection(connection):
+    """
+    Closes the connection of a client that left.
+    """
+    proto.Protocol.set_wire(connection, proto.JSON_WIRE)
+    proto.Protocol.set_session(connection, None)
+    connection.close()
+
+
+async def send_signed(socket, reply, table=None, event=None):
+    """
+    Signs a reply of the Playing Area and sends it through the connection.
+    :param table: the Table the reply belongs to, if it should be logged
+    :param event: the description of the reply in the log
+    """
+    reply = await signed(reply, socket in proto.Protocol.SESSIONS)
+    await send(socket, reply)
+    if table is not None:
+        log_event(table, event, reply.signature)
+
+
+def log_event(table, event, signature):
+    """
+    Logs a message sent or received in a Table. The record is written, chained to the previous one, by the writer of the audit log.
+    """
+    # The type of the message is the command named in the event
+    kind = next((word for word in event.split() if word in proto.DECODERS), audit.NO_TYPE)
+    AUDIT_LOG.append(kind, f"Table {table.ID}: {event} - {signature}")
+
+
+async def scatter(table, frame, string, players=None):
+    """
+    Sends a frame to several Players, without waiting for their replies.
+    :param table: the Table of the Players
+    :param frame: the Frame sent to the Players
+    :param string: the name of the sent message, for the log
+    :param players: the IDs of the Players, all the connected Players by default
+    """
+    for player in (list(table.connected_players.keys()) if players is None else players):
+        await send(table.connected_players[player]["socket"], frame)
+        log_event(table, "Sent " + string + " message to player " + str(player), frame.message.signature)
+
+
+async def collect_replies(table, expected, string, players=None, timeout=ROUND_TIMEOUT):
+    """
+    Collects the replies of several Players as they arrive, until all of them have replied or the deadline is reached.
+    Messages of other types received from them meanwhile (such as Cheat) are logged and skipped, and the messages of
+    the other clients of the Table are set aside, to be handled after the round.
+    :param table: the Table of the Players
+    :param expected: the Message classes accepted as a reply
+    :param string: the name of the message being replied to, for the log
+    :param players: the IDs of the Players, all the connected Players by default
+    :param timeout: seconds given to the Players to reply
+    :return: a dictionary with the reply and signature of each Player that replied {ID: (reply, signature)}
+    """
+    deadline = time.perf_counter() + timeout
+    replies = {}
+    set_aside = []
+    waiting = {table.connected_players[player]["socket"]: player for player in (table.connected_players.keys() if players is None else players)}
+
+    while len(waiting) > 0:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+
+        try:
+            message = await table.next_message(timeout=remaining)
+        except asyncio.TimeoutError:
+            break
+
+        socket, reply, signature = message[:3]
+        if socket not in waiting or reply is None:
+            # Other clients, and Players that left the game, are dealt with after the round
+            set_aside.append(message)
+            waiting.pop(socket, None)
+            continue
+
+        player = waiting[socket]
+        log_event(table, f"Received {reply.command} message from player {player}", signature)
+
+        if isinstance(reply, expected):
+            replies[player] = (reply, signature)
+            waiting.pop(socket)
+
+    for player in waiting.values():
+        print(f"Player {player} did not reply to the {string} message in time.")
+    table.deferred.extend(set_aside)
+
+    return replies
+
+
+async def gather_replies(table, frame, expected, string, timeout=ROUND_TIMEOUT):
+    """
+    Sends a frame to every Player of the Table at once, and then collects their replies as they arrive.
+    The round therefore takes about as long as the slowest Player, instead of the sum of all of them.
+    :return: a dictionary with the reply and signature of each Player that replied {ID: (reply, signature)}
+    """
+    start = time.perf_counter()
+
+    # Scatter: send the message to all Players before waiting for any of them
+    await scatter(table, frame, string)
+    # Gather: read each reply as soon as its Player sends it
+    replies = await collect_replies(table, expected, string, timeout=timeout)
+
+    print(f"Collected {len(replies)} {string} replies in {time.perf_counter() - start:.3f} seconds")
+    return replies
+
+
+async def verify_playing_cards(table, playing_cards):
     """
     The Playing Area will receive the Playing Cards from each Player, and will verify whether they are valid or not.
     :return:
     """
     global PRIVATE_KEY
-    global CONTADOR
-    global NHASHED
 
-    verified_playing_cards = {user_id : True for user_id in CONNECTED_PLAYERS.keys()}
+    players = list(table.connected_players.keys())
 
     msg = proto.Verify_Cards(None, playing_cards)
-    signature = secure.sign_message(msg, PRIVATE_KEY)
-    new_msg = proto.SignedMessage(msg, signature)
-
-    for player in CONNECTED_PLAYERS.keys():
-        # Enviar a carta ao jogador
-        print(f"Sending all Playing Cards to player {player}, and waiting for their validation")
-        proto.Protocol.send_msg(CONNECTED_PLAYERS[player]["socket"], new_msg)
-        logging.info('Sent Verify_Cards message to player %s - %s ', str(player), signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Verify_Cards message to player " + str(player)
-        CONTADOR += 1
-        # Esperar pela resposta 
-        try:
-            message = (None, None)
-            message = proto.Protocol.recv_msg(CONNECTED_PLAYERS[player]["socket"])
-            reply = message[0]
-            signature = message[1]
-            certificate = message[2]
-            logging.info('Received message from player %s - %s ', player, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-            NHASHED = "Received message from player " + str(player)
-            CONTADOR += 1 
-        except Exception as e:
-            print(e)
-            reply, signature = message
-            certificate = None
+    new_msg = proto.Frame(await signed(msg, table.sessions))
+
+    # Enviar as cartas a todos os jogadores, e esperar pela validação de cada um
+    print("Sending all Playing Cards to the players, and waiting for their validation")
+    replies = await gather_replies(table, new_msg, (proto.Verify_Card_OK, proto.Verify_Card_NOK), "Verify_Cards")
+    # A Player that does not answer does not accept the cards: it leaves the game
+    await disqualify_late(table, players, replies, "Verify_Cards")
+    verified_playing_cards = {user_id : True for user_id in table.connected_players.keys()}
 
+    for player in table.connected_players.keys():
+        reply = replies.get(player, (None, None))[0]
         if isinstance(reply, proto.Verify_Card_NOK):
-            for player in reply.users:
-                print(f"Card from player {player} is invalid.")
-                verified_playing_cards[int(player)] = False
+            for cheater in reply.users:
+                print(f"Card from player {cheater} is invalid.")
+                verified_playing_cards[int(cheater)] = False
+
+        table.players_info[int(player)]["playing_card"] = playing_cards[str(player)]
 
-        PLAYERS_INFO[int(player)]["playing_card"] = playing_cards[str(player)]
-    
     # Enviar a resposta ao Caller
     return proto.Cheat_Verify(verified_playing_cards, "Cards")
 
 
-def verify_playing_deck(msg, signature):
-    global PRIVATE_KEY
-    global CONTADOR
-    global NHASHED
+async def verify_playing_deck(table, msg, signature):
+    players = list(table.connected_players.keys())
 
-    players_cheated = {user_id: True for user_id in CONNECTED_PLAYERS.keys()}
+    new_msg = proto.Frame(proto.SignedMessage(msg, signature))
 
-    new_msg = proto.SignedMessage(msg, signature)
-
-    for player in CONNECTED_PLAYERS.keys():
-        # Enviar a carta ao jogador
-        print(f"Sending playing deck to player {player}.")
-        proto.Protocol.send_msg(CONNECTED_PLAYERS[player]["socket"], new_msg)
-        logging.info('Sent Post_Final_Decks message to player %s- %s ', player, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Post_Final_Decks message to player " + str(player)
-        CONTADOR += 1
-        # Esperar pela resposta
-        try:
-            message = (None, None)
-            message = proto.Protocol.recv_msg(CONNECTED_PLAYERS[player]["socket"])
-            reply = message[0]
-            signature = message[1]
-            certificate = message[2]
-            logging.info('Received message from player %s- %s ', player, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-            NHASHED = "Received message from player " + str(player)
-            CONTADOR += 1
-        except Exception as e:
-            print(e)
-            reply, signature = message
-            certificate = None
+    # Enviar o deck a todos os jogadores, e esperar pela validação de cada um
+    print("Sending playing deck to the players.")
+    replies = await gather_replies(table, new_msg, (proto.Verify_Deck_OK, proto.Verify_Deck_NOK), "Post_Final_Decks")
+    # A Player that does not answer does not accept the deck: it leaves the game
+    await disqualify_late(table, players, replies, "Post_Final_Decks")
+    players_cheated = {user_id: True for user_id in table.connected_players.keys()}
 
+    for player, (reply, signature) in replies.items():
         if isinstance(reply, proto.Verify_Deck_NOK):
-            for player in reply.users:
-                print(f"Player {player} cheated!")
-                players_cheated[int(player)] = False
+            for cheater in reply.users:
+                print(f"Player {cheater} cheated!")
+                players_cheated[int(cheater)] = False
 
     # Enviar a resposta ao Caller
     return proto.Cheat_Verify(players_cheated, "Deck")
 
-def share_sym_keys():
+async def share_sym_keys(table):
     global PRIVATE_KEY
-    global CONTADOR
-    global NHASHED 
-
-    sym_keys = {}
 
     # Pedir a chave simétrica a todos os Players
     msg = proto.Ask_Sym_Keys()
-    signature = secure.sign_message(msg, PRIVATE_KEY)
-    new_msg = proto.SignedMessage(msg, signature)
-
-    for player in CONNECTED_PLAYERS.keys():
-        proto.Protocol.send_msg(CONNECTED_PLAYERS[player]["socket"], new_msg)
-        logging.info('Sent Ask_Sym_Keys message to player %s- %s ', player, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent Ask_Sym_Keys message to player " + str(player)
-        CONTADOR += 1
-        try:
-            message = (None, None)
-            message = proto.Protocol.recv_msg(CONNECTED_PLAYERS[player]["socket"])
-            reply = message[0]
-            signature = message[1]
-            certificate = message[2]
-            logging.info('Received message from player %s- %s ', player, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-            NHASHED = "Received message from player " + str(player)
-            CONTADOR += 1
-        except Exception as e:
-            print(e)
-            reply, signature = message
-            certificate = None
+    new_msg = proto.Frame(await signed(msg, table.sessions))
 
-        sym_keys[player] = reply.sym_key
+    players = list(table.connected_players.keys())
+    replies = await gather_replies(table, new_msg, proto.Post_Sym_Keys, "Ask_Sym_Keys")
+    await disqualify_late(table, players, replies, "Ask_Sym_Keys")
+    sym_keys = {player: reply.sym_key for player, (reply, signature) in replies.items()}
 
     # Enviar chaves simétricas ao Caller
     return proto.Post_Sym_Keys(None, sym_keys)
 
 
-def broadcast_to_players(msg, signature, string):
+async def broadcast_to_players(table, msg, signature, string):
     """
-    Broadcasts a message to all Players
+    Broadcasts a message to all Players of the Table
     :param msg:
     :return:
     """
-    global CONTADOR
-    global NHASHED
-
-    new_msg = proto.SignedMessage(msg, signature)
-
-    for player in CONNECTED_PLAYERS.keys():
-        proto.Protocol.send_msg(CONNECTED_PLAYERS[player]["socket"], new_msg)
-        logging.info('Sent %s message to player %s - %s ', string, player, signature, extra={'seq': CONTADOR, 'hash': hash(NHASHED)})
-        NHASHED = "Sent " + string + " message to player " + str(player)
-        CONTADOR += 1
+    # Serialized once, and written as is to every Player
+    await scatter(table, proto.Frame(proto.SignedMessage(msg, signature)), string)
 
 
 @click.command()
 @click.option('--port', '-p', type=int, required=True, help='Port to connect to the Playing Area')
-def main(port):
+@click.option('--asyncio', 'use_asyncio', is_flag=True, help='Serve every client and table from a single asyncio event loop')
+@click.option('--suite', default=secure.DEFAULT_SUITE, type=click.Choice(list(secure.SUITES)), help='Signature suite of the keys used to sign the messages of the Playing Area')
+@click.option('--crypto-workers', default=0, type=click.IntRange(0), help='Processes the signatures are verified and made in (0, the default, to do it in the handler of each table)')
+def main(port, use_asyncio, suite, crypto_workers):
+    global SUITE
+    global CRYPTO_WORKERS
+    SUITE = suite
+    CRYPTO_WORKERS = crypto_workers
     with socket.socket( socket.AF_INET, socket.SOCK_STREAM ) as s:
         s.bind( ('0.0.0.0', port ) )
         s.listen()
-        dispatch( s )
+        if use_asyncio:
+            asyncio.run(serve( s ))
+        else:
+            dispatch( s )
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
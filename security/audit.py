@@ -0,0 +1,350 @@
+import os
+import mmap
+import time
+import zlib
+import queue
+import bisect
+import fcntl
+import struct
+import atexit
+import hashlib
+import threading
+import collections
+from array import array
+import click
+
+AUDIT_BATCH = 4096                                  # Records the writer formats and writes together, at most
+AUDIT_INTERVAL = 0.05                               # Seconds the writer waits for more records before writing a batch
+GENESIS = "0" * 64                                  # Hash of the first record, which has no previous record
+SEPARATOR = " - "
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+NO_TYPE = "-"                                       # Type of the records that are not about a message
+INDEX_SUFFIX = ".idx"                               # Sidecar index of a log, next to it
+INDEX_MAGIC = b"AUDITIX1"
+INDEX_HEADER = struct.Struct("<8sQQQI")             # Magic, seq of the first record, records indexed, bytes of the log they take, CRC-32 of the last one
+INDEX_ENTRY = struct.Struct("<QI")                  # Offset of a record in the log, CRC-32 of its type
+
+
+def chain_hash(previous):
+    """
+    :param previous: the previous record, as written to the log, without its line break
+    :return: the SHA-256 digest of the previous record, in hex, chaining a record to it
+    """
+    return hashlib.sha256(previous.encode('utf-8')).hexdigest()
+
+
+def format_record(seq, timestamp, previous_hash, kind, text):
+    """
+    :return: a record of the audit log, "seq - time - hash - type - text", without its line break
+    """
+    date = time.strftime(DATE_FORMAT, time.localtime(timestamp))
+    # The text is kept in a single line, so every record is a line of the log
+    text = str(text).replace("\n", " ")
+    return SEPARATOR.join((str(seq), date, previous_hash, kind, text))
+
+
+def parse_record(line):
+    """
+    :param line: a record of the audit log
+    :return: the fields of the record (seq, time, hash, type, text)
+    """
+    seq, date, previous_hash, kind, text = line.rstrip("\n").split(SEPARATOR, 4)
+    return int(seq), date, previous_hash, kind, text
+
+
+class AuditLog:
+    """
+    Audit log where every record holds the SHA-256 digest of the record before it, so a record changed or removed breaks the chain.
+    Records are appended to a queue and written by a thread of its own, in batches followed by a single flush (and fsync),
+    so appending a record never waits for the disk.
+    """
+
+    def __init__(self, path, batch=AUDIT_BATCH, interval=AUDIT_INTERVAL, sync=True):
+        """
+        :param path: the file of the log, which is truncated
+        :param batch: records written together, at most
+        :param interval: seconds the writer waits for more records before writing a batch
+        :param sync: whether every batch is fsynced, besides flushed
+        """
+        self.path = path
+        self.batch = batch
+        self.interval = interval
+        self.sync = sync
+        self.records = queue.Queue()                # Records still to be written (time, type, text), None to stop the writer
+        self.seq = 1                                # Sequence number of the next record written
+        self.last = None                            # Last record written, to be hashed into the next one
+        self.file = open(path, "w", encoding="utf-8")
+        self.closed = False
+
+        self.writer = threading.Thread(target=self.write_records, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def append(self, kind, text):
+        """
+        Queues a record. It may be called from any thread.
+        :param kind: the type of the message the record is about, NO_TYPE if none
+        :param text: the text of the record
+        """
+        self.records.put((time.time(), kind, text))
+
+    def write_records(self):
+        """
+        Writes the queued records, chaining each one to the record before it, until the log is closed.
+        """
+        while True:
+            records = [self.records.get()]
+            if self.records.qsize() < self.batch:
+                # Records that arrive meanwhile go in the same batch
+                time.sleep(self.interval)
+            try:
+                while len(records) < self.batch:
+                    records.append(self.records.get_nowait())
+            except queue.Empty:
+                pass
+
+            lines = []
+            stop = False
+            for record in records:
+                if record is None:
+                    stop = True
+                    continue
+                timestamp, kind, text = record
+                line = format_record(self.seq, timestamp, GENESIS if self.last is None else chain_hash(self.last), kind, text)
+                lines.append(line + "\n")
+                self.last = line
+                self.seq += 1
+
+            if len(lines) > 0:
+                self.file.write("".join(lines))
+                self.file.flush()
+                if self.sync:
+                    os.fsync(self.file.fileno())
+            for _ in records:
+                self.records.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """
+        Waits until every record queued so far is written.
+        """
+        self.records.join()
+
+    def close(self):
+        """
+        Writes the records still queued, and closes the log.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.records.put(None)
+        self.writer.join()
+        self.file.close()
+
+
+def type_code(kind):
+    """
+    :return: the code of a record type in the index, which records of other types may share
+    """
+    if isinstance(kind, str):
+        kind = kind.encode('utf-8')
+    return zlib.crc32(kind)
+
+
+class AuditReader:
+    """
+    Reads an audit log through a memory map, so only the records asked for are brought into memory.
+    A sidecar index holds the offset and the type of every record, in the order of their sequence numbers. It is kept next
+    to the log and extended with the records written since it was last updated, so a record is found without reading those before it.
+    The positions of the records of each type are gathered from the index the first time a type is asked for, so the records
+    of a type are then found without going through those of the others.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the file of the log. Only its complete records are read, while it may still be written.
+        """
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.first_seq = 1                          # Sequence number of the first record
+        self.count = 0                              # Records in the index
+
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.log = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b""
+        self.end = self.log.rfind(b"\n") + 1       # The last record may still be partly written
+        self.index = b""
+        self.types = None                           # Positions in the index of the records of each type code {code: array of positions}
+        self.update_index()
+
+    def line(self, offset):
+        """
+        :return: the record starting at the offset, as bytes, without its line break
+        """
+        return self.log[offset:self.log.find(b"\n", offset, self.end)]
+
+    def entry(self, position):
+        """
+        :return: the offset and the type code of the record at the position of the index
+        """
+        return INDEX_ENTRY.unpack_from(self.index, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+
+    def update_index(self):
+        """
+        Indexes the records written since the index was last updated, or all of them if the index does not belong to the log.
+        """
+        descriptor = os.open(self.index_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(descriptor, "r+b") as index:
+            # Several clients may read the same log at once
+            fcntl.flock(index, fcntl.LOCK_EX)
+            first_seq, count, indexed = self.read_header(index)
+
+            entries = []
+            offset, last = indexed, None
+            while offset < self.end:
+                line = self.line(offset)
+                fields = line.split(SEPARATOR.encode(), 4)
+                if first_seq is None:
+                    first_seq = int(fields[0])
+                entries.append(INDEX_ENTRY.pack(offset, type_code(fields[3] if len(fields) > 3 else NO_TYPE)))
+                last = line
+                offset += len(line) + 1
+
+            if len(entries) > 0:
+                # The entries are written before the header that counts them
+                index.seek(INDEX_HEADER.size + count * INDEX_ENTRY.size)
+                index.write(b"".join(entries))
+                index.truncate()
+                count += len(entries)
+                index.seek(0)
+                index.write(INDEX_HEADER.pack(INDEX_MAGIC, first_seq, count, self.end, zlib.crc32(last)))
+                index.flush()
+
+            self.first_seq = first_seq or 1
+            self.count = count
+            self.index = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ) if count > 0 else b""
+            self.types = None
+
+    def index_types(self):
+        """
+        Gathers the positions of the records of each type, from the entries of the index.
+        """
+        types = collections.defaultdict(lambda: array("Q"))
+        entries = memoryview(self.index)[INDEX_HEADER.size:INDEX_HEADER.size + self.count * INDEX_ENTRY.size]
+        for position, (offset, code) in enumerate(INDEX_ENTRY.iter_unpack(entries)):
+            types[code].append(position)
+        entries.release()
+        self.types = dict(types)
+
+    def read_header(self, index):
+        """
+        :return: the seq of the first record, the records indexed and the bytes of the log they take, all of them None or 0
+        if the index is empty or belongs to a log written again from the start
+        """
+        header = index.read(INDEX_HEADER.size)
+        if len(header) < INDEX_HEADER.size:
+            return None, 0, 0
+        magic, first_seq, count, indexed, check = INDEX_HEADER.unpack(header)
+        if magic != INDEX_MAGIC or count == 0 or indexed > self.end:
+            return None, 0, 0
+
+        # The last record indexed must still be where it was
+        index.seek(INDEX_HEADER.size + (count - 1) * INDEX_ENTRY.size)
+        entry = index.read(INDEX_ENTRY.size)
+        if len(entry) < INDEX_ENTRY.size or zlib.crc32(self.line(INDEX_ENTRY.unpack(entry)[0])) != check:
+            return None, 0, 0
+        return first_seq, count, indexed
+
+    def query(self, first=None, last=None, kind=None, text=None):
+        """
+        Finds the records asked for, through the index.
+        :param first: the sequence number of the first record, from the first one by default
+        :param last: the sequence number of the last record, up to the last one by default
+        :param kind: the type of the records, any by default
+        :param text: text the records hold, any by default
+        :return: a generator of the records, without their line break
+        """
+        start = 0 if first is None else max(0, first - self.first_seq)
+        stop = self.count if last is None else min(self.count, last - self.first_seq + 1)
+        if kind is None:
+            positions = range(start, stop)
+        else:
+            # Only the records of the type asked for, and those sharing its code, are read
+            if self.types is None:
+                self.index_types()
+            positions = self.types.get(type_code(kind), array("Q"))
+            positions = positions[bisect.bisect_left(positions, start):bisect.bisect_left(positions, stop)]
+
+        for position in positions:
+            offset = self.entry(position)[0]
+            line = self.line(offset).decode('utf-8')
+            # Records of other types may share the code of the type asked for
+            if kind is not None and parse_record(line)[3] != kind:
+                continue
+            if text is not None and text not in line:
+                continue
+            yield line
+
+    def verify_chain(self):
+        """
+        Checks that every record holds the digest of the record before it, reading the log once and keeping a single record at a time.
+        :return: the sequence number of the first record whose hash does not match, None if the chain is intact
+        """
+        previous = None
+        offset = 0
+        while offset < self.end:
+            line = self.line(offset)
+            fields = line.split(SEPARATOR.encode(), 4)
+            expected = GENESIS if previous is None else hashlib.sha256(previous).hexdigest()
+            if len(fields) < 5 or fields[2].decode('utf-8', 'replace') != expected:
+                return int(fields[0]) if fields[0].isdigit() else self.first_seq
+            previous = line
+            offset += len(line) + 1
+        return None
+
+    def close(self):
+        if isinstance(self.index, mmap.mmap):
+            self.index.close()
+        if isinstance(self.log, mmap.mmap):
+            self.log.close()
+        self.file.close()
+
+
+def show_log(path="security.log", first=None, last=None, kind=None, text=None, verify=True):
+    """
+    Prints the records of an audit log asked for, and whether its hash chain is intact.
+    """
+    if not os.path.exists(path):
+        print(f"There is no audit log at {path}")
+        return
+    reader = AuditReader(path)
+    try:
+        shown = 0
+        for line in reader.query(first, last, kind, text):
+            print(line)
+            shown += 1
+        print(f"{shown} of {reader.count} records")
+        if verify:
+            broken = reader.verify_chain()
+            if broken is None:
+                print("The hash chain of the audit log is intact")
+            else:
+                print(f"The hash chain of the audit log is broken at record {broken}!")
+    finally:
+        reader.close()
+
+
+@click.command()
+@click.argument('path', default='security.log')
+@click.option('--first', '-f', type=int, default=None, help='Sequence number of the first record shown')
+@click.option('--last', '-l', type=int, default=None, help='Sequence number of the last record shown')
+@click.option('--type', '-t', 'kind', default=None, help='Type of the records shown (the command of their message)')
+@click.option('--text', default=None, help='Text the records shown hold, such as "Table 2:"')
+@click.option('--verify/--no-verify', default=True, help='Whether the hash chain of the whole log is checked')
+def main(path, first, last, kind, text, verify):
+    show_log(path, first, last, kind, text, verify)
+
+
+if __name__ == "__main__":
+    main()
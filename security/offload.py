@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+CRYPTO_WORKERS = os.cpu_count() or 1                # Workers of a CryptoPool, by default
+CRYPTO_BATCH = 32                                   # Jobs sent to a worker together, at most
+
+
+def run_jobs(jobs):
+    """
+    Runs a batch of jobs in a worker of the pool.
+    :param jobs: list of (function, args) tuples
+    :return: a list with (True, result) or (False, exception) for each job, in order
+    """
+    results = []
+    for function, args in jobs:
+        try:
+            results.append((True, function(*args)))
+        except Exception as error:
+            results.append((False, error))
+    return results
+
+
+class CryptoPool:
+    """
+    Runs signature verifications and signings away from the threads that handle the messages, in a pool of worker processes
+    (or threads), and hands back a Future for each of them.
+    Jobs are queued and sent to the workers in batches: while every worker is busy the jobs that arrive wait for a slot,
+    and go together in the next batch, so the cost of reaching a worker process is paid once per batch.
+    The results of the jobs submitted with the same key, such as the connection a message came from, are delivered in the
+    order they were submitted.
+    """
+
+    def __init__(self, workers=CRYPTO_WORKERS, batch=CRYPTO_BATCH, processes=True):
+        """
+        :param workers: the number of worker processes, or threads
+        :param batch: jobs sent to a worker together, at most
+        :param processes: whether the workers are processes, forked from this one, or threads
+        """
+        self.workers = workers
+        self.batch = batch
+        self.jobs = queue.Queue()                   # Jobs still to be sent to the workers (function, args, future), None to stop
+        self.slots = threading.Semaphore(2 * workers)   # Batches sent to the workers and not yet done, at most
+        self.tails = {}                             # Future of the last job submitted with each key {key: future}
+        self.lock = threading.Lock()
+        self.batches = 0                            # Batches sent to the workers, and jobs completed, so far
+        self.completed = 0
+
+        if processes:
+            # The jobs run functions of the modules already loaded here, with the keys already held, so the workers are forked
+            self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+        else:
+            self.executor = ThreadPoolExecutor(workers)
+        # Every worker is started now, before the threads of the process hold a lock the workers would inherit
+        self.executor.submit(run_jobs, []).result()
+
+        self.feeder = threading.Thread(target=self.feed, daemon=True)
+        self.feeder.start()
+
+    def submit(self, function, *args, key=None):
+        """
+        Queues a job. It may be called from any thread.
+        :param function: a function the workers can run: defined at the top level of a module, taking and returning picklable values
+        :param key: the key whose jobs are delivered in order, None if the job does not have to wait for any other
+        :return: a Future with the result of function(*args)
+        """
+        future = Future()
+        self.jobs.put((function, args, future))
+        if key is None:
+            return future
+        return self.in_order(key, future)
+
+    def in_order(self, key, future):
+        """
+        :return: a Future done with the result of future, but only after the Futures of the jobs submitted before with the same key
+        """
+        delivered = Future()
+        with self.lock:
+            previous = self.tails.get(key)
+            self.tails[key] = delivered
+
+        def deliver(done):
+            if done.exception() is not None:
+                delivered.set_exception(done.exception())
+            else:
+                delivered.set_result(done.result())
+            with self.lock:
+                if self.tails.get(key) is delivered:
+                    del self.tails[key]
+
+        if previous is None:
+            future.add_done_callback(deliver)
+        else:
+            previous.add_done_callback(lambda _: future.add_done_callback(deliver))
+        return delivered
+
+    def feed(self):
+        """
+        Sends the queued jobs to the workers, in batches, until the pool is closed.
+        """
+        stop = False
+        while not stop:
+            job = self.jobs.get()
+            if job is None:
+                return
+            # Wait for a worker: the jobs that arrive meanwhile go in the same batch
+            self.slots.acquire()
+            jobs = [job]
+            try:
+                while len(jobs) < self.batch:
+                    job = self.jobs.get_nowait()
+                    if job is None:
+                        stop = True
+                        break
+                    jobs.append(job)
+            except queue.Empty:
+                pass
+
+            self.batches += 1
+            try:
+                batch = self.executor.submit(run_jobs, [(function, args) for function, args, future in jobs])
+            except RuntimeError as error:
+                # The executor was shut down
+                self.complete(jobs, error=error)
+                continue
+            batch.add_done_callback(lambda done, jobs=jobs: self.complete(jobs, done))
+
+    def complete(self, jobs, batch=None, error=None):
+        """
+        Hands the results of a batch to the Futures of its jobs.
+        """
+        self.slots.release()
+        if batch is not None and batch.exception() is not None:
+            # A worker died, the whole batch is lost
+            error = batch.exception()
+        results = [(False, error)] * len(jobs) if error is not None else batch.result()
+        self.completed += len(jobs)
+        for (function, args, future), (ok, result) in zip(jobs, results):
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def close(self):
+        """
+        Runs the jobs still queued, and stops the workers.
+        """
+        self.jobs.put(None)
+        self.feeder.join()
+        self.executor.shutdown(wait=True)
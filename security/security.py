@@ -1,22 +1,127 @@
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, ed25519, x25519
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import serialization
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
+import hmac
+import hashlib
 import secrets
 import base64
 
-def gen_assymetric_key():
-    """ Generate a pair of assymetric key (private and public), using RSA algorithm.
+PUBLIC_KEYS_CACHE_SIZE = 256                        # Loaded public keys kept by load_public_key
+DECK_CHUNK = 4096                                   # Cards encrypted or decrypted together by encrypt_deck and decrypt_deck
+CBC_CIPHER = "cbc"                                  # Layered deck encryptions: a fresh IV and AES-CBC per layer, growing 16 bytes each
+BLOCK_CIPHER = "block"                              # or a single AES block per layer, so every card stays 16 bytes long
+DECK_CIPHERS = (CBC_CIPHER, BLOCK_CIPHER)
+DECRYPT_WORKERS = os.cpu_count() or 1               # Threads decrypt_layers shares the chunks of the decks among
+VERIFICATIONS_CACHE_SIZE = 4096                     # Results of the signatures already verified, kept by verify_signature
+BATCH_ROOTS_CACHE_SIZE = 256                        # Merkle roots of batch signatures already verified, kept by verify_batch_root
+MERKLE_ROOT = b"bingo merkle root "                 # Prefix of the Merkle roots signed by sign_batch, so a root is never taken for a message
+SESSION_INFO = b"bingo session key"                 # Context of the HKDF deriving the session keys, followed by both X25519 public keys
+
+class SignatureSuite(ABC):
+    """ Signature algorithm used by a User to sign its messages, announced along with its public key at registration. """
+    NAME = None
+    PRIVATE_KEY = None                              # Type of the private and public keys of the suite
+    PUBLIC_KEY = None
+
+    @abstractmethod
+    def generate_private_key(self):
+        pass
+
+    @abstractmethod
+    def sign(self, data, private_key):
+        pass
+
+    @abstractmethod
+    def verify(self, data, signature, public_key):
+        pass
+
+
+class RSA_PSS(SignatureSuite):
+    """ RSA-2048 keys, signing the SHA-256 digest of the message with PSS padding. """
+    NAME = "rsa-pss"
+    PRIVATE_KEY = rsa.RSAPrivateKey
+    PUBLIC_KEY = rsa.RSAPublicKey
+    PADDING = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+    def generate_private_key(self):
+        return rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=2048,
+        )
+
+    def sign(self, data, private_key):
+        digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
+        digest.update(data)
+        return private_key.sign(digest.finalize(), self.PADDING, hashes.SHA256())
+
+    def verify(self, data, signature, public_key):
+        digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
+        digest.update(data)
+        public_key.verify(signature, digest.finalize(), self.PADDING, hashes.SHA256())
+
+
+class Ed25519(SignatureSuite):
+    """ Ed25519 keys, much faster to generate, sign and verify with than RSA, and with 64 bytes signatures. """
+    NAME = "ed25519"
+    PRIVATE_KEY = ed25519.Ed25519PrivateKey
+    PUBLIC_KEY = ed25519.Ed25519PublicKey
+
+    def generate_private_key(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, data, private_key):
+        # Ed25519 hashes the message itself
+        return private_key.sign(data)
+
+    def verify(self, data, signature, public_key):
+        public_key.verify(signature, data)
+
+
+SUITES = {suite.NAME: suite() for suite in (RSA_PSS, Ed25519)}
+DEFAULT_SUITE = RSA_PSS.NAME
+
+
+def get_suite(name=None):
+    """ Get a signature suite by its identifier.
+
+    :param name: the identifier of the suite, None for the default one (RSA-PSS)
+
+    :return: the signature suite, or None if it is unknown"""
+
+    return SUITES.get(name if name is not None else DEFAULT_SUITE)
+
+
+def suite_of(key):
+    """ Get the signature suite of a key.
+
+    :param key: a private or public key object
+
+    :return: the signature suite, or None if the key does not belong to any"""
+
+    for suite in SUITES.values():
+        if isinstance(key, (suite.PRIVATE_KEY, suite.PUBLIC_KEY)):
+            return suite
+    return None
+
+
+def gen_assymetric_key(suite=None):
+    """ Generate a pair of assymetric key (private and public), using the algorithm of a signature suite.
+
+    :param suite: the identifier of the signature suite, None for the default one (RSA-PSS)
 
     :return: a tuple of private and public key"""
 
-    private_key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-    )
+    private_key = get_suite(suite).generate_private_key()
     public_key = private_key.public_key()
 
     public_key = public_key.public_bytes(
@@ -27,64 +132,289 @@ def gen_assymetric_key():
     return private_key, public_key
 
 
+def canonical_bytes(message):
+    """ Representation of a message its signature is computed over: the bytes a Message of the protocol keeps, serialized
+    once or as it was received, or the repr of any other value. """
+    canonical = getattr(message, "canonical", None)
+    return canonical() if canonical is not None else message.__repr__().encode('utf-8')
+
+
 def sign_message(message, private_key):
-    """ Sign a message using the private key.
+    """ Sign a message using the private key, with the signature suite the key belongs to.
     
     :param message: the message to sign
     :param private_key: the private key to use
     
     :return: the signature of the message"""
 
-    message = message.__repr__().encode('utf-8')
-
-    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
-    digest.update(message)
-    msg_digest = digest.finalize()
-
-    signature = private_key.sign(
-        msg_digest,
-        padding.PSS(
-            mgf=padding.MGF1(hashes.SHA256()),
-            salt_length=padding.PSS.MAX_LENGTH
-        ),
-        hashes.SHA256()
-    )
+    message = canonical_bytes(message)
+    signature = suite_of(private_key).sign(message, private_key)
 
     return signature.hex()
 
 
+@lru_cache(maxsize=PUBLIC_KEYS_CACHE_SIZE)
+def load_public_key(public_key):
+    """ Load a public key from its PEM representation.
+    Every message of a game is verified against the same handful of keys, so the loaded keys are kept in a bounded LRU cache.
+
+    :param public_key: the PEM encoded public key
+
+    :return: the public key object"""
+
+    return serialization.load_pem_public_key(public_key.encode('utf-8'), backend=default_backend())
+
+
+def public_key_suite(public_key):
+    """ Get the signature suite of a public key.
+
+    :param public_key: the PEM encoded public key
+
+    :return: the identifier of the signature suite, or None if the key is not valid or belongs to no suite"""
+
+    try:
+        suite = suite_of(load_public_key(public_key))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return suite.NAME if suite is not None else None
+
+
+def register_public_keys(*public_keys):
+    """ Load public keys as soon as they are received, so the first messages signed with them are verified as fast as the rest.
+
+    :param public_keys: the PEM encoded public keys"""
+
+    for public_key in public_keys:
+        try:
+            load_public_key(public_key)
+        except (ValueError, TypeError, AttributeError):
+            # Not a valid key, the messages signed with it will not be verified either
+            pass
+
+
+@lru_cache(maxsize=PUBLIC_KEYS_CACHE_SIZE)
+def public_key_fingerprint(public_key):
+    """ SHA-256 digest of the PEM representation of a public key, standing for the key in the cache of verify_signature. """
+    return hashlib.sha256(public_key.encode('utf-8')).digest()
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class VerificationCache:
+    """ Bounded LRU cache of the results of verify_signature, keyed on the fingerprint of the public key, the SHA-256 digest
+    of the representation of the message and the signature.
+    The same signed message is often verified again: forwarded by the Playing Area, relayed to every Player, or checked by
+    several Users that share a process. A hit costs a digest of the message instead of a public key operation. """
+
+    def __init__(self, maxsize=VERIFICATIONS_CACHE_SIZE):
+        """
+        :param maxsize: results kept, at most, 0 to keep none
+        """
+        self.maxsize = maxsize
+        self.results = OrderedDict()                # {(fingerprint, digest, signature): valid}, the least recently used first
+        self.lock = threading.Lock()                # Tables of the Playing Area verify their messages in threads of their own
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ :return: the result kept for the key, None if there is none """
+        with self.lock:
+            valid = self.results.get(key)
+            if valid is None:
+                self.misses += 1
+                return None
+            self.results.move_to_end(key)
+            self.hits += 1
+            return valid
+
+    def put(self, key, valid):
+        with self.lock:
+            if self.maxsize <= 0:
+                return
+            self.results[key] = valid
+            self.results.move_to_end(key)
+            while len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+
+    def cache_info(self):
+        """ :return: the hits, misses, maximum and current size of the cache, as the cache_info of an lru_cache """
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self.results))
+
+    def cache_clear(self):
+        with self.lock:
+            self.results.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+VERIFICATIONS = VerificationCache()
+
+
+def merkle_leaf(message):
+    """ Leaf of a Merkle tree of sign_batch: the hash of the SHA-256 digest of the message, apart from the inner nodes. """
+    digest = hashlib.sha256(canonical_bytes(message)).digest()
+    return hashlib.sha256(b"\x00" + digest).digest()
+
+
+def merkle_node(left, right):
+    """ Inner node of a Merkle tree of sign_batch, over its two children. """
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def sign_batch(messages, private_key):
+    """ Sign several messages with a single signature: the Merkle root of the digests of the messages is signed once, and
+    the signature of each message carries the path from its digest to the root.
+
+    :param messages: the messages to sign
+    :param private_key: the private key to use
+
+    :return: the batch signature of each message, in order: {"root": the signature of the root, in hex, "path": the sibling
+    of the node of the message at each level of the tree, in hex, after the side it takes ("L" or "R")}"""
+
+    if len(messages) == 0:
+        return []
+
+    level = [merkle_leaf(message) for message in messages]
+    positions = list(range(len(messages)))          # Position of the node of each message in the level
+    paths = [[] for _ in messages]
+    while len(level) > 1:
+        for message, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                paths[message].append(("L" if sibling < position else "R") + level[sibling].hex())
+        # The last node of a level with an odd number of them goes up as it is
+        level = [merkle_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+        positions = [position // 2 for position in positions]
+
+    signature = suite_of(private_key).sign(MERKLE_ROOT + level[0], private_key).hex()
+    return [{"root": signature, "path": path} for path in paths]
+
+
+def batch_root(message, path):
+    """ Merkle root a message leads to, following the path of its batch signature. """
+    node = merkle_leaf(message)
+    for sibling in path:
+        side, sibling = sibling[0], bytes.fromhex(sibling[1:])
+        node = merkle_node(sibling, node) if side == "L" else merkle_node(node, sibling)
+    return node
+
+
+@lru_cache(maxsize=BATCH_ROOTS_CACHE_SIZE)
+def verify_batch_root(root, signature, public_key):
+    """ Verify the signature of the Merkle root of a batch.
+    Every message of a batch leads to the same root, so the root is verified once and the result kept in a bounded LRU cache.
+
+    :param root: the Merkle root
+    :param signature: the signature of the root, in hex
+    :param public_key: the PEM encoded public key to use
+
+    :return: True if the signature is valid, False otherwise"""
+
+    try:
+        signature = bytes.fromhex(signature)
+        public_key = load_public_key(public_key)
+        suite_of(public_key).verify(MERKLE_ROOT + root, signature, public_key)
+        return True
+    except Exception:
+        return False
+
+
 def verify_signature(message, signature, public_key):
     """ Verify the signature of a message using the public key.
+    The results are kept in VERIFICATIONS, so a signed message verified again costs a digest instead of a public key operation.
     
     :param message: the message
-    :param signature: the signature of the message
-    :param public_key: the public key to use
+    :param signature: the signature of the message, or its batch signature, made by sign_batch
+    :param public_key: the public key to use, of any signature suite
     
     :return: True if the signature is valid, False otherwise"""
 
-    signature = bytes.fromhex(signature)
-    message = message.__repr__().encode('utf-8')
-    public_key = serialization.load_pem_public_key(public_key.encode('utf-8'), backend=default_backend())
+    try:
+        if isinstance(signature, dict):
+            # One signature for a whole batch of messages, checked against the root the message leads to
+            return verify_batch_root(batch_root(message, signature["path"]), signature["root"], public_key)
 
-    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
-    digest.update(message)
-    msg_digest = digest.finalize()
+        message = canonical_bytes(message)
+        key = (public_key_fingerprint(public_key), hashlib.sha256(message).digest(), signature)
+        valid = VERIFICATIONS.get(key)
+        if valid is None:
+            valid = verify_data(message, signature, public_key)
+            VERIFICATIONS.put(key, valid)
+        return valid
+    except Exception:
+        return False
+
+
+def verify_data(data, signature, public_key):
+    """ Verify a signature over the representation of a message, with no cache.
+
+    :return: True if the signature is valid, False otherwise"""
 
     try:
-        public_key.verify(
-            signature,
-            msg_digest,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        signature = bytes.fromhex(signature)
+        public_key = load_public_key(public_key)
+        suite_of(public_key).verify(data, signature, public_key)
         return True
     except Exception:
         return False
 
 
+class Session:
+    """ Symmetric key agreed by a client and the Playing Area at registration, authenticating the messages of their connection with HMAC-SHA256. """
+
+    def __init__(self, key):
+        self.key = key
+
+    def mac(self, data):
+        """ HMAC of a message.
+
+        :param data: the bytes of the representation of the message, the same a signature is computed over
+
+        :return: the HMAC, in hex"""
+
+        return hmac.new(self.key, data, hashlib.sha256).hexdigest()
+
+    def verify(self, message, mac):
+        """ Verify the HMAC of a message.
+
+        :param message: the message
+        :param mac: the HMAC of the message, in hex
+
+        :return: True if the HMAC is valid, False otherwise"""
+
+        return hmac.compare_digest(self.mac(canonical_bytes(message)), str(mac))
+
+
+def gen_session_key():
+    """ Generate an ephemeral X25519 key pair, whose public key is sent in a signed registration message to agree on a session key.
+
+    :return: a tuple of private key and public key, in hex"""
+
+    private_key = x25519.X25519PrivateKey.generate()
+    public_key = private_key.public_key().public_bytes(encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+    return private_key, public_key.hex()
+
+
+def agree_session(private_key, peer_public_key):
+    """ Derive the session key shared with a peer, from an X25519 exchange followed by HKDF-SHA256 over both public keys.
+
+    :param private_key: the ephemeral private key generated by gen_session_key
+    :param peer_public_key: the ephemeral public key of the peer, in hex
+
+    :return: the Session"""
+
+    peer_public_key = bytes.fromhex(peer_public_key)
+    shared_key = private_key.exchange(x25519.X25519PublicKey.from_public_bytes(peer_public_key))
+    public_key = private_key.public_key().public_bytes(encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+
+    # Both sides put the public keys in the same order, whichever of them is their own
+    info = SESSION_INFO + b"".join(sorted((public_key, peer_public_key)))
+    key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(shared_key)
+    return Session(key)
+
+
 def gen_symmetric_key():
     """ Generate a symmetric key, using AES algorithm.
 
@@ -145,6 +475,200 @@ def decrypt_number(encrypted_number, key, flag=0):
     return pt
 
 
+def same_size_cards(deck, minimum):
+    """ Size of the cards of a deck, if all of them are byte strings of the same size, a multiple of the AES block size no smaller than minimum; None otherwise. """
+    if len(deck) == 0 or not isinstance(deck[0], bytes):
+        return None
+    size = len(deck[0])
+    if size < minimum or size % 16 != 0:
+        return None
+    for card in deck:
+        if not isinstance(card, bytes) or len(card) != size:
+            return None
+    return size
+
+
+def encrypt_deck(deck, key, cipher=CBC_CIPHER):
+    """
+    Encrypt every number of a deck using the symetric key, as encrypt_number does with each of them.
+    The numbers are encrypted a chunk at a time, with a single AES cipher for the whole deck and the IVs drawn at once: every CBC
+    step is applied to the same block of all the numbers of the chunk in one call.
+    
+    :param deck: the list of numbers, or of encrypted numbers of the same size, to encrypt
+    :param key: the symetric key to use
+    :param cipher: the layered encryption of the deck, one of DECK_CIPHERS
+    
+    :return: the list of encrypted numbers, in the same order
+    """
+
+    if cipher == BLOCK_CIPHER:
+        return encrypt_block_deck(deck, key)
+
+    deck = [number if isinstance(number, bytes) else number.to_bytes(64, byteorder='big') for number in deck]
+    size = same_size_cards(deck, 16)
+    if size is None:
+        return [encrypt_number(number, key) for number in deck]
+
+    encryptor = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend()).encryptor()
+    entry = size + 16
+    encrypted_deck = []
+    for start in range(0, len(deck), DECK_CHUNK):
+        chunk = deck[start:start + DECK_CHUNK]
+        count = len(chunk)
+        plaintext = b"".join(chunk)
+        buffer = bytearray(count * entry)
+
+        # The IV goes in front of each encrypted number, and is the "previous block" of its first block
+        previous = os.urandom(16 * count)
+        for byte in range(16):
+            buffer[byte::entry] = previous[byte::16]
+
+        column = bytearray(16 * count)
+        for offset in range(0, size, 16):
+            # Same block of every number, one after the other
+            for byte in range(16):
+                column[byte::16] = plaintext[offset + byte::size]
+            mixed = int.from_bytes(column, 'big') ^ int.from_bytes(previous, 'big')
+            previous = encryptor.update(mixed.to_bytes(16 * count, 'big'))
+            for byte in range(16):
+                buffer[16 + offset + byte::entry] = previous[byte::16]
+
+        encrypted_deck.extend(bytes(buffer[i:i + entry]) for i in range(0, len(buffer), entry))
+    return encrypted_deck
+
+
+def decrypt_deck(deck, key, flag=0, cipher=CBC_CIPHER):
+    """
+    Decrypt every number of a deck using the symetric key, as decrypt_number does with each of them.
+    Every block of a chunk of the deck is decrypted in a single AES call, and then XORed with the block before it.
+    
+    :param deck: the list of encrypted numbers
+    :param key: the symetric key to use
+    :param flag: if 1, return the decrypted numbers as integers, else return the decrypted numbers as bytes
+    :param cipher: the layered encryption of the deck, one of DECK_CIPHERS
+    
+    :return: the list of decrypted numbers, in the same order
+    """
+
+    if cipher == BLOCK_CIPHER:
+        return decrypt_block_deck(deck, key, flag)
+
+    size = same_size_cards(deck, 32)
+    if size is None:
+        return [decrypt_number(number, key, flag) for number in deck]
+
+    decryptor = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend()).decryptor()
+    decrypted_deck = []
+    for start in range(0, len(deck), DECK_CHUNK):
+        ciphertext = b"".join(deck[start:start + DECK_CHUNK])
+        decrypted = decryptor.update(ciphertext)
+
+        # CBC: each plaintext block is its decrypted block XORed with the ciphertext block before it (the IV, for the first one)
+        plaintext = int.from_bytes(decrypted[16:], 'big') ^ int.from_bytes(ciphertext[:-16], 'big')
+        plaintext = plaintext.to_bytes(len(ciphertext) - 16, 'big')
+
+        # Each number starts where its IV was, and the blocks that follow its last block belong to nobody
+        numbers = [plaintext[i:i + size - 16] for i in range(0, len(plaintext), size)]
+        if flag:
+            numbers = [int.from_bytes(number, byteorder='big') for number in numbers]
+        decrypted_deck.extend(numbers)
+    return decrypted_deck
+
+
+def encrypt_block_deck(deck, key):
+    """
+    Encrypt every number of a deck as a single AES block, so a deck encrypted by any number of Users keeps cards of 16 bytes.
+    A number takes the first 8 bytes of its block and 8 random bytes the rest, so equal numbers do not give equal blocks; the
+    encrypted numbers of the layers that follow are encrypted as they are, with AES being a permutation of the blocks.
+    
+    :param deck: the list of numbers, or of 16 bytes blocks, to encrypt (or both)
+    :param key: the symetric key to use
+    
+    :return: the list of encrypted numbers, in the same order
+    :raises ValueError: if a card is neither a number nor a 16 bytes block
+    """
+
+    if len(deck) == 0:
+        return []
+    # Each card is taken by its own type: a Player that cheated may have mixed numbers in with the encrypted ones, which
+    # is caught when the deck is verified, and must not stop the honest Players that come after it
+    salt = os.urandom(8 * len(deck))
+    deck = [number if isinstance(number, bytes) else number.to_bytes(8, byteorder='big') + salt[8 * i:8 * i + 8] for i, number in enumerate(deck)]
+    if same_size_cards(deck, 16) != 16:
+        raise ValueError("The cards of the deck are not AES blocks")
+
+    encrypted = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend()).encryptor().update(b"".join(deck))
+    return [encrypted[i:i + 16] for i in range(0, len(encrypted), 16)]
+
+
+def decrypt_block_deck(deck, key, flag=0):
+    """
+    Decrypt every number of a deck encrypted by encrypt_block_deck.
+    
+    :param deck: the list of encrypted numbers
+    :param key: the symetric key to use
+    :param flag: if 1, return the decrypted numbers as integers, else return the decrypted blocks as bytes
+    
+    :return: the list of decrypted numbers, in the same order
+    """
+
+    if len(deck) == 0:
+        return []
+    if same_size_cards(deck, 16) != 16:
+        raise ValueError("The cards of the deck are not AES blocks")
+
+    decrypted = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend()).decryptor().update(b"".join(deck))
+    if flag:
+        return [int.from_bytes(decrypted[i:i + 8], byteorder='big') for i in range(0, len(decrypted), 16)]
+    return [decrypted[i:i + 16] for i in range(0, len(decrypted), 16)]
+
+
+def decrypt_layers(layers, cipher=CBC_CIPHER, workers=None):
+    """
+    Decrypt the decks encrypted by each User of a game, every one with its own key, on a pool of threads.
+    The layers do not depend on each other, and the decks are split in chunks of DECK_CHUNK numbers: AES releases the GIL while
+    decrypting, so the chunks of every layer are decrypted in parallel.
+    
+    :param layers: list of (deck, key, flag) tuples, as taken by decrypt_deck
+    :param cipher: the layered encryption of the decks, one of DECK_CIPHERS
+    :param workers: the number of threads, DECRYPT_WORKERS by default
+    
+    :return: the list of decrypted decks, in the order of layers
+    """
+
+    workers = workers or DECRYPT_WORKERS
+    if workers == 1:
+        return [decrypt_deck(deck, key, flag, cipher) for deck, key, flag in layers]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunks = [[pool.submit(decrypt_deck, deck[start:start + DECK_CHUNK], key, flag, cipher) for start in range(0, max(len(deck), 1), DECK_CHUNK)]
+                  for deck, key, flag in layers]
+
+        decrypted_decks = []
+        for layer in chunks:
+            decrypted_deck = []
+            for chunk in layer:
+                decrypted_deck.extend(chunk.result())
+            decrypted_decks.append(decrypted_deck)
+        return decrypted_decks
+
+
+def deck_digest(deck):
+    """
+    SHA-256 digest of the numbers of a deck, whatever their order, to compare decks without sending them.
+    
+    :param deck: the list of numbers, or of encrypted numbers
+    
+    :return: the hex digest
+    """
+
+    numbers = sorted(number if isinstance(number, bytes) else number.to_bytes(8, byteorder='big') for number in deck)
+    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
+    # Every number goes with its length, so different decks never hash the same bytes
+    digest.update(b"".join(len(number).to_bytes(4, byteorder='big') + number for number in numbers))
+    return digest.finalize().hex()
+
+
 def main():
     pass
 
@@ -1,4 +1,11 @@
-from security import gen_assymetric_key, sign_message, verify_signature, gen_symmetric_key, encrypt_number, decrypt_number
+from security import gen_assymetric_key, sign_message, verify_signature, gen_symmetric_key, encrypt_number, decrypt_number, load_public_key, register_public_keys, public_key_suite, SUITES, SignatureSuite, encrypt_deck, decrypt_deck, decrypt_layers, gen_session_key, agree_session, sign_batch, verify_batch_root, VerificationCache, VERIFICATIONS
+from offload import CryptoPool
+from audit import AuditLog, AuditReader, GENESIS, chain_hash, format_record, parse_record
+import os
+import tempfile
+import time
+import threading
+from vsc_security import Token, SoftwareToken, CertificateCache, use_token, get_cert_data, sign_message as card_sign_message, validate_signature, get_name_and_number
 import click
 
 def test_sign_message():
@@ -46,13 +53,357 @@ def test_encrypt_number():
     assert number == decrypt_once
 
 
+def test_encrypt_deck():
+    sym_key1 = gen_symmetric_key()
+    sym_key2 = gen_symmetric_key()
+    deck = [42, 7, 0, 59, 13]
+
+    # Both layers of the deck decrypt with decrypt_number
+    encrypted_once = encrypt_deck(deck, sym_key1)
+    encrypted_twice = encrypt_deck(encrypted_once, sym_key2)
+    assert [decrypt_number(number, sym_key2) for number in encrypted_twice] == encrypted_once
+    assert [decrypt_number(number, sym_key1, 1) for number in encrypted_once] == deck
+
+    # And the numbers encrypted with encrypt_number decrypt with decrypt_deck
+    encrypted_twice = [encrypt_number(encrypt_number(number, sym_key1), sym_key2) for number in deck]
+    assert decrypt_deck(decrypt_deck(encrypted_twice, sym_key2), sym_key1, 1) == deck
+
+    # Every number has an IV of its own
+    assert len(set(encrypt_deck([1, 1, 1], sym_key1))) == 3
+    assert encrypt_deck([], sym_key1) == decrypt_deck([], sym_key1) == []
+
+    # The cards of the block cipher stay 16 bytes long, whatever the number of layers
+    encrypted_once = encrypt_deck(deck, sym_key1, "block")
+    encrypted_twice = encrypt_deck(encrypted_once, sym_key2, "block")
+    assert all(len(number) == 16 for number in encrypted_twice)
+    assert decrypt_deck(encrypted_twice, sym_key2, cipher="block") == encrypted_once
+    assert decrypt_deck(encrypted_once, sym_key1, 1, "block") == deck
+    assert len(set(encrypt_deck([1, 1, 1], sym_key1, "block"))) == 3
+    # A deck a cheater mixed numbers into is encrypted card by card, and caught when it is verified
+    mixed = [3, 5] + encrypted_once[2:]
+    assert decrypt_deck(encrypt_deck(mixed, sym_key2, "block"), sym_key2, cipher="block")[2:] == encrypted_once[2:]
+    try:
+        encrypt_deck([1, b"short"], sym_key1, "block")
+        assert False
+    except ValueError:
+        pass
+
+    # The layers decrypted by the pool of threads are the ones decrypt_deck gives
+    layers = [(encrypted_twice, sym_key2, 0), (encrypted_once, sym_key1, 1)]
+    assert decrypt_layers(layers, "block", workers=2) == [encrypted_once, deck]
+    assert decrypt_layers(layers, "block", workers=1) == [encrypted_once, deck]
+
+
+def test_public_key_cache():
+    private_key, public_key = gen_assymetric_key()
+    message = b'This is a test message'
+    signature = sign_message(message, private_key)
+
+    register_public_keys(public_key, "not a key")
+    hits = load_public_key.cache_info().hits
+
+    # The key loaded at registration is the one used to verify
+    assert load_public_key(public_key) is load_public_key(public_key)
+    assert verify_signature(message, signature, public_key) == True
+    assert load_public_key.cache_info().hits == hits + 3
+
+
+def test_signature_suites():
+    message = b'This is a test message'
+    keys = {suite: gen_assymetric_key(suite) for suite in SUITES}
+
+    for suite, (private_key, public_key) in keys.items():
+        signature = sign_message(message, private_key)
+        assert public_key_suite(public_key) == suite
+        assert verify_signature(message, signature, public_key) == True
+        assert verify_signature(b'This is another test message', signature, public_key) == False
+
+        # A signature never verifies with the key of another suite
+        for other_suite, (other_private_key, other_public_key) in keys.items():
+            if other_suite != suite:
+                assert verify_signature(message, signature, other_public_key) == False
+
+    assert public_key_suite("not a key") is None
+
+    # A suite must implement every operation
+    try:
+        SignatureSuite()
+        assert False
+    except TypeError:
+        pass
+
+
+def test_audit_log():
+    path = os.path.join(tempfile.mkdtemp(), "security.log")
+    log = AuditLog(path, batch=16)
+
+    # Records appended from several threads at once
+    def append(thread):
+        for number in range(100):
+            log.append("Winner", f"Table {thread}: Received Winner message - {number}\nab")
+    threads = [threading.Thread(target=append, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.flush()
+    log.append("-", "last")
+    log.close()
+
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 401
+
+    # Every record holds the digest of the one before it
+    previous = None
+    for seq, line in enumerate(lines, 1):
+        number, date, previous_hash, kind, text = parse_record(line)
+        assert number == seq
+        assert previous_hash == (GENESIS if previous is None else chain_hash(previous))
+        previous = line
+    # Line breaks are kept out of the text, so every record is a line
+    texts = set(parse_record(line)[3:] for line in lines[:-1])
+    assert texts == set(("Winner", f"Table {thread}: Received Winner message - {number} ab") for thread in range(4) for number in range(100))
+    assert parse_record(lines[-1])[3:] == ("-", "last")
+
+    # A changed record breaks the chain at the next one
+    tampered = lines[10].replace("Winner message", "Winner_ACK message")
+    assert parse_record(lines[11])[2] != chain_hash(tampered)
+
+
+def test_audit_reader():
+    path = os.path.join(tempfile.mkdtemp(), "security.log")
+    log = AuditLog(path)
+    kinds = ["Begin_Game", "Message_Deck", "Commit_Card", "-"]
+    for number in range(1000):
+        log.append(kinds[number % 4], f"Table {number % 3}: record {number}")
+    log.close()
+
+    reader = AuditReader(path)
+    assert reader.count == 1000
+    assert list(reader.query(10, 12)) == [line for line in open(path).read().splitlines()[9:12]]
+    assert [parse_record(line)[0] for line in reader.query(kind="Commit_Card", last=20)] == [3, 7, 11, 15, 19]
+    assert [parse_record(line)[0] for line in reader.query(995, kind="-", text="Table 1:")] == []
+    assert [parse_record(line)[0] for line in reader.query(990, kind="-", text="Table 0:")] == [1000]
+    assert reader.verify_chain() is None
+    reader.close()
+
+    # Records written later are added to the index, and a partly written record is left out
+    with open(path, encoding="utf-8") as f:
+        last = f.read().splitlines()[-1]
+    with open(path, "a", encoding="utf-8") as f:
+        line = format_record(1001, 0, chain_hash(last), "Winner", "Table 0: later")
+        f.write(line + "\n" + "1002 - 01/01/2024")
+    reader = AuditReader(path)
+    assert reader.count == 1001
+    assert list(reader.query(kind="Winner")) == [line]
+    assert reader.verify_chain() is None
+    reader.close()
+
+    # A changed record breaks the chain at the next one
+    with open(path, "rb") as f:
+        offset = sum(len(line) for line in f.readlines()[:499])
+    with open(path, "r+b") as f:
+        # The last character of record 500
+        f.seek(offset + len(list(AuditReader(path).query(500, 500))[0]) - 1)
+        f.write(b"#")
+    reader = AuditReader(path)
+    assert reader.verify_chain() == 501
+    reader.close()
+
+    # A log written again from the start is indexed again
+    log = AuditLog(path)
+    log.append("Cheat", "Table 0: again")
+    log.close()
+    reader = AuditReader(path)
+    assert reader.count == 1 and list(reader.query(kind="Cheat")) == [open(path).read().strip()]
+    reader.close()
+
+
+def test_software_token():
+    use_token(SoftwareToken("PLAYER", "BI123456789"))
+    message = {"command": "Register", "nick": "player"}
+    certificate = get_cert_data()
+    signature = card_sign_message(message)
+
+    assert validate_signature(signature, message, certificate)
+    assert not validate_signature(signature, {"command": "Register", "nick": "other"}, certificate)
+    assert get_name_and_number(certificate) == ("PLAYER", "BI123456789")
+    # The certificate is read once
+    assert get_cert_data() is certificate
+    use_token(None)
+
+    # A token must provide its certificate and sign
+    try:
+        Token()
+        assert False
+    except TypeError:
+        pass
+
+
+def test_certificate_cache():
+    cache = CertificateCache(maxsize=2)
+    certificates = [bytes.fromhex(SoftwareToken(f"PLAYER {number}", f"BI{number}").get_cert_data()) for number in range(3)]
+
+    assert cache.get(certificates[0]).name == "PLAYER 0"
+    assert cache.get(certificates[0]) is cache.get(certificates[0])
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # The least recently used certificate is evicted
+    cache.get(certificates[1])
+    cache.get(certificates[0])
+    cache.get(certificates[2])
+    assert cache.get(certificates[0]).number == "BI0"
+    assert cache.misses == 3
+    cache.get(certificates[1])
+    assert cache.misses == 4
+
+
+def test_session_keys():
+    client_key, client_public_key = gen_session_key()
+    server_key, server_public_key = gen_session_key()
+    client = agree_session(client_key, server_public_key)
+    server = agree_session(server_key, client_public_key)
+    assert client.key == server.key
+
+    message = {"command": "Call_Numbers", "ID": 0, "numbers": [7, 0, 42]}
+    mac = client.mac(message.__repr__().encode('utf-8'))
+    assert server.verify(message, mac)
+    assert not server.verify({"command": "Call_Numbers", "ID": 0, "numbers": [7, 0, 43]}, mac)
+
+    # Another exchange gives another key
+    other = agree_session(gen_session_key()[0], server_public_key)
+    assert not other.verify(message, mac)
+
+
+def test_batch_signatures():
+    private_key, public_key = gen_assymetric_key()
+    other_key, other_public_key = gen_assymetric_key()
+    for size in (1, 2, 5, 8):
+        messages = [{"command": "Disqualify", "ID": 0, "disqualified_ID": number} for number in range(size)]
+        signatures = sign_batch(messages, private_key)
+        assert len({signature["root"] for signature in signatures}) == 1
+
+        verified = verify_batch_root.cache_info().misses
+        for message, signature in zip(messages, signatures):
+            assert verify_signature(message, signature, public_key)
+            assert not verify_signature(message, signature, other_public_key)
+        # The root is verified once for every key, whatever the size of the batch
+        assert verify_batch_root.cache_info().misses == verified + 2
+
+        assert not verify_signature({"command": "Disqualify", "ID": 0, "disqualified_ID": size}, signatures[0], public_key)
+        if size > 1:
+            assert not verify_signature(messages[0], signatures[1], public_key)
+    assert sign_batch([], private_key) == []
+
+
+def test_verification_cache():
+    private_key, public_key = gen_assymetric_key()
+    other_key, other_public_key = gen_assymetric_key()
+    message = {"command": "Post_Final_Decks", "ID": 0, "decks": {"1": {"deck": ["AAAA"] * 100}}}
+    signature = sign_message(message, private_key)
+
+    VERIFICATIONS.cache_clear()
+    for _ in range(5):
+        assert verify_signature(message, signature, public_key)
+        assert not verify_signature(message, signature, other_public_key)
+    assert VERIFICATIONS.cache_info().hits == 8 and VERIFICATIONS.cache_info().misses == 2
+
+    # A single changed byte of the message, or of the signature, is a different entry
+    tampered = dict(message, ID=1)
+    assert not verify_signature(tampered, signature, public_key)
+    forged = ("0" if signature[0] != "0" else "1") + signature[1:]
+    assert not verify_signature(message, forged, public_key)
+    assert VERIFICATIONS.cache_info().misses == 4
+
+    cache = VerificationCache(maxsize=2)
+    for number in range(3):
+        cache.put(number, True)
+    assert cache.get(0) is None and cache.get(2) is True
+    cache.get(1)
+    cache.put(3, False)
+    assert cache.get(2) is None and cache.get(1) is True and cache.get(3) is False
+    assert cache.cache_info() == (4, 2, 2, 2)
+
+    cache = VerificationCache(maxsize=0)
+    cache.put(0, True)
+    assert cache.get(0) is None and cache.cache_info().currsize == 0
+
+
+POOL_KEY = None
+
+
+def delayed(value, seconds):
+    time.sleep(seconds)
+    return value
+
+
+def pool_sign(message):
+    # Private keys can not be pickled: the workers hold the key they sign with, as those of the Playing Area do
+    return sign_message(message, POOL_KEY)
+
+
+def test_crypto_pool():
+    global POOL_KEY
+    private_key, public_key = gen_assymetric_key()
+    POOL_KEY = private_key
+    messages = [{"command": "Verify_Card_OK", "ID": user} for user in range(40)]
+    signatures = [sign_message(message, private_key) for message in messages]
+    signatures[7] = signatures[8]
+
+    for processes in (False, True):
+        pool = CryptoPool(workers=2, batch=4, processes=processes)
+        try:
+            futures = [pool.submit(verify_signature, message, signature, public_key, key="player") for message, signature in zip(messages, signatures)]
+            assert [future.result(timeout=30) for future in futures] == [user != 7 for user in range(40)]
+            assert pool.completed == 40 and pool.batches >= 10
+
+            # The jobs of a key are delivered in order, even when the later ones are done first
+            delivered = []
+            futures = [pool.submit(delayed, value, 0.2 - value * 0.05, key="caller") for value in range(4)]
+            for future in futures:
+                future.add_done_callback(lambda done: delivered.append(done.result()))
+            futures[-1].result(timeout=30)
+            assert delivered == [0, 1, 2, 3]
+
+            signature = pool.submit(pool_sign, messages[0]).result(timeout=30)
+            assert verify_signature(messages[0], signature, public_key)
+            failed = pool.submit(int, "not a number", key="player")
+            assert isinstance(failed.exception(timeout=30), ValueError)
+        finally:
+            pool.close()
+    assert len(pool.tails) == 0
+
+
 @click.command()
-@click.option('--test', '-t', help='choose from: [sign_message]')
+@click.option('--test', '-t', help='choose from: [sign_message, encrypt_number, encrypt_deck, public_key_cache, signature_suites, audit_log, audit_reader, software_token, certificate_cache, session_keys, batch_signatures, verification_cache, crypto_pool]')
 def main(test):
     if test == 'sign_message':
         test_sign_message()
     elif test == 'encrypt_number':
         test_encrypt_number()
+    elif test == 'encrypt_deck':
+        test_encrypt_deck()
+    elif test == 'public_key_cache':
+        test_public_key_cache()
+    elif test == 'signature_suites':
+        test_signature_suites()
+    elif test == 'audit_log':
+        test_audit_log()
+    elif test == 'audit_reader':
+        test_audit_reader()
+    elif test == 'software_token':
+        test_software_token()
+    elif test == 'certificate_cache':
+        test_certificate_cache()
+    elif test == 'session_keys':
+        test_session_keys()
+    elif test == 'batch_signatures':
+        test_batch_signatures()
+    elif test == 'verification_cache':
+        test_verification_cache()
+    elif test == 'crypto_pool':
+        test_crypto_pool()
     else:
         print("No test chosen")
         return
@@ -1,28 +1,156 @@
 import base64
-import PyKCS11
+import queue
+import threading
+import collections
+import hashlib
+import datetime
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from cryptography import x509
+from cryptography.x509.oid import NameOID
 from cryptography.hazmat.backends import default_backend as db
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
-from cryptography.hazmat.primitives.hashes import SHA1, Hash
+from cryptography.hazmat.primitives.hashes import SHA1, SHA256, Hash
+
+PKCS11_LIBRARY = '/usr/lib/x86_64-linux-gnu/pkcs11/opensc-pkcs11.so'
+PIN = '1111'
+CERTIFICATE_LABEL = 'CITIZEN AUTHENTICATION CERTIFICATE'
+KEY_LABEL = 'CITIZEN AUTHENTICATION KEY'
+SESSIONS = 4                                        # Logged-in sessions a PKCS11Token keeps open, at most
+TOKEN = None                                        # Token used by get_cert_data and sign_message, the Citizen Card by default
+CERTIFICATES_CACHE_SIZE = 1024                      # Parsed certificates kept by load_certificate
+
+Certificate = collections.namedtuple("Certificate", ["certificate", "public_key", "name", "number"])
+
+
+class Token(ABC):
+    """ Holder of the Citizen Card key pair, which signs messages and provides the certificate of its public key. """
+
+    @abstractmethod
+    def get_cert_data(self):
+        """ :return: the DER certificate, in hex """
+
+    @abstractmethod
+    def sign(self, data):
+        """ :return: the signature of the data, in bytes """
+
+    def close(self):
+        pass
+
+
+class PKCS11Token(Token):
+    """
+    Citizen Card read through a PKCS#11 library, which is loaded once. The certificate is read once, and the sessions,
+    logged in once, are kept in a pool and reused by the following signatures.
+    """
+
+    def __init__(self, library=PKCS11_LIBRARY, pin=PIN, sessions=SESSIONS):
+        # Only the clients with a card reader need PyKCS11
+        import PyKCS11
+        self.PyKCS11 = PyKCS11
+        self.pkcs11 = PyKCS11.PyKCS11Lib()
+        self.pkcs11.load(library)
+        self.slot = self.pkcs11.getSlotList(tokenPresent=True)[0]
+        self.pin = pin
+        self.pool = queue.LifoQueue()               # Logged-in sessions not in use, with the handle of their private key (session, key)
+        self.sessions = sessions
+        self.certificate = None                     # DER certificate, in hex, read once
+
+    def open_session(self):
+        """ :return: a new logged-in session, and the handle of its private key """
+        PyKCS11 = self.PyKCS11
+        session = self.pkcs11.openSession(self.slot, PyKCS11.CKF_SERIAL_SESSION | PyKCS11.CKF_RW_SESSION)
+        try:
+            session.login(self.pin)
+        except PyKCS11.PyKCS11Error as e:
+            # The login of the first session holds for the others
+            if e.value != PyKCS11.CKR_USER_ALREADY_LOGGED_IN:
+                raise
+        criteria = [(PyKCS11.CKA_CLASS, PyKCS11.CKO_PRIVATE_KEY), (PyKCS11.CKA_KEY_TYPE, PyKCS11.CKK_RSA), (PyKCS11.CKA_LABEL, KEY_LABEL)]
+        return session, session.findObjects(criteria)[0]
+
+    @contextmanager
+    def session(self):
+        """ Lends a session of the pool, opening a new one if all of them are in use. """
+        try:
+            session = self.pool.get_nowait()
+        except queue.Empty:
+            session = self.open_session()
+        try:
+            yield session
+        finally:
+            if self.pool.qsize() < self.sessions:
+                self.pool.put(session)
+            else:
+                session[0].closeSession()
+
+    def get_cert_data(self):
+        if self.certificate is None:
+            with self.session() as (session, key):
+                cert_obj = session.findObjects([
+                              (self.PyKCS11.CKA_CLASS, self.PyKCS11.CKO_CERTIFICATE),
+                              (self.PyKCS11.CKA_LABEL, CERTIFICATE_LABEL)
+                              ])[0]
+                self.certificate = bytes(cert_obj.to_dict()['CKA_VALUE']).hex()
+        return self.certificate
+
+    def sign(self, data):
+        mechanism = self.PyKCS11.Mechanism(self.PyKCS11.CKM_SHA1_RSA_PKCS, None)
+        with self.session() as (session, key):
+            return bytes(session.sign(key=key, data=data, mecha=mechanism))
+
+    def close(self):
+        while not self.pool.empty():
+            session, key = self.pool.get_nowait()
+            session.closeSession()
+
+
+class SoftwareToken(Token):
+    """
+    In-process stand-in for the Citizen Card, for tests and benchmarks on machines without a card reader: a generated
+    RSA key and a self-signed certificate with the subject fields read by get_name_and_number.
+    Its signatures are checked by validate_signature as those of the card.
+    """
+
+    def __init__(self, name="SOFTWARE TOKEN", number="BI000000000"):
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name), x509.NameAttribute(NameOID.SERIAL_NUMBER, number)])
+        certificate = x509.CertificateBuilder().subject_name(subject).issuer_name(subject).public_key(self.key.public_key()) \
+            .serial_number(x509.random_serial_number()).not_valid_before(datetime.datetime(2020, 1, 1)) \
+            .not_valid_after(datetime.datetime(2100, 1, 1)).sign(self.key, SHA256())
+        self.certificate = certificate.public_bytes(serialization.Encoding.DER).hex()
+
+    def get_cert_data(self):
+        return self.certificate
+
+    def sign(self, data):
+        # Over the SHA-1 digest of the data, as validate_signature expects
+        return self.key.sign(hashlib.sha1(data).digest(), PKCS1v15(), SHA1())
+
+
+def get_token():
+    """ :return: the token in use, the Citizen Card read through PKCS#11 unless another one was chosen with use_token """
+    global TOKEN
+    if TOKEN is None:
+        TOKEN = PKCS11Token()
+    return TOKEN
+
+
+def use_token(token):
+    """ Chooses the token used by get_cert_data and sign_message, closing the previous one. """
+    global TOKEN
+    if TOKEN is not None and TOKEN is not token:
+        TOKEN.close()
+    TOKEN = token
 
 
 def get_cert_data():
     """ get certificate data from card
     :return: certificate data
     """
-    lib = '/usr/lib/x86_64-linux-gnu/pkcs11/opensc-pkcs11.so'
-    pkcs11 = PyKCS11.PyKCS11Lib()
-    pkcs11.load(lib)
-    slot = pkcs11.getSlotList(tokenPresent=True)[0]
-    session = pkcs11.openSession(slot)
-    cert_obj = session.findObjects([
-                  (PyKCS11.CKA_CLASS, PyKCS11.CKO_CERTIFICATE),
-                  (PyKCS11.CKA_LABEL, 'CITIZEN AUTHENTICATION CERTIFICATE')
-                  ])[0]
-
-    cert_der_data = bytes(cert_obj.to_dict()['CKA_VALUE'])
-    session.closeSession()
-    return cert_der_data.hex()
+    return get_token().get_cert_data()
 
 
 def sign_message(text):
@@ -30,21 +158,67 @@ def sign_message(text):
     :param text: text to sign
     :return: signature
     """
-    text = text.__repr__().encode('utf-8')
-    lib = '/usr/lib/x86_64-linux-gnu/pkcs11/opensc-pkcs11.so'
-    pkcs11 = PyKCS11.PyKCS11Lib()
-    pkcs11.load(lib)
-    slot = pkcs11.getSlotList(tokenPresent=True)[0]
-    session = pkcs11.openSession(slot, PyKCS11.CKF_SERIAL_SESSION | PyKCS11.CKF_RW_SESSION)
-    session.login('1111')
-    criteria = [(PyKCS11.CKA_CLASS, PyKCS11.CKO_PRIVATE_KEY), (PyKCS11.CKA_KEY_TYPE, PyKCS11.CKK_RSA), (PyKCS11.CKA_LABEL, 'CITIZEN AUTHENTICATION KEY' )]
-    keys = session.findObjects(criteria)
-    key = keys[0]
-    mechanism = PyKCS11.Mechanism(PyKCS11.CKM_SHA1_RSA_PKCS, None)
-    signature = bytes(session.sign(key=key,data=text, mecha=mechanism))
-    session.logout()
-    session.closeSession()
-    return signature.hex()
+    # The bytes a Message of the protocol keeps, serialized once or as it was received
+    text = text.canonical() if hasattr(text, "canonical") else text.__repr__().encode('utf-8')
+    return get_token().sign(text).hex()
+
+class CertificateCache:
+    """
+    Bounded LRU cache of parsed certificates, keyed by the SHA-256 fingerprint of their DER encoding.
+    The same citizens register game after game, so their certificates are only parsed the first time.
+    """
+
+    def __init__(self, maxsize=CERTIFICATES_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.certificates = collections.OrderedDict()   # {fingerprint: Certificate}, from the least to the most recently used
+        self.lock = threading.Lock()                    # The tables of the Playing Area register clients at once
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cert_der_data):
+        """
+        :param cert_der_data: the DER certificate
+        :return: the parsed Certificate
+        """
+        fingerprint = hashlib.sha256(cert_der_data).digest()
+        with self.lock:
+            certificate = self.certificates.get(fingerprint)
+            if certificate is not None:
+                self.certificates.move_to_end(fingerprint)
+                self.hits += 1
+                return certificate
+            self.misses += 1
+
+        cert = x509.load_der_x509_certificate(cert_der_data, db())
+        name = cert.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)
+        citizen_number = cert.subject.get_attributes_for_oid(x509.NameOID.SERIAL_NUMBER)
+        certificate = Certificate(cert, cert.public_key(), name[0].value if len(name) > 0 else None,
+                                  citizen_number[0].value if len(citizen_number) > 0 else None)
+
+        with self.lock:
+            self.certificates[fingerprint] = certificate
+            self.certificates.move_to_end(fingerprint)
+            while len(self.certificates) > self.maxsize:
+                self.certificates.popitem(last=False)
+        return certificate
+
+    def clear(self):
+        with self.lock:
+            self.certificates.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+CERTIFICATES = CertificateCache()
+
+
+def load_certificate(cert_data):
+    """ parse a certificate, or get it from the cache
+    :param cert_data: certificate data, in hex
+    :return: the Certificate, with its public key, name and citizen number
+    """
+    return CERTIFICATES.get(bytes.fromhex(cert_data))
+
 
 def validate_signature(signature, text, cert_der_data):
     """ validate signature with certificate
@@ -53,16 +227,15 @@ def validate_signature(signature, text, cert_der_data):
     :param cert_der_data: certificate data
     :return: True if signature is valid, False otherwise
     """
-    cert_der_data = bytes.fromhex(cert_der_data)
     signature = bytes.fromhex(signature)
-    text = text.__repr__().encode('utf-8')
+    # The bytes a Message of the protocol keeps, serialized once or as it was received
+    text = text.canonical() if hasattr(text, "canonical") else text.__repr__().encode('utf-8')
 
-    cert = x509.load_der_x509_certificate(cert_der_data, db())
+    public_key = load_certificate(cert_der_data).public_key
     md = Hash(SHA1(), backend=db())
     md.update(text)
     digest = md.finalize()
 
-    public_key = cert.public_key()
     try:
         public_key.verify(signature, digest, PKCS1v15(), SHA1())
         return True
@@ -72,13 +245,10 @@ def validate_signature(signature, text, cert_der_data):
 def get_name_and_number(cert_data):
     """ get name and citizen number from certificate
     :param cert_data: certificate data
-    :return: name and citizen number
+    :return: name and citizen number, None if the certificate does not hold them
     """
-    cert_data = bytes.fromhex(cert_data)
-    cert = x509.load_der_x509_certificate(cert_data, db())
-    name  = cert.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)[0].value
-    citizen_number = cert.subject.get_attributes_for_oid(x509.NameOID.SERIAL_NUMBER)[0].value
-    return name, citizen_number
+    certificate = load_certificate(cert_data)
+    return certificate.name, certificate.number
 
 def main():
     text = b'text to sign'